@@ -0,0 +1,54 @@
+"""Compares the memory of a large SDF scene held as node tree and as `cg.ArrayGraph`.
+
+The scene is the union of many circles. Memory is measured by tracemalloc for
+building the node tree and for the arrays of the converted graph, after which
+the node tree is dropped. Evaluation and gradient times are reported for both.
+"""
+
+import gc
+import time
+import tracemalloc
+
+import numpy as np
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def scene(n):
+    s = sdf.Circle(center=[0, 0], radius=0.1)
+    for i in range(1, n):
+        s |= sdf.Circle(center=[i % 100, i // 100], radius=0.1)
+    return s.sdf
+
+if __name__ == '__main__':
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    fargs = {x: np.linspace(0, 100, 1000), y: np.linspace(0, 50, 1000)}
+
+    tracemalloc.start()
+    t = time.perf_counter()
+    f = scene(20000)
+    tree_bytes = tracemalloc.get_traced_memory()[0]
+    print('{:<12} {:8} nodes {:8.1f}MB {:8.2f}s construction'.format('tree', len(cg.topological_order(f)), tree_bytes / 2**20, time.perf_counter() - t))
+
+    tracemalloc.stop()
+    t = time.perf_counter()
+    g = cg.to_arrays(f)
+    elapsed = time.perf_counter() - t
+
+    t = time.perf_counter()
+    cg.value(f, fargs)
+    print('{:<12} {:8.2f}s value'.format('tree', time.perf_counter() - t))
+    t = time.perf_counter()
+    cg.numeric_gradient(f, fargs)
+    print('{:<12} {:8.2f}s gradient'.format('tree', time.perf_counter() - t))
+
+    del f
+    gc.collect()
+    print('{:<12} {:8} nodes {:8.1f}MB arrays {:8.2f}s conversion'.format('arrays', len(g), g.nbytes / 2**20, elapsed))
+    t = time.perf_counter()
+    g.value(fargs)
+    print('{:<12} {:8.2f}s value'.format('arrays', time.perf_counter() - t))
+    t = time.perf_counter()
+    g.numeric_gradient(fargs)
+    print('{:<12} {:8.2f}s gradient'.format('arrays', time.perf_counter() - t))
@@ -0,0 +1,46 @@
+"""Measures allocations and run time of buffered tape evaluations.
+
+A buffered tape stores the value of each slot in an array released by an
+earlier slot of equal shape, or by the previous call, through the `out`
+argument of numpy ufuncs. Unit local derivatives of additions, subtractions
+and negations are passed on in the reverse sweep without being materialized.
+"""
+
+from contextlib import ExitStack
+import time
+
+import numpy as np
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def nested_scene(depth):
+    with ExitStack() as stack:
+        s = sdf.Box(minc=[-0.2, -0.2], maxc=[0.2, 0.2])
+        for i in range(depth):
+            stack.enter_context(sdf.transform(angle=0.2, offset=[0.1, 0.05]))
+            s = s | sdf.Circle(center=[0.1, 0.1], radius=0.2)
+    return s
+
+def measure(tape, method, *args, repeat=5):
+    getattr(tape, method)(*args)
+    a = tape.allocations
+    best = float('inf')
+    for i in range(repeat):
+        t = time.perf_counter()
+        getattr(tape, method)(*args)
+        best = min(best, time.perf_counter() - t)
+    return best, (tape.allocations - a) // repeat
+
+if __name__ == '__main__':
+    s = nested_scene(32)
+    for n in [1000, 100000, 300000]:
+        xy = np.random.uniform(-2, 2, size=(2, n))
+        tape = cg.compile(s.sdf, s.tape.symbols)
+        btape = cg.compile(s.sdf, s.tape.symbols, buffered=True)
+        print('Samples {}, {} instructions'.format(n, len(tape.code)))
+        for method in ['__call__', 'forward_gradient', 'gradient']:
+            t, a = measure(tape, method, *xy)
+            bt, ba = measure(btape, method, *xy)
+            print('  {:<18} allocations {:5d} -> {:5d}  time {:8.2f}ms -> {:8.2f}ms ({:.2f}x)'.format(
+                method, a, ba, t*1e3, bt*1e3, t / bt))
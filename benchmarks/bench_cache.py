@@ -0,0 +1,40 @@
+"""Compares steepest descent on the line fitting objective with and without evaluation cache.
+
+Each iteration computes the gradient and prints the error at the updated
+parameters. With `cg.EvaluationCache` the values computed for the error are
+reused by the gradient of the next iteration.
+"""
+
+import time
+
+import numpy as np
+
+import cgraph as cg
+
+def objective(w, n):
+    """Returns the mean squared residuals of `n` noisy points to the line `w0*x + w1`."""
+    x = np.linspace(0, 10, n)
+    y = x * 0.8 + 2.0 + np.random.normal(scale=0.1, size=n)
+    return cg.sym_sum([(w[0] * x[i] + w[1] - y[i])**2 for i in range(n)]) / n
+
+def descent(f, w, value, gradient, iterations=50):
+    guess = {w[0]: 0.4, w[1]: 1.1}
+    for i in range(iterations):
+        df = gradient(f, guess)
+        guess[w[0]] -= 0.02 * df[w[0]]
+        guess[w[1]] -= 0.02 * df[w[1]]
+        value(f, guess)
+    return guess
+
+if __name__ == '__main__':
+    w = [cg.Symbol('w0'), cg.Symbol('w1')]
+    f = objective(w, 2000)
+
+    t = time.perf_counter()
+    descent(f, w, cg.value, cg.numeric_gradient)
+    print('{:<10} {:8.3f}s'.format('uncached', time.perf_counter() - t))
+
+    cache = cg.EvaluationCache()
+    t = time.perf_counter()
+    descent(f, w, cache.value, cache.numeric_gradient)
+    print('{:<10} {:8.3f}s {}'.format('cached', time.perf_counter() - t, cache.stats()))
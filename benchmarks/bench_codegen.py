@@ -0,0 +1,42 @@
+"""Compares the latency of generated code with tape evaluation for small batches.
+
+The particle simulation queries the signed distance function and its gradient
+for a hundred particles per step. At this size the run time is dominated by
+the Python overhead per node rather than by numpy kernels.
+"""
+
+import time
+
+import numpy as np
+
+import cgraph as cg
+from bench_cse import scene
+
+def best_of(func, repeat=200):
+    t = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        t.append(time.perf_counter() - t0)
+    return min(t)
+
+if __name__ == '__main__':
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    f = scene()
+    F = cg.Function(f, [x, y])
+
+    t = time.perf_counter()
+    G = cg.codegen(f, [x, y])
+    print('Code generation took {:.1f}ms, {} lines'.format((time.perf_counter() - t) * 1e3, G.source.count('\n')))
+    t = time.perf_counter()
+    cg.codegen(f, [x, y])
+    print('Cached lookup took {:.1f}ms'.format((time.perf_counter() - t) * 1e3))
+
+    for n in [1, 100, 10000]:
+        xs = np.random.uniform(-2, 2, size=n)
+        ys = np.random.uniform(-2, 2, size=n)
+        for name, func in [('function', F), ('codegen', G)]:
+            v = best_of(lambda: func(xs, ys))
+            g = best_of(lambda: func(xs, ys, compute_gradient=True))
+            print('{:>6} samples {:<10} value {:8.3f}ms gradient {:8.3f}ms'.format(n, name, v*1e3, g*1e3))
@@ -0,0 +1,58 @@
+"""Reports node counts and timings with and without common subexpression elimination.
+
+The scene is the one of `cgraph.app.particle_physics` including its randomly
+placed boxes. Each `sdf.Box` consists of four half-spaces over the same
+transformed `x`/`y` expressions, leading to many structurally identical
+subexpressions. The scene is built as is, then merged using `cg.cse` and
+finally built again inside `cg.interning`.
+
+    python benchmarks/bench_cse.py
+"""
+
+import time
+
+import numpy as np
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def scene(nboxes=10, seed=0):
+    """Returns the particle physics scene with `nboxes` random boxes."""
+    np.random.seed(seed)
+
+    f = sdf.Halfspace(normal=[0, 1], d=-1.8) | sdf.Halfspace(normal=[1, 1], d=-1.8) | sdf.Halfspace(normal=[-1, 1], d=-1.8)
+    with sdf.smoothness(10):
+        f |= sdf.Circle(center=[0, 0.0], radius=0.5) & sdf.Halfspace(normal=[0.1, 1], d=0.3)
+
+    for i in range(nboxes):
+        with sdf.transform(angle=np.random.uniform(-0.8, 0.8), offset=np.random.uniform(-2, 2, size=2)):
+            f |= sdf.Box(minc=np.random.uniform(-0.3, -0.1, size=2), maxc=np.random.uniform(0.1, 0.3, size=2))
+    return f.sdf
+
+def best_of(func, repeat=5):
+    t = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        t.append(time.perf_counter() - t0)
+    return min(t)
+
+if __name__ == '__main__':
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    xs = np.random.uniform(-2, 2, size=10000)
+    ys = np.random.uniform(-2, 2, size=10000)
+
+    f = scene()
+    with cg.interning():
+        fi = scene()
+
+    print('{:>12} {:>12} {:>12} {:>12} {:>12}'.format('', 'tree nodes', 'unique', 'value', 'gradient'))
+    for name, e in [('as built', f), ('cse', cg.cse(f)), ('interning', fi)]:
+        F = cg.Function(e, [x, y])
+        print('{:>12} {:>12} {:>12} {:>10.2f}ms {:>10.2f}ms'.format(
+            name,
+            sum(1 for n in cg.postorder(e)),
+            len(cg.topological_order(e)),
+            best_of(lambda: F(xs, ys)) * 1e3,
+            best_of(lambda: F(xs, ys, compute_gradient=True)) * 1e3))
@@ -0,0 +1,52 @@
+"""Compares forward and reverse mode gradients of functions with few symbols.
+
+Signed distance functions depend on the two coordinates `x` and `y` only.
+Forward mode obtains both partial derivatives within the evaluation sweep,
+while reverse mode requires an additional sweep over the tape.
+"""
+
+from contextlib import ExitStack
+import time
+
+import numpy as np
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def nested_scene(depth):
+    with ExitStack() as stack:
+        s = sdf.Box(minc=[-0.2, -0.2], maxc=[0.2, 0.2])
+        for i in range(depth):
+            stack.enter_context(sdf.transform(angle=0.2, offset=[0.1, 0.05]))
+            s = s | sdf.Circle(center=[0.1, 0.1], radius=0.2)
+    return s
+
+def timeit(f, repeat=5):
+    best = float('inf')
+    for i in range(repeat):
+        t = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+def polynomial(nsyms):
+    syms = [cg.Symbol('x{}'.format(i)) for i in range(nsyms)]
+    f = cg.sym_sum([cg.sym_sin(a) * b for a in syms for b in syms])
+    return cg.Function(f, syms)
+
+if __name__ == '__main__':
+    for n in [100, 10000, 100000]:
+        s = nested_scene(16)
+        xy = np.random.uniform(-2, 2, size=(2, n))
+        s(*xy, compute_gradient=True)
+        f = timeit(lambda: s(*xy, compute_gradient=True, mode='forward'))
+        r = timeit(lambda: s(*xy, compute_gradient=True, mode='reverse'))
+        print('sdf samples {:>8}: forward {:8.2f}ms reverse {:8.2f}ms'.format(n, f*1e3, r*1e3))
+
+    for k in [1, 2, 3, 4, 8]:
+        F = polynomial(k)
+        xs = np.random.uniform(-2, 2, size=(k, 10000))
+        F(*xs)
+        f = timeit(lambda: F(*xs, compute_gradient=True, mode='forward'))
+        r = timeit(lambda: F(*xs, compute_gradient=True, mode='reverse'))
+        print('symbols {:>2}: forward {:8.2f}ms reverse {:8.2f}ms'.format(k, f*1e3, r*1e3))
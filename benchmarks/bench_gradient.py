@@ -0,0 +1,60 @@
+"""Benchmarks reverse-mode gradients of deeply nested SDFs.
+
+Nested `sdf.transform` blocks share the transformed `x`/`y` expressions
+between all primitives created inside them. A traversal that follows every
+edge would visit a node once per path from the root, which grows exponentially
+with nesting depth. This script prints the number of root-to-node paths, the
+number of unique nodes and the time required to compute the gradient. The
+latter is expected to scale linearly with depth.
+
+    python benchmarks/bench_gradient.py
+"""
+
+from contextlib import ExitStack
+import time
+
+import numpy as np
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def nested_scene(depth):
+    """Returns a union of boxes whose transforms are nested `depth` levels deep."""
+    with ExitStack() as stack:
+        s = sdf.Box(minc=[-0.2, -0.2], maxc=[0.2, 0.2])
+        for i in range(depth):
+            stack.enter_context(sdf.transform(angle=0.2, offset=[0.1, 0.05]))
+            s = s | sdf.Box(minc=[-0.2, -0.2], maxc=[0.2, 0.2])
+    return s
+
+def count_paths(f):
+    """Returns the number of root-to-node paths, i.e the work of an edge based traversal."""
+    paths = dict((n, 0) for n in cg.topological_order(f))
+    paths[f] = 1
+    for n in reversed(cg.topological_order(f)):
+        for c in n.children:
+            paths[c] += paths[n]
+    return sum(paths.values())
+
+def best_of(func, repeat=5):
+    t = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        t.append(time.perf_counter() - t0)
+    return min(t)
+
+if __name__ == '__main__':
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    xs = np.random.uniform(-2, 2, size=1000)
+    ys = np.random.uniform(-2, 2, size=1000)
+
+    print('{:>6} {:>12} {:>8} {:>18} {:>18}'.format(
+        'depth', 'paths', 'nodes', 'numeric_gradient', 'Function'))
+    for depth in [5, 10, 20, 40, 80]:
+        s = nested_scene(depth)
+        t_ng = best_of(lambda: cg.numeric_gradient(s.sdf, {x:xs, y:ys}))
+        t_fn = best_of(lambda: s(xs, ys, compute_gradient=True))
+        print('{:>6} {:>12} {:>8} {:>16.2f}ms {:>16.2f}ms'.format(
+            depth, count_paths(s.sdf), len(cg.topological_order(s.sdf)), t_ng*1e3, t_fn*1e3))
@@ -0,0 +1,40 @@
+"""Measures the cost of Hessian-vector products relative to gradients.
+
+The objective is a regularized logistic regression with a parameter vector
+of `n` elements, built from tensor nodes. Hessian-vector products are computed
+by forward-over-reverse differentiation of the compiled objective, a Newton
+step solves for the Hessian built column by column from them.
+"""
+
+import time
+
+import numpy as np
+
+import cgraph as cg
+
+def objective(w, n, samples=2000):
+    rnd = np.random.RandomState(0)
+    A = rnd.normal(size=(samples, n))
+    y = cg.Constant((rnd.uniform(size=samples) > 0.5).astype(float))
+    z = cg.sym_matmul(A, w)
+    loss = cg.sym_log(1 + cg.sym_exp(z)) - y * z
+    return cg.sym_mean(loss) + 0.01 * cg.sym_reduce_sum(w * w)
+
+def timed(func, *args, repeat=5):
+    t = time.perf_counter()
+    for i in range(repeat):
+        func(*args)
+    return (time.perf_counter() - t) / repeat
+
+if __name__ == '__main__':
+    w = cg.Symbol('w')
+    print('{:>8} {:>12} {:>12} {:>8} {:>14}'.format('n', 'gradient', 'hvp', 'ratio', 'Hessian'))
+    for n in [10, 100, 1000]:
+        f = objective(w, n)
+        H = cg.hessian(f, [w])
+        p = np.zeros(n)
+        v = np.ones(n)
+        tg = timed(H.tape.gradient, p)
+        th = timed(H.tape.hvp, [v], p)
+        tH = timed(H, p, repeat=1) if n <= 100 else float('nan')
+        print('{:>8} {:>10.2f}ms {:>10.2f}ms {:>8.1f} {:>12.2f}ms'.format(n, tg * 1e3, th * 1e3, th / tg, tH * 1e3))
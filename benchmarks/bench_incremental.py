@@ -0,0 +1,45 @@
+"""Compares coordinate descent with full and incremental evaluation.
+
+The objective smooths `m` noisy samples, every parameter enters a few terms
+only. A coordinate step changes a single parameter, so `IncrementalFunction`
+re-evaluates the terms of this parameter and the final sum, while a `Function`
+evaluates the entire objective.
+"""
+
+import time
+
+import numpy as np
+
+import cgraph as cg
+
+def objective(p, data):
+    terms = [(p[i] - p[i+1])**2 for i in range(len(p) - 1)]
+    terms += [(p[i] - data[i])**2 for i in range(len(p))]
+    return cg.sym_sum(terms)
+
+def descent(partial, guess, sweeps=2, lam=0.1):
+    for k in range(sweeps):
+        for i in range(len(guess)):
+            v, d = partial(i, guess)
+            guess[i] -= lam * d[0]
+    return v
+
+if __name__ == '__main__':
+    m = 500
+    p = [cg.Symbol('p{}'.format(i)) for i in range(m)]
+    data = np.sin(np.linspace(0, 3, m)) + np.random.normal(scale=0.1, size=m)
+    f = objective(p, data)
+
+    F = cg.Function(f, p)
+    def full(i, guess):
+        v, g = F(*guess, compute_gradient=True, mode='reverse')
+        return v, g[:, i]
+
+    I = cg.IncrementalFunction(f, p)
+    def incremental(i, guess):
+        return I.partial(i, *guess)
+
+    for name, partial in [('full', full), ('incremental', incremental)]:
+        t = time.perf_counter()
+        v = descent(partial, np.zeros(m))
+        print('{:<12} {:8.3f}s objective {:.4f}'.format(name, time.perf_counter() - t, float(v[0])))
@@ -0,0 +1,54 @@
+"""Benchmarks Jacobian and Hessian evaluation over large batches.
+
+Compares evaluating each entry of the Jacobian/Hessian separately with `cg.value`
+on symbolic derivative expressions, as previously done by `newton_descent` in
+`cgraph.app.function_optimization`, against `cg.jacobian`, which evaluates all
+entries over one shared tape, and `cg.hessian`, which computes them by
+Hessian-vector products over the compiled expression.
+
+    python benchmarks/bench_jacobian.py
+"""
+
+import time
+
+import numpy as np
+
+import cgraph as cg
+
+def timed(func):
+    t0 = time.perf_counter()
+    func()
+    return time.perf_counter() - t0
+
+if __name__ == '__main__':
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    z = cg.Symbol('z')
+    syms = [x, y, z]
+
+    r = x * y + z
+    fs = [cg.sym_sin(r) * x, cg.sym_exp(-r * r), r / (1 + y * y)]
+
+    d = [cg.symbolic_gradient(f) for f in fs]
+    dd = cg.symbolic_gradient(fs[0])
+    ddd = [cg.symbolic_gradient(dd[s]) for s in syms]
+
+    def per_entry_jacobian(fargs):
+        return [[cg.value(di[s], fargs) for s in syms] for di in d]
+
+    def per_entry_hessian(fargs):
+        return [[cg.value(di[s], fargs) for s in syms] for di in ddd]
+
+    J = cg.jacobian(fs, syms)
+    H = cg.hessian(fs[0], syms)
+
+    print('{:>10} {:>14} {:>14} {:>14} {:>14}'.format('batch', 'J per entry', 'cg.jacobian', 'H per entry', 'cg.hessian'))
+    for n in [1, 1000, 1000000]:
+        vals = [np.random.uniform(-1, 1, size=n) for s in syms]
+        fargs = dict(zip(syms, vals))
+        print('{:>10} {:>12.2f}ms {:>12.2f}ms {:>12.2f}ms {:>12.2f}ms'.format(
+            n,
+            timed(lambda: per_entry_jacobian(fargs)) * 1e3,
+            timed(lambda: J(*vals)) * 1e3,
+            timed(lambda: per_entry_hessian(fargs)) * 1e3,
+            timed(lambda: H(*vals)) * 1e3))
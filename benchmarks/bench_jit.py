@@ -0,0 +1,41 @@
+"""Compares tape, generated code and numba fused loops for small and large batches.
+
+The jit backend requires numba. Without it, `cg.jit` falls back to generated
+numpy code and only the first two backends are timed.
+"""
+
+import time
+
+import numpy as np
+
+import cgraph as cg
+from bench_cse import scene
+
+def best_of(func, repeat=50):
+    t = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        t.append(time.perf_counter() - t0)
+    return min(t)
+
+if __name__ == '__main__':
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    f = scene()
+
+    backends = ['tape', 'codegen']
+    if cg.jit_available:
+        backends.append('jit')
+    else:
+        print('numba is not installed, skipping jit backend')
+
+    for n in [1, 100, 10000]:
+        xs = np.random.uniform(-2, 2, size=n)
+        ys = np.random.uniform(-2, 2, size=n)
+        for backend in backends:
+            F = cg.Function(f, [x, y], backend=backend)
+            F(xs, ys, compute_gradient=True)
+            v = best_of(lambda: F(xs, ys))
+            g = best_of(lambda: F(xs, ys, compute_gradient=True))
+            print('{:>6} samples {:<8} value {:8.3f}ms gradient {:8.3f}ms'.format(n, backend, v*1e3, g*1e3))
@@ -0,0 +1,47 @@
+"""Compares the peak memory of gradient computations on a deep SDF over a grid.
+
+`numeric_gradient` keeps the values and derivatives of all nodes alive. Tapes
+release slots once they have been differentiated, or, in forward mode, once
+they have been read for the last time. Checkpointing additionally drops most
+values of the forward sweep and recomputes them segment by segment.
+"""
+
+from contextlib import ExitStack
+import time
+
+import numpy as np
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def nested_scene(depth):
+    with ExitStack() as stack:
+        s = sdf.Box(minc=[-0.2, -0.2], maxc=[0.2, 0.2])
+        for i in range(depth):
+            stack.enter_context(sdf.transform(angle=0.2, offset=[0.1, 0.05]))
+            s = s | sdf.Circle(center=[0.1, 0.1], radius=0.2)
+    return s
+
+def measure(name, func, *args, **kwargs):
+    t = time.perf_counter()
+    r, nbytes = cg.peak_memory(func, *args, **kwargs)
+    t = time.perf_counter() - t
+    print('{:<32} peak {:8.1f}MB time {:8.2f}s'.format(name, nbytes / 2**20, t))
+
+if __name__ == '__main__':
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    s = nested_scene(32)
+    gx, gy = np.mgrid[-2:2:500j, -2:2:500j]
+    xs = gx.reshape(-1)
+    ys = gy.reshape(-1)
+    tape = s.tape
+    print('Grid 500x500, {} instructions'.format(len(tape.code)))
+
+    measure('numeric_gradient', cg.numeric_gradient, s.sdf, {x:xs, y:ys})
+    measure('tape values + backward', lambda: tape.backward(tape.values(xs, ys), [None]*(len(tape.slots)-1) + [1]))
+    measure('tape gradient', tape.gradient, xs, ys)
+    for c in [200, 50, 20]:
+        measure('tape gradient checkpoint={}'.format(c), tape.gradient, xs, ys, checkpoint=c)
+    measure('tape forward gradient', tape.forward_gradient, xs, ys)
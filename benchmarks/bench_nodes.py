@@ -0,0 +1,41 @@
+"""Measures memory per node and construction time of expressions.
+
+Nodes declare `__slots__` and keep their children in a tuple. For comparison,
+node classes derived without `__slots__` carry a `__dict__` per instance.
+"""
+
+import time
+import tracemalloc
+
+import cgraph as cg
+
+class DictAdd(cg.Add):
+    pass
+
+class DictMul(cg.Mul):
+    pass
+
+def chain(n, add, mul):
+    """Returns an expression of `n` alternating additions and multiplications of a symbol."""
+    x = cg.Symbol('x')
+    f = x
+    for i in range(n // 2):
+        f = add(children=(mul(children=(f, x)), x))
+    return f
+
+if __name__ == '__main__':
+    n = 200000
+    for name, add, mul in [('slots', cg.Add, cg.Mul), ('dict', DictAdd, DictMul)]:
+        tracemalloc.start()
+        t = time.perf_counter()
+        f = chain(n, add, mul)
+        elapsed = time.perf_counter() - t
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print('{:<6} {:8.1f} bytes/node {:8.3f}s construction'.format(name, size / n, elapsed))
+        del f
+
+    x = cg.Symbol('x')
+    t = time.perf_counter()
+    f = cg.sym_sum([x * i + 1 for i in range(n // 3)])
+    print('{:<6} {:8} nodes   {:8.3f}s construction by sym_* builders'.format('sum', len(cg.topological_order(f)), time.perf_counter() - t))
@@ -0,0 +1,55 @@
+"""Compares fitting a line by a hand-rolled descent loop to the optimizers of `cg.optimize`.
+
+The hand-rolled loop updates a dictionary of symbol values with a fixed step
+and evaluates the objective again to report the error, as the line fitting
+application used to. The optimizers run on flat parameter vectors over a
+compiled function, reuse the value of each gradient pass and stop once the
+gradient vanishes.
+"""
+
+import time
+
+import numpy as np
+
+import cgraph as cg
+
+def problem(n):
+    rnd = np.random.RandomState(0)
+    x = np.linspace(0, 10, n)
+    y = 0.8 * x + 2 + rnd.normal(scale=0.1, size=n)
+    w = [cg.Symbol('w0'), cg.Symbol('w1')]
+    r = w[0] * cg.Constant(x) + w[1] - cg.Constant(y)
+    return w, r, cg.sym_reduce_sum(r**2) / n
+
+def hand_rolled(f, w, iterations=200, lam=0.02):
+    guess = {w[0]: 0.4, w[1]: 1.1}
+    cache = cg.EvaluationCache()
+    for i in range(iterations):
+        df = cache.numeric_gradient(f, guess)
+        guess[w[0]] -= lam * df[w[0]]
+        guess[w[1]] -= lam * df[w[1]]
+        cache.value(f, guess)
+    return float(np.sum(cg.value(f, guess)))
+
+def timed(func):
+    t = time.perf_counter()
+    r = func()
+    return time.perf_counter() - t, r
+
+if __name__ == '__main__':
+    for n in [1000, 100000]:
+        w, r, f = problem(n)
+        print('n = {}'.format(n))
+        print('{:>22} {:>12} {:>12} {:>8}'.format('method', 'time', 'error', 'evals'))
+        t, v = timed(lambda: hand_rolled(f, w))
+        print('{:>22} {:>10.2f}ms {:>12.6f} {:>8}'.format('hand-rolled', t * 1e3, v, 400))
+        runs = [
+            ('gradient_descent', lambda: cg.optimize.gradient_descent(f, w, [0.4, 1.1])),
+            ('lbfgs', lambda: cg.optimize.lbfgs(f, w, [0.4, 1.1])),
+            ('gauss_newton', lambda: cg.optimize.gauss_newton(r, w, [0.4, 1.1])),
+            ('levenberg_marquardt', lambda: cg.optimize.levenberg_marquardt(r, w, [0.4, 1.1])),
+        ]
+        for name, run in runs:
+            t, res = timed(run)
+            error = res.value * 2 / n if name in ('gauss_newton', 'levenberg_marquardt') else res.value
+            print('{:>22} {:>10.2f}ms {:>12.6f} {:>8}'.format(name, t * 1e3, error, res.evaluations))
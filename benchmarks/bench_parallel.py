@@ -0,0 +1,34 @@
+"""Compares serial and parallel evaluation of SDF gradients on a high resolution grid.
+
+The grid is partitioned among threads or processes by `cgraph.parallel`.
+Speedups depend on the number of cores and on how much of the evaluation
+is spent in numpy kernels that release the GIL.
+"""
+
+from contextlib import ExitStack
+import os
+import time
+
+import cgraph.sdf as sdf
+
+def nested_scene(depth):
+    with ExitStack() as stack:
+        s = sdf.Box(minc=[-0.2, -0.2], maxc=[0.2, 0.2])
+        for i in range(depth):
+            stack.enter_context(sdf.transform(angle=0.2, offset=[0.1, 0.05]))
+            s = s | sdf.Circle(center=[0.1, 0.1], radius=0.2)
+    return s
+
+if __name__ == '__main__':
+    s = nested_scene(16)
+    samples = [1000j, 1000j]
+    print('{} cores, grid 1000x1000'.format(os.cpu_count()))
+
+    t = time.perf_counter()
+    sdf.grid_eval(s, samples=samples)
+    print('{:<16} {:6.2f}s'.format('serial', time.perf_counter() - t))
+
+    for workers in [2, 4, 8]:
+        t = time.perf_counter()
+        sdf.grid_eval(s, samples=samples, workers=workers)
+        print('{:<16} {:6.2f}s'.format('{} threads'.format(workers), time.perf_counter() - t))
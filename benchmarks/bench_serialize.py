@@ -0,0 +1,43 @@
+"""Compares loading a large SDF scene from a file with constructing it again.
+
+The scene is the union of many circles. It is saved by `cg.save` and loaded
+into memory, or memory mapped. Pickle is shown for reference, it fails with
+a recursion error for deep expressions.
+"""
+
+import os
+import pickle
+import tempfile
+import time
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def scene(n):
+    s = sdf.Circle(center=[0, 0], radius=0.1)
+    for i in range(1, n):
+        s |= sdf.Circle(center=[i % 100, i // 100], radius=0.1)
+    return s.sdf
+
+def measure(name, func, *args, **kwargs):
+    t = time.perf_counter()
+    try:
+        r = func(*args, **kwargs)
+        print('{:<16} {:8.3f}s'.format(name, time.perf_counter() - t))
+    except RecursionError:
+        r = None
+        print('{:<16} recursion error'.format(name))
+    return r
+
+if __name__ == '__main__':
+    path = os.path.join(tempfile.mkdtemp(), 'scene.cgraph')
+
+    f = measure('construct', scene, 20000)
+    measure('save', cg.save, f, path)
+    print('{:<16} {:8.1f}MB'.format('file size', os.path.getsize(path) / 2**20))
+    measure('load', cg.load, path)
+    measure('load mmap', cg.load, path, mmap=True)
+    a = cg.to_arrays(f)
+    cg.save(a, path)
+    measure('load ArrayGraph', cg.load, path, mmap=True)
+    measure('pickle', pickle.dumps, f)
@@ -0,0 +1,63 @@
+"""Benchmarks simplification of symbolic derivatives.
+
+Uses the least squares objective of `cgraph.app.function_optimization` and
+reports, for first and second order symbolic derivatives, the number of unique
+nodes before and after `simplify`, the time spent simplifying and the time to
+evaluate the derivative expressions. Simplification time is expected to scale
+linearly with the number of residuals.
+
+Finally the default rule set is extended by a large number of additional
+rules. Since rules are indexed by the types of the nodes they match, the
+simplification time should stay roughly the same.
+
+    python benchmarks/bench_simplify.py
+"""
+
+import time
+
+import numpy as np
+
+import cgraph as cg
+
+def objective(w, n):
+    """Returns the mean of `n` squared residuals of a line model."""
+    xy = np.random.uniform(size=(2, n))
+    return cg.sym_sum([(w[0] * xy[0,i] + w[1] - xy[1,i])**2 for i in range(n)]) / n
+
+def timed(func):
+    t0 = time.perf_counter()
+    r = func()
+    return r, time.perf_counter() - t0
+
+if __name__ == '__main__':
+    w = [cg.Symbol('w0'), cg.Symbol('w1')]
+    fargs = {w[0]: 0.5, w[1]: 1.0}
+
+    print('{:>8} {:>12} {:>10} {:>10} {:>12} {:>12} {:>12}'.format(
+        'n', 'derivative', 'nodes', 'simplified', 'simplify', 'value', 'value simpl.'))
+    for n in [100, 1000, 10000]:
+        f = objective(w, n)
+        d = cg.symbolic_gradient(f)
+        dd = cg.symbolic_gradient(d[w[0]])
+        for name, e in [('df/dw0', d[w[0]]), ('ddf/dw0dw0', dd[w[0]]), ('ddf/dw0dw1', dd[w[1]])]:
+            s, t_s = timed(lambda: cg.simplify(e))
+            _, t_e = timed(lambda: cg.value(e, fargs))
+            _, t_se = timed(lambda: cg.value(s, fargs))
+            print('{:>8} {:>12} {:>10} {:>10} {:>10.1f}ms {:>10.1f}ms {:>10.1f}ms'.format(
+                n, name, len(cg.topological_order(e)), len(cg.topological_order(s)), 
+                t_s * 1e3, t_e * 1e3, t_se * 1e3))
+
+    print()
+    print('{:>8} {:>12}'.format('rules', 'simplify'))
+    f = objective(w, 1000)
+    e = cg.symbolic_gradient(f)[w[0]]
+    rules = cg.RuleSet()
+    rules.rules = list(cg.simplification_rules.rules)
+    a = cg.Wildcard('a')
+    for name in ['sym_sin', 'sym_cos', 'sym_exp', 'sym_log', 'sym_sqrt']:
+        func = getattr(cg, name)
+        for i in range(2, 42):
+            cg.register_rule(func(a * i) - func(i * a), 0, rules=rules)
+    for r in [cg.simplification_rules, rules]:
+        _, t = timed(lambda: cg.simplify(e, rules=r))
+        print('{:>8} {:>10.1f}ms'.format(len(r.rules), t * 1e3))
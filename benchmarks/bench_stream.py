@@ -0,0 +1,43 @@
+"""Measures peak memory of streaming SDF evaluation over memory mapped point clouds.
+
+Points are stored on disk as `np.memmap`. Evaluating them at once holds all
+intermediates of the batch in memory, while `stream.evaluate` bounds memory
+by the chunk size.
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import cgraph as cg
+import cgraph.sdf as sdf
+import cgraph.stream as stream
+
+if __name__ == '__main__':
+    s = sdf.Circle(center=[0.5, 0], radius=1.)
+    for i in range(10):
+        s = s | sdf.Circle(center=[0.1*i, 0.2*i], radius=0.3)
+    s = cg.Function(s.sdf, [cg.Symbol('x'), cg.Symbol('y')], buffered=True)
+
+    n = 2 * 10**6
+    with tempfile.TemporaryDirectory() as tmp:
+        xs = np.memmap(os.path.join(tmp, 'x.bin'), dtype=np.float64, mode='w+', shape=(n,))
+        ys = np.memmap(os.path.join(tmp, 'y.bin'), dtype=np.float64, mode='w+', shape=(n,))
+        xs[:] = np.random.uniform(-2, 2, n)
+        ys[:] = np.random.uniform(-2, 2, n)
+        d = np.memmap(os.path.join(tmp, 'd.bin'), dtype=np.float64, mode='w+', shape=(n,))
+
+        print('{} points on disk'.format(n))
+        t = time.perf_counter()
+        v, nbytes = cg.peak_memory(s, xs, ys)
+        print('{:<22} peak {:8.1f}MB time {:6.2f}s'.format('in memory', nbytes / 2**20, time.perf_counter() - t))
+        del v
+
+        for chunksize in [2**14, 2**16, 2**18]:
+            t = time.perf_counter()
+            r, nbytes = cg.peak_memory(stream.evaluate, s, xs, ys, out=d, chunksize=chunksize)
+            print('{:<22} peak {:8.1f}MB time {:6.2f}s'.format(
+                'chunks of {}'.format(chunksize), nbytes / 2**20, time.perf_counter() - t))
+        del xs, ys, d, r
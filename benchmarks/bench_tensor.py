@@ -0,0 +1,38 @@
+"""Compares the line fitting objective built per sample with the one built from tensor nodes.
+
+The per sample objective has a subtree of nodes for each point, the tensor
+objective computes all residuals by a few nodes operating on arrays and sums
+them by `cg.sym_reduce_sum`. Times include building the expression and
+computing its value and gradient once.
+"""
+
+import time
+
+import numpy as np
+
+import cgraph as cg
+
+def points(n):
+    x = np.linspace(0, 10, n)
+    return x, x * 0.8 + 2.0 + np.random.normal(scale=0.1, size=n)
+
+def per_sample(w, x, y):
+    n = len(x)
+    return cg.sym_sum([(w[0] * x[i] + w[1] - y[i])**2 for i in range(n)]) / n
+
+def tensor(w, x, y):
+    r = w[0] * cg.Constant(x) + w[1] - cg.Constant(y)
+    return cg.sym_reduce_sum(r**2) / len(x)
+
+if __name__ == '__main__':
+    w = [cg.Symbol('w0'), cg.Symbol('w1')]
+    for n in [1000, 10000, 1000000]:
+        x, y = points(n)
+        for name, build in [('per sample', per_sample), ('tensor', tensor)]:
+            if build is per_sample and n > 10000:
+                continue
+            t = time.perf_counter()
+            f = build(w, x, y)
+            nodes = len(cg.topological_order(f))
+            v, g = cg.Function(f, w)(0.4, 1.1, compute_gradient=True)
+            print('{:<8} {:<11} {:8} nodes {:8.3f}s'.format(n, name, nodes, time.perf_counter() - t))
@@ -0,0 +1,81 @@
+"""Benchmarks traversals of wide and deep expression trees.
+
+`sym_sum` creates a single node with one child per summand, as done by the
+least squares objective in `cgraph.app.function_optimization`. This script
+times `bfs`, `numeric_gradient` and `symbolic_gradient` for increasing number
+of children. All of them are expected to scale linearly.
+
+Additionally the explicit stack `postorder` is compared to a recursive
+generator implementation on a shallow SDF scene and on `Add` chains, which
+exceed Python's recursion limit for the recursive version.
+
+    python benchmarks/bench_traversal.py
+"""
+
+import time
+
+import numpy as np
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def residuals(w, n):
+    """Returns the sum of `n` squared residuals of a line model."""
+    xy = np.random.uniform(size=(2, n))
+    return cg.sym_sum([(w[0] * xy[0,i] + w[1] - xy[1,i])**2 for i in range(n)])
+
+def walk_bfs(f):
+    gen = cg.bfs(f, None)
+    try:
+        n, d = next(gen)
+        while True:
+            n, d = gen.send([None] * len(n.children))
+    except StopIteration:
+        pass
+
+def recursive_postorder(node):
+    """Reference post-order traversal using recursive generators."""
+    for c in node.children:
+        yield from recursive_postorder(c)
+    yield node
+
+def chain(n):
+    """Returns an expression of `n` chained additions."""
+    x = cg.Symbol('x')
+    f = x
+    for i in range(n):
+        f = f + x
+    return f
+
+def timed(func):
+    t0 = time.perf_counter()
+    func()
+    return time.perf_counter() - t0
+
+if __name__ == '__main__':
+    w = [cg.Symbol('w0'), cg.Symbol('w1')]
+    fargs = {w[0]: 0.5, w[1]: 1.0}
+
+    print('{:>8} {:>12} {:>18} {:>18}'.format('children', 'bfs', 'numeric_gradient', 'symbolic_gradient'))
+    for n in [1000, 10000, 100000]:
+        f = residuals(w, n)
+        print('{:>8} {:>10.1f}ms {:>16.1f}ms {:>16.1f}ms'.format(
+            n, 
+            timed(lambda: walk_bfs(f)) * 1e3,
+            timed(lambda: cg.numeric_gradient(f, fargs)) * 1e3,
+            timed(lambda: cg.symbolic_gradient(f)) * 1e3))
+
+    print()
+    print('{:>16} {:>12} {:>12}'.format('tree', 'recursive', 'postorder'))
+    s = sdf.Circle()
+    for i in range(20):
+        with sdf.transform(angle=0.1 * i, offset=[0.1 * i, 0]):
+            s |= sdf.Box()
+    trees = [('sdf scene', s.sdf), ('chain 500', chain(500)), ('chain 100000', chain(100000))]
+    for name, f in trees:
+        try:
+            t_rec = '{:.1f}ms'.format(timed(lambda: list(recursive_postorder(f))) * 1e3)
+        except RecursionError:
+            t_rec = 'RecursionError'
+        t_it = '{:.1f}ms'.format(timed(lambda: list(cg.postorder(f))) * 1e3)
+        print('{:>16} {:>12} {:>12}'.format(name, t_rec, t_it))
@@ -0,0 +1,41 @@
+"""Compares gradients of an SDF scene with respect to all nodes and to the symbols only.
+
+Most leaves of SDF expressions are constants, such as the coefficients of
+transformed coordinates. Passing `wrt` skips their derivatives and drops
+intermediate derivatives once propagated. Tapes always restrict the reverse
+sweep to slots depending on their symbols.
+"""
+
+from contextlib import ExitStack
+import time
+
+import numpy as np
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def nested_scene(depth):
+    with ExitStack() as stack:
+        s = sdf.Box(minc=[-0.2, -0.2], maxc=[0.2, 0.2])
+        for i in range(depth):
+            stack.enter_context(sdf.transform(angle=0.2, offset=[0.1, 0.05]))
+            s = s | sdf.Circle(center=[0.1, 0.1], radius=0.2)
+    return s
+
+def measure(name, func, *args, **kwargs):
+    t = time.perf_counter()
+    for i in range(5):
+        func(*args, **kwargs)
+    print('{:<32} {:8.3f}s'.format(name, (time.perf_counter() - t) / 5))
+
+if __name__ == '__main__':
+    s = nested_scene(64)
+    x, y = s.syms[0][1], s.syms[1][1]
+    gx, gy = np.mgrid[-2:2:300j, -2:2:300j]
+    fargs = {x: gx.reshape(-1), y: gy.reshape(-1)}
+
+    tape = s.tape
+    print('{} instructions, {} depending on symbols'.format(len(tape.code), len(tape.reaching([0, 1])) - 2))
+    measure('numeric_gradient', cg.numeric_gradient, s.sdf, fargs)
+    measure('numeric_gradient wrt=[x, y]', cg.numeric_gradient, s.sdf, fargs, wrt=[x, y])
+    measure('Tape.gradient', tape.gradient, fargs[x], fargs[y])
@@ -17,6 +17,16 @@ Christoph Heindl, 2017
 """
 
 from .cgraph import *
+from .rewrite import *
+from .generator import *
+from .fused import *
+from .cache import *
+from .incremental import *
+from .tensor import *
+from .arrays import *
+from .serialize import *
+from .data import *
+from . import optimize
 
 # Needs to be last line
 __version__ = '1.2.1'
\ No newline at end of file
@@ -12,20 +12,17 @@ def generate_points(n, k, d):
     y = x * k + d + np.random.normal(scale=0.1, size=n)
     return np.vstack((x,y))
 
-def sum_residuals_squared(w, xy):
+def sum_residuals_squared(w, x, y):
     """Returns the symbolic computational graph for the objective minimization
     
     In particular this builds the computational graph that computes the average
     squared algebraic distance between the given samples and the line expressed 
-    through parameters w0 and w1.
+    through parameters w0 and w1. The samples are given by the placeholders
+    x and y, which are bound to the coordinates of all samples or of a batch
+    of samples when the objective is evaluated.
     """
-    n = xy.shape[1]
-    residuals = []
-    for i in range(n):
-        r = w[0] * xy[0,i] + w[1] - xy[1,i]
-        residuals.append(r**2)
-
-    return cg.sym_sum(residuals) / n
+    r = w[0] * x + w[1] - y
+    return cg.sym_mean(r**2)
 
 def least_squares(xy):
     """Returns the line parameters through ordinary least squares regression."""
@@ -37,50 +34,52 @@ def least_squares(xy):
     return np.dot(np.dot(np.linalg.inv(np.dot(A.T,A)), A.T), b)
 
 
-def steepest_descent(f, w, guess):
+def steepest_descent(f, w, guess, data):
     print('Entering steepest descent')
 
-    lam = 0.02
+    # Descends on a flat parameter vector with a line search per step. The
+    # error printed is the value computed by the gradient pass of each step.
+    def report(result):
+        print('Error {}'.format(result.value))
 
-    for i in range(200):
-        # Auto-diff, could also do f.sdiff() + eval for symbolic diff.        
-        df = cg.numeric_gradient(f, guess)
+    r = cg.optimize.gradient_descent(f, w, [guess[w[0]], guess[w[1]]], callback=report, data=data)
 
-        guess[w[0]] -= lam * df[w[0]]
-        guess[w[1]] -= lam * df[w[1]]
+    guess[w[0]] = r.p[0]
+    guess[w[1]] = r.p[1]
+    return guess
 
-        print('Error {}'.format(cg.value(f, guess)))
+def stochastic_descent(f, w, guess, data):
+    print('Entering stochastic descent')
 
-    return guess
+    # Each step evaluates the gradient on a mini-batch of samples only.
+    batches = cg.MiniBatches(data, batch_size=8)
+    r = cg.optimize.stochastic_gradient_descent(f, w, [guess[w[0]], guess[w[1]]], batches, learning_rate=0.002, max_iter=1000)
 
-def newton_descent(f, w, guess):
-    print('Entering Newton descent')
+    guess[w[0]] = r.p[0]
+    guess[w[1]] = r.p[1]
 
-    d1 = cg.symbolic_gradient(f)        # gives df/dw0, df/dw1
-    d2w0 = cg.symbolic_gradient(d1[w[0]]) # gives ddf/dw0dw0, ddf/dw0dw1,
-    d2w1 = cg.symbolic_gradient(d1[w[1]]) # gives ddf/dw1dw1, ddf/dw1dw0,
+    fargs = dict(data)
+    fargs.update(guess)
+    print('Error {}'.format(cg.value(f, fargs)))
+    return guess
 
-    def nhessian(guess):
-        h = np.zeros((2,2))
-        h[0,0] = cg.value(d2w0[w[0]], guess)
-        h[0,1] = cg.value(d2w0[w[1]], guess)
-        h[1,0] = cg.value(d2w1[w[0]], guess)
-        h[1,1] = cg.value(d2w1[w[1]], guess)
-        return h
+def newton_descent(f, w, guess, data):
+    print('Entering Newton descent')
 
-    def ngrad(guess):
-        g = np.zeros((2,1))
-        g[0, 0] = cg.value(d1[w[0]], guess)
-        g[1, 0] = cg.value(d1[w[1]], guess)
-        return g
+    # Gradient and Hessian are computed numerically from the compiled
+    # objective by forward-over-reverse differentiation.
+    H = cg.hessian(cg.bind_data(f, data), w)
+    g, h = H(guess[w[0]], guess[w[1]], return_gradient=True)
 
     # Single step is enough, since our objective function
     # is of quadric shape.
-    step = np.linalg.inv(nhessian(guess)).dot(ngrad(guess))
-    guess[w[0]] -= step[0,0]
-    guess[w[1]] -= step[1,0]
+    step = np.linalg.solve(h, g)
+    guess[w[0]] -= step[0]
+    guess[w[1]] -= step[1]
 
-    print('Error {}'.format(cg.value(f, guess)))
+    fargs = dict(data)
+    fargs.update(guess)
+    print('Error {}'.format(cg.value(f, fargs)))
 
     return guess
 
@@ -98,17 +97,24 @@ if __name__ == '__main__':
         cg.Symbol('w0'),
         cg.Symbol('w1')
     ]   
+
+    # The coordinates of the samples
+    x = cg.Placeholder('x')
+    y = cg.Placeholder('y')
+    data = {x: samples[0], y: samples[1]}
     
     # Build the computational graph
-    f = sum_residuals_squared(w, samples)
+    f = sum_residuals_squared(w, x, y)
     
-    s_sd = steepest_descent(f, w, {w[0]: 0.4, w[1]: 1.1})
-    s_nd = newton_descent(f, w, {w[0]: 0.4, w[1]: 1.1})
+    s_sd = steepest_descent(f, w, {w[0]: 0.4, w[1]: 1.1}, data)
+    s_st = stochastic_descent(f, w, {w[0]: 0.4, w[1]: 1.1}, data)
+    s_nd = newton_descent(f, w, {w[0]: 0.4, w[1]: 1.1}, data)
     s_fit = least_squares(samples)
 
     # Draw results
     plt.plot([0, 10], [0*s_fit[0]+s_fit[1], 10*s_fit[0]+s_fit[1]], color='r', linestyle='-', label='Least Squares')
     plt.plot([0, 10], [0*s_sd[w[0]]+s_sd[w[1]], 10*s_sd[w[0]]+s_sd[w[1]]], color='g', linestyle='-', label='Steepest Descent')
+    plt.plot([0, 10], [0*s_st[w[0]]+s_st[w[1]], 10*s_st[w[0]]+s_st[w[1]]], color='m', linestyle='-', label='Stochastic Descent')
     plt.plot([0, 10], [0*s_nd[w[0]]+s_nd[w[1]], 10*s_nd[w[0]]+s_nd[w[1]]], color='b', linestyle='-', label='Newton Descent')
     plt.plot([0, 10], [0*k+d, 10*k+d], color='k', linestyle=':', label='Ground Truth')
     
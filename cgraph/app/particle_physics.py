@@ -40,6 +40,10 @@ class ParticleSimulation:
     to add new forces to the array of forces. Each force generator is a callable
     that takes two arguments (particle state, time) and shell return a nx2 float
     array of forces for each particle.
+
+    Signed distance functions given as `cg.Function` are evaluated by generated
+    code, fused by numba if available, since they are queried every step for
+    a small number of particles.
     
     """
 
@@ -49,6 +53,8 @@ class ParticleSimulation:
         self.dt = timestep
         self.n = n
         
+        if isinstance(f, cg.Function):
+            f = cg.Function(f.f, [s for i, s in f.syms], backend='jit')
         self.sdf = f
         self.force_generators = []
         self.collection = None
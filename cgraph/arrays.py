@@ -0,0 +1,267 @@
+"""CGraph - symbolic computation in Python library.
+
+This library is the result of my efforts to understand symbolic computation of
+functions factored as expression trees. In a few lines of code it shows how to
+forward evaluate functions and how to perform numeric and symbolic derivatives
+computations using backpropagation.
+
+While this library is not complete (and will never be) it offers the interested
+reader some insights on one way in which symbolic computation can be performed.
+
+The code is accompanied by a series of notebooks that explain the fundamental
+concepts. You can find these notebooks online at
+
+    https://github.com/cheind/py-cgraph
+
+Christoph Heindl, 2017
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+import cgraph as cg
+
+__all__ = ['ArrayGraph', 'to_arrays']
+
+def operator_key(node):
+    """Returns a hashable key that is equal for nodes computing the same operation."""
+    if isinstance(node, cg.Symbol):
+        return (cg.Symbol, node.name)
+    return (type(node), len(node.children), node.attributes())
+
+def attribute_names(klass):
+    """Returns the names of the attributes of nodes of type `klass` other than their children."""
+    names = []
+    for k in reversed(klass.__mro__):
+        for name in k.__dict__.get('__slots__', ()):
+            if name not in ('children', '__weakref__', '__dict__') and name not in names:
+                names.append(name)
+    return names
+
+def attribute_state(node):
+    """Returns the list of names and values of the attributes of `node` other than its children."""
+    state = [(name, getattr(node, name)) for name in attribute_names(type(node))]
+    if hasattr(node, '__dict__'):
+        state.extend(node.__dict__.items())
+    return state
+
+class ArrayGraph:
+    """An expression graph stored in a few contiguous numpy arrays.
+
+    Nodes are numbered in topological order, so children precede their parents,
+    and nodes shared by multiple parents are stored once. For each node `ops`
+    holds the index of its operation in `operators`, a list of childless nodes
+    with one entry per distinct operation and symbol. Negative codes `-k-1`
+    denote the `k`-th constant instead. Children are stored in compressed sparse
+    row layout: the children of node `i` are `indices[offsets[i]:offsets[i+1]]`.
+    The values of all constants are concatenated in `data`, constant `k` being
+    `data[const_offsets[k]:const_offsets[k+1]]` of shape `const_shapes[k]`,
+    where unused trailing dimensions are `-1`, and of type `const_types[k]`.
+
+    Compared to a tree of `Node` objects, this takes a fraction of the memory
+    for large expressions. Values and derivatives are computed directly from the
+    arrays by the operators, see `value` and `numeric_gradient`.
+
+        g = cg.to_arrays(f)
+        v = g.value({x: 2, y: 3})
+        f = g.to_nodes()
+    """
+
+    def __init__(self, ops, offsets, indices, operators, data, const_offsets, const_shapes, const_types, outputs, multiple=False):
+        self.ops = ops
+        self.offsets = offsets
+        self.indices = indices
+        self.operators = operators
+        self.data = data
+        self.const_offsets = const_offsets
+        self.const_shapes = const_shapes
+        self.const_types = const_types
+        self.outputs = outputs
+        self.multiple = multiple
+        self.elementwise = all(op.elementwise for op in operators)
+
+    @classmethod
+    def from_nodes(cls, f):
+        """Returns the array graph of the expression `f`, or list of expressions."""
+        roots = list(f) if isinstance(f, (list, tuple)) else [f]
+
+        index = {}
+        ops = []
+        counts = []
+        indices = []
+        operators = []
+        codes = {}
+        constants = []
+        for r in roots:
+            for n in cg.topological_order(r):
+                if n in index:
+                    continue
+                index[n] = len(ops)
+                if isinstance(n, cg.Constant):
+                    ops.append(-len(constants) - 1)
+                    constants.append(n.value)
+                else:
+                    key = operator_key(n)
+                    code = codes.get(key)
+                    if code is None:
+                        code = codes[key] = len(operators)
+                        operators.append(n if isinstance(n, cg.Symbol) else cg.with_children(n, (None,)*len(n.children)))
+                    ops.append(code)
+                counts.append(len(n.children))
+                indices.extend(index[c] for c in n.children)
+
+        offsets = np.zeros(len(ops) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        dtype = np.result_type(*constants) if constants else np.float64
+        data = np.concatenate([c.ravel() for c in constants]).astype(dtype) if constants else np.zeros(0)
+        const_offsets = np.zeros(len(constants) + 1, dtype=np.int64)
+        np.cumsum([c.size for c in constants], out=const_offsets[1:])
+        ndim = max([c.ndim for c in constants] + [1])
+        const_shapes = np.full((len(constants), ndim), -1, dtype=np.int64)
+        for k, c in enumerate(constants):
+            const_shapes[k, :c.ndim] = c.shape
+        const_types = np.array([c.dtype.char for c in constants], dtype='S1')
+
+        return cls(
+            np.array(ops, dtype=np.int32), offsets, np.array(indices, dtype=np.int32),
+            operators, data, const_offsets, const_shapes, const_types,
+            np.array([index[r] for r in roots], dtype=np.int32), isinstance(f, (list, tuple)))
+
+    def __len__(self):
+        return len(self.ops)
+
+    @property
+    def nbytes(self):
+        """Returns the number of bytes of the arrays of the graph."""
+        arrays = [self.ops, self.offsets, self.indices, self.data, self.const_offsets, self.const_shapes, self.const_types, self.outputs]
+        return sum(a.nbytes for a in arrays)
+
+    @property
+    def symbols(self):
+        """Returns the list of symbols of the graph."""
+        return [op for op in self.operators if isinstance(op, cg.Symbol)]
+
+    def constant(self, k):
+        """Returns the value of the `k`-th constant."""
+        shape = tuple(int(d) for d in self.const_shapes[k] if d >= 0)
+        v = self.data[self.const_offsets[k]:self.const_offsets[k+1]].reshape(shape)
+        dtype = np.dtype(self.const_types[k].decode())
+        return v if v.dtype == dtype else v.astype(dtype)
+
+    def constants(self):
+        """Returns the list of values of all constants, views into `data` unless types differ."""
+        data = self.data.view(np.ndarray)
+        o = self.const_offsets.tolist()
+        dtypes = dict((t, np.dtype(t.decode())) for t in set(self.const_types.tolist()))
+        values = []
+        for k, (shape, t) in enumerate(zip(self.const_shapes.tolist(), self.const_types.tolist())):
+            v = data[o[k]:o[k+1]].reshape([d for d in shape if d >= 0])
+            values.append(v if v.dtype == dtypes[t] else v.astype(dtypes[t]))
+        return values
+
+    def children(self, i):
+        """Returns the list of indices of the children of node `i`."""
+        return self.indices[self.offsets[i]:self.offsets[i+1]].tolist()
+
+    def to_nodes(self):
+        """Returns the expression, or list of expressions, as tree of `Node` objects."""
+        offsets = self.offsets.tolist()
+        indices = self.indices.tolist()
+        constants = self.constants()
+        states = [attribute_state(op) for op in self.operators]
+        nodes = []
+        for i, code in enumerate(self.ops.tolist()):
+            if code < 0:
+                nodes.append(cg.Constant(constants[-code - 1]))
+                continue
+            op = self.operators[code]
+            if isinstance(op, cg.Symbol):
+                nodes.append(op)
+                continue
+            n = type(op).__new__(type(op))
+            n.children = tuple([nodes[c] for c in indices[offsets[i]:offsets[i+1]]])
+            for name, v in states[code]:
+                setattr(n, name, v)
+            nodes.append(n)
+        roots = [nodes[o] for o in self.outputs.tolist()]
+        return roots if self.multiple else roots[0]
+
+    def evaluate(self, fargs, release=None):
+        """Returns the list of values of all nodes, releasing the nodes listed in `release` per node."""
+        fargs = cg.numpyify(fargs)
+        offsets = self.offsets.tolist()
+        indices = self.indices.tolist()
+        constants = self.constants()
+        v = [None] * len(self.ops)
+        for i, code in enumerate(self.ops.tolist()):
+            if code < 0:
+                v[i] = constants[-code - 1]
+            elif isinstance(self.operators[code], cg.Symbol):
+                v[i] = fargs[self.operators[code]]
+            else:
+                v[i] = self.operators[code].compute_value([v[c] for c in indices[offsets[i]:offsets[i+1]]])
+            if release is not None:
+                for c in release.pop(i, ()):
+                    v[c] = None
+        return v
+
+    def values(self, fargs):
+        """Returns the list of values of all nodes computed from the symbol values in `fargs`."""
+        return self.evaluate(fargs)
+
+    def value(self, fargs):
+        """Returns the value of the expression, or list of values, for the symbol values in `fargs`.
+
+        Values of nodes are released after their last use by a parent.
+        """
+        last = np.arange(len(self.ops))
+        parents = np.repeat(last, np.diff(self.offsets))
+        np.maximum.at(last, self.indices, parents)
+        release = defaultdict(list)
+        outputs = set(self.outputs.tolist())
+        for c, p in enumerate(last.tolist()):
+            if c not in outputs:
+                release[p].append(c)
+
+        v = self.evaluate(fargs, release)
+        r = [v[o] for o in self.outputs.tolist()]
+        return r if self.multiple else r[0]
+
+    def numeric_gradient(self, fargs, return_value=False):
+        """Returns a dictionary of partial derivatives of the first expression with respect to its symbols.
+
+        Derivatives are computed by a reverse sweep over the arrays and follow
+        the conventions of `cg.numeric_gradient`.
+        """
+        v = self.values(fargs)
+        ops = self.ops.tolist()
+        offsets = self.offsets.tolist()
+        indices = self.indices.tolist()
+        o = int(self.outputs[0])
+        d = [None] * (o + 1)
+        d[o] = np.ones(1) if self.elementwise else np.ones(np.shape(v[o]))
+        for i in reversed(range(o + 1)):
+            code = ops[i]
+            if d[i] is None or code < 0 or isinstance(self.operators[code], cg.Symbol):
+                continue
+            args = indices[offsets[i]:offsets[i+1]]
+            cv = [v[c] for c in args]
+            for c, gi in zip(args, self.operators[code].compute_vjp(cv, v[i], d[i])):
+                if not self.elementwise:
+                    gi = cg.unbroadcast(gi, np.shape(v[c]))
+                elif np.shape(gi) != np.shape(v[c]):
+                    gi = np.broadcast_to(gi, np.broadcast(gi, v[c]).shape)
+                d[c] = gi if d[c] is None else d[c] + gi
+
+        derivatives = {}
+        for i, code in enumerate(ops[:o+1]):
+            if code >= 0 and isinstance(self.operators[code], cg.Symbol):
+                derivatives[self.operators[code]] = 0. if d[i] is None else d[i]
+        if return_value:
+            return derivatives, v[o]
+        return derivatives
+
+def to_arrays(f):
+    """Returns the `ArrayGraph` of the expression `f`, or list of expressions."""
+    return ArrayGraph.from_nodes(f)
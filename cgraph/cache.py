@@ -0,0 +1,174 @@
+"""CGraph - symbolic computation in Python library.
+
+This library is the result of my efforts to understand symbolic computation of
+functions factored as expression trees. In a few lines of code it shows how to
+forward evaluate functions and how to perform numeric and symbolic derivatives
+computations using backpropagation.
+
+While this library is not complete (and will never be) it offers the interested
+reader some insights on one way in which symbolic computation can be performed.
+
+The code is accompanied by a series of notebooks that explain the fundamental
+concepts. You can find these notebooks online at
+
+    https://github.com/cheind/py-cgraph
+
+Christoph Heindl, 2017
+"""
+
+from collections import OrderedDict
+import hashlib
+import weakref
+
+import numpy as np
+
+import cgraph as cg
+from .cgraph import _backpropagate
+
+__all__ = ['EvaluationCache']
+
+def input_key(fargs):
+    """Returns a hashable key that is equal for symbol values of equal names, types, shapes and contents."""
+    key = []
+    for s, v in fargs.items():
+        v = np.atleast_1d(v)
+        h = hashlib.sha1(np.ascontiguousarray(v).view(np.uint8)).hexdigest() if v.size else ''
+        key.append((str(s), v.dtype.str, v.shape, h))
+    return tuple(sorted(key))
+
+def nbytes(d):
+    """Returns the number of bytes of the arrays in dictionary `d`."""
+    return sum(v.nbytes for v in d.values() if isinstance(v, np.ndarray))
+
+class EvaluationCache:
+    """Memoizes `values`, `value` and `numeric_gradient` of expressions.
+
+    Results are looked up by the structural hash of the expression and the
+    contents of the symbol values, so structurally identical expressions share
+    their value for equal arguments. Results keyed by nodes, i.e. `values` and
+    `numeric_gradient`, are only shared by the same expression object. The
+    structural hash is computed once per expression object, expressions are
+    therefore not expected to be modified after their first evaluation.
+
+    Values of all nodes computed for a gradient are kept along with the
+    derivatives, so that `value` right after `numeric_gradient` with the same
+    arguments, or vice versa, does not evaluate the expression again. Entries
+    are dropped in least recently used order once the arrays held exceed
+    `maxbytes`. Returned arrays are shared with the cache and must not be modified.
+
+        cache = cg.EvaluationCache()
+        d = cache.numeric_gradient(f, {x:2, y:3})
+        v = cache.value(f, {x:2, y:3}) # no evaluation
+        cache.hits, cache.misses # 1, 1
+    """
+
+    def __init__(self, maxbytes=2**28):
+        self.maxbytes = maxbytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.digests = weakref.WeakKeyDictionary()
+
+    def key(self, f, fargs):
+        """Returns the key of the results of `f` evaluated at `fargs`."""
+        d = self.digests.get(f)
+        if d is None:
+            d = cg.structural_hash(f)
+            self.digests[f] = d
+        return (d, input_key(fargs))
+
+    def lookup(self, key, kind, f=None):
+        """Returns the cached result of `kind` for `key` or `None`, counting hits and misses.
+
+        Results keyed by nodes are only returned for the expression `f` they were computed for.
+        """
+        e = self.entries.get(key)
+        if e is not None and e[kind] is not None and (f is None or e['root'] is f):
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return e[kind]
+        self.misses += 1
+        return None
+
+    def store(self, key, f, vals, derivatives=None):
+        """Stores values and optionally derivatives of `f` for `key`, dropping least recently used entries."""
+        e = self.entries.pop(key, None)
+        if e is not None:
+            self.nbytes -= e['nbytes']
+            if derivatives is None and e['root'] is f:
+                derivatives = e['gradient']
+        size = nbytes(vals) + (nbytes(derivatives) if derivatives is not None else 0)
+        if size > self.maxbytes:
+            return
+        self.entries[key] = {'root': f, 'value': vals[f], 'values': vals, 'gradient': derivatives, 'nbytes': size}
+        self.nbytes += size
+        while self.nbytes > self.maxbytes:
+            k, e = self.entries.popitem(last=False)
+            self.nbytes -= e['nbytes']
+            self.evictions += 1
+
+    def values(self, f, fargs):
+        """Returns the values of all nodes of `f`, see `cg.values`."""
+        key = self.key(f, fargs)
+        vals = self.lookup(key, 'values', f)
+        if vals is None:
+            vals = cg.values(f, fargs)
+            self.store(key, f, vals)
+        return vals
+
+    def value(self, f, fargs):
+        """Returns the value of `f`, see `cg.value`."""
+        key = self.key(f, fargs)
+        v = self.lookup(key, 'value')
+        if v is None:
+            vals = cg.values(f, fargs)
+            self.store(key, f, vals)
+            v = vals[f]
+        return v
+
+    def numeric_gradient(self, f, fargs, return_value=False):
+        """Returns the partial derivatives of `f` with respect to all nodes, see `cg.numeric_gradient`.
+
+        Cached values of `f` count as hit, only the derivatives are computed then.
+        """
+        key = self.key(f, fargs)
+        e = self.entries.get(key)
+        if e is not None and e['root'] is f:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            derivatives = e['gradient']
+            if derivatives is None:
+                derivatives = _backpropagate(f, e['values'])
+                self.store(key, f, e['values'], derivatives)
+            v = e['value']
+        else:
+            self.misses += 1
+            vals = cg.values(f, fargs)
+            derivatives = _backpropagate(f, vals)
+            self.store(key, f, vals, derivatives)
+            v = vals[f]
+
+        if return_value:
+            return derivatives, v
+        else:
+            return derivatives
+
+    def clear(self):
+        """Removes all entries and resets the statistics."""
+        self.entries.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """Returns a dictionary of hits, misses, evictions, number of entries and bytes held."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'nbytes': self.nbytes,
+        }
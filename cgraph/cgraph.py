@@ -17,18 +17,40 @@ Christoph Heindl, 2017
 """
 
 from collections import defaultdict
+from collections import deque
 from collections import Iterable
+from contextlib import contextmanager
 from numbers import Number
 import copy
+import hashlib
 import math
+import tracemalloc
 
 import numpy as np
 
 class Node:
-    """A base class for operations, symbols and constants in an expression tree."""
+    """A base class for operations, symbols and constants in an expression tree.
 
-    def __init__(self, nary=0):
-        self.children = [None]*nary
+    Nodes declare `__slots__` and hold their children in a tuple to keep large
+    expressions compact. Children are given on construction, as done by the
+    `sym_*` functions, and nodes are not modified afterwards. Subclasses with
+    additional attributes need to list them in their own `__slots__`.
+    """
+
+    __slots__ = ('children', '__weakref__')
+
+    commutative = False
+    """Whether the node's value is independent of the order of its two children."""
+
+    elementwise = True
+    """Whether the node's value is computed elementwise from broadcast child values."""
+
+    def __init__(self, nary=0, children=None):
+        if children is None:
+            children = (None,)*nary
+        elif len(children) != nary:
+            raise ValueError('{} requires {} children'.format(type(self).__name__, nary))
+        self.children = tuple(children)
 
     def __repr__(self):
         return self.__str__()
@@ -66,26 +88,122 @@ class Node:
     def __getitem__(self, key):
         return self.children[key]
 
-    def compute_value(self, cv):
-        """Return the node's value computed from the values of children given as array in `cv`."""
+    def compute_value(self, cv, out=None):
+        """Return the node's value computed from the values of children given as array in `cv`.
+
+        When `out` is given, the value is written into this preallocated array.
+        """
         raise NotImplementedError()
 
     def compute_gradient(self, cv, value):
-        """Return the node's numeric gradient evaluated."""
+        """Return the node's numeric gradient evaluated.
+
+        Local derivatives that are constant may be returned as plain numbers,
+        which avoids materializing arrays of ones.
+        """
         raise NotImplementedError()
 
+    def compute_tangent(self, cv, ct, value):
+        """Return the node's tangent computed from the values `cv` and tangents `ct` of children.
+
+        The tangent is the derivative of the node with respect to the input
+        symbols. Tangents of children that do not depend on any symbol are `None`.
+        By default the tangent is the sum of the children tangents weighted by
+        the node's gradient, nodes may override this with a cheaper rule.
+        """
+        g = self.compute_gradient(cv, value)
+        return tangent_sum([gi * ti for gi, ti in zip(g, ct) if ti is not None])
+
+    def compute_vjp(self, cv, value, in_grad):
+        """Return the derivatives of the children given the derivative `in_grad` of the node.
+
+        These are the products of `in_grad` with the Jacobian of the node. By
+        default local gradients are multiplied elementwise, nodes that are not
+        `elementwise` need to override this.
+        """
+        return [gi * in_grad for gi in self.compute_gradient(cv, value)]
+
+    def compute_gradient_tangent(self, cv, ct, value):
+        """Return the tangents of the node's local gradients given the tangents `ct` of children.
+
+        These are the directional derivatives of `compute_gradient` needed for
+        Hessian-vector products, `None` where they vanish. By default they are
+        computed in forward mode from the node's `symbolic_gradient`.
+        """
+        return _gradient_tangents(self, cv, ct)
+
+    def compute_vjp_tangent(self, cv, ct, value, in_grad, in_grad_t):
+        """Return the tangents of the derivatives of the children computed by `compute_vjp`.
+
+        `ct` and `in_grad_t` are the tangents of the child values and of `in_grad`,
+        `None` where they vanish. Nodes that are not `elementwise` need to override this.
+        """
+        g = self.compute_gradient(cv, value)
+        gt = self.compute_gradient_tangent(cv, ct, value)
+        return [
+            tangent_sum([None if gti is None else gti * in_grad, None if in_grad_t is None else gi * in_grad_t])
+            for gi, gti in zip(g, gt)
+        ]
+
     def symbolic_gradient(self):
         raise NotImplementedError()
 
+    def attributes(self):
+        """Return a hashable description of the node's parameters other than its children."""
+        return ()
+
     def child_values(self, values):
         return [values[c] for c in self.children]  
 
+def unbroadcast(d, shape):
+    """Returns the derivative `d` summed over the axes along which a value of `shape` was broadcast.
+
+    The result has the given shape. Derivatives smaller than `shape`, such as
+    plain numbers, are broadcast to it.
+    """
+    d = np.asarray(d)
+    if d.shape == shape:
+        return d
+    full = np.broadcast(np.broadcast_to(0, d.shape), np.broadcast_to(0, shape)).shape
+    d = np.broadcast_to(d, full)
+    lead = len(full) - len(shape)
+    axes = tuple(range(lead)) + tuple(lead + i for i, n in enumerate(shape) if n == 1 and full[lead + i] != 1)
+    if axes:
+        d = d.sum(axis=axes).reshape(shape)
+    return d
+
+_local_tapes = {}
+"""Maps node types, arities and attributes to tapes of their local gradients, `None` if constant."""
+
+def _gradient_tangents(node, cv, ct):
+    """Returns the tangents of the local gradients of `node` computed from its `symbolic_gradient`."""
+    key = (type(node), len(cv), node.attributes())
+    if key not in _local_tapes:
+        syms = [Symbol('c{}'.format(i)) for i in range(len(cv))]
+        g = with_children(node, syms).symbolic_gradient()
+        _local_tapes[key] = None if all(isinstance(gi, Constant) for gi in g) else compile(g, syms)
+    tape = _local_tapes[key]
+    if tape is None or all(ti is None for ti in ct):
+        return [None] * len(cv)
+    s, t = tape.tangents(cv, ct)
+    return [t[o] for o in tape.outputs]
+
+def tangent_sum(ts):
+    """Returns the sum of the tangents in `ts` ignoring `None`, or `None` if there are none."""
+    t = None
+    for ti in ts:
+        if ti is not None:
+            t = ti if t is None else t + ti
+    return t
+
 class Symbol(Node):
     """
     Represents a terminal node that might be associated with a scalar value.    
     Symbols are uniquely determined by their name.
     """
 
+    __slots__ = ('name',)
+
     def __init__(self, name):
         super(Symbol, self).__init__(nary=0)
         self.name = name
@@ -116,6 +234,8 @@ def toscalar(v):
 class Constant(Node):
     """Represents a constant value in an expression tree."""
 
+    __slots__ = ('value',)
+
     def __init__(self, value):
         super(Constant, self).__init__(nary=0)
         self.value = np.atleast_1d(value)
@@ -123,7 +243,7 @@ class Constant(Node):
     def __str__(self):
         return str(toscalar(self.value))
 
-    def compute_value(self, values):
+    def compute_value(self, values, out=None):
         return self.value
 
     def compute_gradient(self, cv, value):
@@ -135,17 +255,24 @@ class Constant(Node):
 class Add(Node):
     """Binary addition of two nodes."""
 
-    def __init__(self):
-        super(Add, self).__init__(nary=2)
+    __slots__ = ()
+
+    commutative = True
+
+    def __init__(self, children=None):
+        super(Add, self).__init__(nary=2, children=children)
 
     def __str__(self):
         return '({} + {})'.format(str(self[0]), str(self[1]))
 
-    def compute_value(self, cv):
-        return cv[0] + cv[1]
+    def compute_value(self, cv, out=None):
+        return np.add(cv[0], cv[1], out=out)
     
     def compute_gradient(self, cv, value):
-        return [np.ones(cv[0].shape), np.ones(cv[1].shape)]
+        return [1, 1]
+
+    def compute_tangent(self, cv, ct, value):
+        return tangent_sum(ct)
     
     def symbolic_gradient(self):
         return [Constant(1), Constant(1)]
@@ -153,18 +280,33 @@ class Add(Node):
 class Sum(Node):
     """N-ary summation of nodes on a single level."""
 
-    def __init__(self, n):
+    __slots__ = ()
+
+    def __init__(self, n=None, children=None):
+        if n is None:
+            n = len(children)
         assert n > 0, "Sum requires at least one child node"
-        super(Sum, self).__init__(nary=n)
+        super(Sum, self).__init__(nary=n, children=children)
 
     def __str__(self):
         return '({})'.format(' + '.join([str(c) for c in self.children]))        
 
-    def compute_value(self, cv):
-        return np.sum(cv, axis=0)
+    def compute_value(self, cv, out=None):
+        if len(cv) == 1:
+            return np.add(cv[0], 0, out=out)
+        s = np.add(cv[0], cv[1], out=out)
+        for v in cv[2:]:
+            if s.shape == np.broadcast(s, v).shape and s.dtype == np.result_type(s, v):
+                np.add(s, v, out=s)
+            else:
+                s = s + v
+        return s
     
     def compute_gradient(self, cv, value):
-        return [np.ones(v.shape) for v in cv]
+        return [1] * len(cv)
+
+    def compute_tangent(self, cv, ct, value):
+        return tangent_sum(ct)
         
     def symbolic_gradient(self):
         return [Constant(1)]*len(self.children)
@@ -172,17 +314,24 @@ class Sum(Node):
 class Sub(Node):
     """Binary subtraction of two nodes."""
 
-    def __init__(self):
-        super(Sub, self).__init__(nary=2)
+    __slots__ = ()
+
+    def __init__(self, children=None):
+        super(Sub, self).__init__(nary=2, children=children)
 
     def __str__(self):
         return '({} - {})'.format(str(self[0]), str(self[1]))
 
-    def compute_value(self, cv):
-        return cv[0] - cv[1]
+    def compute_value(self, cv, out=None):
+        return np.subtract(cv[0], cv[1], out=out)
     
     def compute_gradient(self, cv, value):
-        return [np.ones(cv[0].shape), -np.ones(cv[1].shape)]
+        return [1, -1]
+
+    def compute_tangent(self, cv, ct, value):
+        if ct[1] is None:
+            return ct[0]
+        return -ct[1] if ct[0] is None else ct[0] - ct[1]
     
     def symbolic_gradient(self):
         return [Constant(1), Constant(-1)]
@@ -190,35 +339,45 @@ class Sub(Node):
 class Mul(Node):
     """Binary multiplication of two nodes."""
 
-    def __init__(self):
-        super(Mul, self).__init__(nary=2)
+    __slots__ = ()
+
+    commutative = True
+
+    def __init__(self, children=None):
+        super(Mul, self).__init__(nary=2, children=children)
 
     def __str__(self):
         return '({}*{})'.format(str(self[0]), str(self[1]))
 
-    def compute_value(self, cv):
-        return cv[0] * cv[1]
+    def compute_value(self, cv, out=None):
+        return np.multiply(cv[0], cv[1], out=out)
     
     def compute_gradient(self, cv, value):
         return [cv[1], cv[0]]
 
+    def compute_gradient_tangent(self, cv, ct, value):
+        return [ct[1], ct[0]]
+
     def symbolic_gradient(self):
         return [self[1], self[0]]
 
 class Div(Node):
     """Binary division of two nodes."""
 
-    def __init__(self):
-        super(Div, self).__init__(nary=2)
+    __slots__ = ()
+
+    def __init__(self, children=None):
+        super(Div, self).__init__(nary=2, children=children)
 
     def __str__(self):
         return '({}/{})'.format(str(self[0]), str(self[1]))
 
-    def compute_value(self, cv):
-        return cv[0] / cv[1]
+    def compute_value(self, cv, out=None):
+        return np.true_divide(cv[0], cv[1], out=out)
     
     def compute_gradient(self, cv, value):
-        return [1. / cv[1], -cv[0] / cv[1]**2]
+        r = 1. / cv[1]
+        return [r, -value * r]
     
     def symbolic_gradient(self):
         return [
@@ -229,14 +388,16 @@ class Div(Node):
 class Logarithm(Node):
     """Natural logarithm of a node."""
 
-    def __init__(self):
-        super(Logarithm, self).__init__(nary=1)
+    __slots__ = ()
+
+    def __init__(self, children=None):
+        super(Logarithm, self).__init__(nary=1, children=children)
 
     def __str__(self):
         return 'log({})'.format(str(self[0]))
 
-    def compute_value(self, cv):
-        return np.log(cv[0])
+    def compute_value(self, cv, out=None):
+        return np.log(cv[0], out=out)
 
     def compute_gradient(self, cv, value):
         return [1./ cv[0]]
@@ -248,17 +409,22 @@ class Logarithm(Node):
 class Neg(Node):
     """Unary negation of a node."""
 
-    def __init__(self):
-        super(Neg, self).__init__(nary=1)
+    __slots__ = ()
+
+    def __init__(self, children=None):
+        super(Neg, self).__init__(nary=1, children=children)
 
     def __str__(self):
         return '-{}'.format(str(self[0]))
 
-    def compute_value(self, cv):
-        return -cv[0]
+    def compute_value(self, cv, out=None):
+        return np.negative(cv[0], out=out)
 
     def compute_gradient(self, cv, value):
-        return [-np.ones(cv[0].shape)]
+        return [-1]
+
+    def compute_tangent(self, cv, ct, value):
+        return -ct[0]
 
     def symbolic_gradient(self):
         return [Constant(-1)]
@@ -267,14 +433,16 @@ class Neg(Node):
 class Pow(Node):
     """Binary exponentiation `x**y`."""
 
-    def __init__(self):
-        super(Pow, self).__init__(nary=2)
+    __slots__ = ()
+
+    def __init__(self, children=None):
+        super(Pow, self).__init__(nary=2, children=children)
 
     def __str__(self):
         return '{}**{}'.format(str(self[0]), str(self[1]))
 
-    def compute_value(self, cv):
-        return cv[0]**cv[1]
+    def compute_value(self, cv, out=None):
+        return np.power(cv[0], cv[1], out=out)
 
     def compute_gradient(self, cv, value):
         return [
@@ -291,14 +459,16 @@ class Pow(Node):
 class Exp(Node):
     """Base-e exponential function of x `e**x`."""
 
-    def __init__(self):
-        super(Exp, self).__init__(nary=1)
+    __slots__ = ()
+
+    def __init__(self, children=None):
+        super(Exp, self).__init__(nary=1, children=children)
 
     def __str__(self):
         return 'exp({})'.format(str(self[0]))
 
-    def compute_value(self, v):
-        return np.exp(v[0])
+    def compute_value(self, v, out=None):
+        return np.exp(v[0], out=out)
 
     def compute_gradient(self, cv, value):
         return [value]
@@ -309,14 +479,16 @@ class Exp(Node):
 class Sqrt(Node):
     """Square root of `x`."""
 
-    def __init__(self):
-        super(Sqrt, self).__init__(nary=1)
+    __slots__ = ()
+
+    def __init__(self, children=None):
+        super(Sqrt, self).__init__(nary=1, children=children)
 
     def __str__(self):
         return 'sqrt({})'.format(str(self[0]))
 
-    def compute_value(self, v):
-        return np.sqrt(v[0])
+    def compute_value(self, v, out=None):
+        return np.sqrt(v[0], out=out)
 
     def compute_gradient(self, cv, value):
         return [1. / (2 * value)]
@@ -331,23 +503,24 @@ class Min(Node):
     construct that isn't provided by cgraph.
     """
 
-    def __init__(self):
-        super(Min, self).__init__(nary=2)
+    __slots__ = ()
+
+    def __init__(self, children=None):
+        super(Min, self).__init__(nary=2, children=children)
 
     def __str__(self):
         return 'min({},{})'.format(str(self[0]), str(self[1]))
 
-    def compute_value(self, v):
-        return np.minimum(v[0], v[1])
+    def compute_value(self, v, out=None):
+        return np.minimum(v[0], v[1], out=out)
 
     def compute_gradient(self, cv, value):
         # Gradient is 1 for whatever value is less, other one is zero.
         m = (cv[0] <= cv[1])
-        ids = np.where(m)[0]
+        return [m, ~m]
 
-        a = np.zeros(m.shape); a[ids] = 1.
-        b = np.ones(m.shape); b[ids] = 0.
-        return [a,b]
+    def compute_gradient_tangent(self, cv, ct, value):
+        return [None, None]
 
 class Max(Node):
     """Maximum of two expressions `max(x, y)`.
@@ -356,35 +529,38 @@ class Max(Node):
     construct that isn't provided by cgraph.
     """
 
-    def __init__(self):
-        super(Max, self).__init__(nary=2)
+    __slots__ = ()
+
+    def __init__(self, children=None):
+        super(Max, self).__init__(nary=2, children=children)
 
     def __str__(self):
         return 'max({},{})'.format(str(self[0]), str(self[1]))
 
-    def compute_value(self, v):
-        return np.maximum(v[0], v[1])
+    def compute_value(self, v, out=None):
+        return np.maximum(v[0], v[1], out=out)
 
     def compute_gradient(self, cv, value):
         # Gradient is 1 for whatever value is greater, other one is zero.
         m = (cv[0] >= cv[1])
-        ids = np.where(m)[0]
+        return [m, ~m]
 
-        a = np.zeros(m.shape); a[ids] = 1.
-        b = np.ones(m.shape); b[ids] = 0.
-        return [a,b]
+    def compute_gradient_tangent(self, cv, ct, value):
+        return [None, None]
 
 class Sin(Node):
     """Sinus of expression `sin(x)`."""
 
-    def __init__(self):
-        super(Sin, self).__init__(nary=1)
+    __slots__ = ()
+
+    def __init__(self, children=None):
+        super(Sin, self).__init__(nary=1, children=children)
 
     def __str__(self):
         return 'sin({})'.format(str(self[0]))
 
-    def compute_value(self, cv):
-        return np.sin(cv[0])
+    def compute_value(self, cv, out=None):
+        return np.sin(cv[0], out=out)
 
     def compute_gradient(self, cv, value):
         return [np.cos(cv[0])]
@@ -395,14 +571,16 @@ class Sin(Node):
 class Cos(Node):
     """Cosine of expression `cos(x)`."""
 
-    def __init__(self):
-        super(Cos, self).__init__(nary=1)
+    __slots__ = ()
+
+    def __init__(self, children=None):
+        super(Cos, self).__init__(nary=1, children=children)
 
     def __str__(self):
         return 'cos({})'.format(str(self[0]))
 
-    def compute_value(self, cv):
-        return np.cos(cv[0])
+    def compute_value(self, cv, out=None):
+        return np.cos(cv[0], out=out)
 
     def compute_gradient(self, cv, value):
         return [-np.sin(cv[0])]
@@ -410,118 +588,157 @@ class Cos(Node):
     def symbolic_gradient(self):
         return [-sym_sin(self[0])]  
 
+_intern_table = None
+"""Maps structural keys to nodes while interning is active, `None` otherwise."""
+
+def structural_key(node):
+    """Returns a hashable key that is equal for structurally identical nodes.
+
+    Two nodes are structurally identical when they are of the same type and
+    share the same children, in any order for commutative nodes, and the same
+    `attributes`. Constants are identified by their value and symbols by their name.
+    """
+    if isinstance(node, Constant):
+        v = node.value
+        return (Constant, v.dtype.str, v.shape, v.tobytes())
+    elif isinstance(node, Symbol):
+        return node
+    elif node.commutative:
+        return (type(node), node.attributes(), frozenset(node.children))
+    else:
+        return (type(node), node.attributes(), tuple(node.children))
+
+def structural_hash(node):
+    """Returns a digest that is equal for expressions of identical structure.
+
+    In contrast to `structural_key`, which identifies children by object, the
+    digest covers the entire expression tree below `node`. Node types, symbol
+    names, constant values and the order of children are taken into account.
+    """
+    digests = {}
+    for n in topological_order(node):
+        h = hashlib.sha1('{}.{}'.format(type(n).__module__, type(n).__qualname__).encode())
+        if isinstance(n, Constant):
+            h.update('{}{}'.format(n.value.dtype.str, n.value.shape).encode())
+            h.update(n.value.tobytes())
+        elif isinstance(n, Symbol):
+            h.update(n.name.encode())
+        h.update(repr(n.attributes()).encode())
+        for c in n.children:
+            h.update(digests[c])
+        digests[n] = h.digest()
+    return digests[node].hex()
+
+def intern(node):
+    """Returns the node structurally identical to `node` created first while interning is active."""
+    if _intern_table is None:
+        return node
+    return _intern_table.setdefault(structural_key(node), node)
+
+@contextmanager
+def interning():
+    """Maps structurally identical expressions created within the context to a single node.
+
+    While active, the `sym_*` functions and operators return an already existing
+    node instead of creating a new one if both are structurally identical. Since
+    children are interned before their parents, this makes identical subtrees
+    shared, so that evaluation and differentiation compute them once.
+
+        with cg.interning():
+            f = (x * y) + (x * y)
+        f[0] is f[1] # True
+    """
+    global _intern_table
+    prev = _intern_table
+    try:
+        if prev is None:
+            _intern_table = {}
+        yield
+    finally:
+        _intern_table = prev
+
 def wrap_number(n):
     """Wraps a plain number as Constant object."""
     if isinstance(n, Number):
-        n = Constant(n)
+        n = intern(Constant(n))
     return n    
 
 def wrap_args(func):
-    """Decorator that turns plain number arguments into Constant objects."""
+    """Decorator that turns plain number arguments into Constant objects.
+    
+    The node returned by the decorated function is interned when interning is active.
+    """
     def wrapped(*args, **kwargs):
         new_args = []
         for a in args:
             new_args.append(wrap_number(a))
-        return func(*new_args, **kwargs)
+        return intern(func(*new_args, **kwargs))
     return wrapped
         
 @wrap_args
 def sym_add(x, y):
     """Returns a new node representing `x+y`."""
-    n = Add()
-    n.children[0] = x
-    n.children[1] = y
-    return n
+    return Add(children=(x, y))
 
 @wrap_args
 def sym_sub(x, y):
     """Returns a new node representing `x-y`."""
-    n = Sub()
-    n.children[0] = x
-    n.children[1] = y
-    return n
+    return Sub(children=(x, y))
 
 @wrap_args
 def sym_mul(x, y):
     """Returns a new node representing `x*y`."""
-    n = Mul()
-    n.children[0] = x
-    n.children[1] = y
-    return n
+    return Mul(children=(x, y))
 
 @wrap_args
 def sym_div(x, y):
     """Returns a new node representing `x/y`."""
-    n = Div()
-    n.children[0] = x
-    n.children[1] = y
-    return n
+    return Div(children=(x, y))
 
 @wrap_args
 def sym_log(x):
     """Returns a new node representing `ln(x)`."""
-    n = Logarithm()
-    n.children[0] = x
-    return n
+    return Logarithm(children=(x,))
 
 @wrap_args
 def sym_neg(x):
     """Returns a new node representing `-x`."""
-    n = Neg()
-    n.children[0] = x
-    return n
+    return Neg(children=(x,))
 
 @wrap_args
 def sym_pow(x, y):
     """Returns a new node representing `x**y`."""
-    n = Pow()
-    n.children[0] = x
-    n.children[1] = y
-    return n
+    return Pow(children=(x, y))
 
 @wrap_args
 def sym_exp(x):
     """Returns a new node representing `e**x`."""
-    n = Exp()
-    n.children[0] = x
-    return n
+    return Exp(children=(x,))
     
 @wrap_args
 def sym_sqrt(x):
     """Returns a new node representing `sqrt(x)`."""
-    n = Sqrt()
-    n.children[0] = x
-    return n
+    return Sqrt(children=(x,))
 
 @wrap_args
 def sym_min(a, b):
     """Returns a new node representing `min(x,y)`."""
-    n = Min()
-    n.children[0] = a
-    n.children[1] = b
-    return n
+    return Min(children=(a, b))
 
 @wrap_args
 def sym_max(a, b):
     """Returns a new node representing `max(x,y)`."""
-    n = Max()
-    n.children[0] = a
-    n.children[1] = b
-    return n
+    return Max(children=(a, b))
 
 @wrap_args
 def sym_cos(a):
     """Returns a new node representing `cos(x)`."""
-    n = Cos()
-    n.children[0] = a
-    return n
+    return Cos(children=(a,))
 
 @wrap_args
 def sym_sin(a):
     """Returns a new node representing `sin(x)`."""
-    n = Sin()
-    n.children[0] = a
-    return n
+    return Sin(children=(a,))
 
 def sym_sum(x):
     """Returns a new node that represents the sum over all elements in `x`.
@@ -536,20 +753,46 @@ def sym_sum(x):
     if len(x) == 0:
         return Constant(0) 
 
-    n = Sum(n=len(x))
-    for idx, e in enumerate(x):
-        n.children[idx] = wrap_number(e)
-    return n
+    return intern(Sum(children=[wrap_number(e) for e in x]))
 
 def postorder(node):
     """Yields all nodes discovered by depth-first-search in post-order starting from node.
 
-    Note, this implementation uses a recursion. As such it has a limit on the
-    how depth expression trees can become before Python raises maximum recursion depth exception.
+    Nodes reachable through multiple paths are yielded once per path, use
+    `topological_order` to visit every node once. This implementation uses an
+    explicit stack, so the depth of expression trees is not limited by Python's
+    maximum recursion depth.
+    """
+    # Children are pushed left to right, so the reversed pre-order visits
+    # the children of each node left to right before the node itself.
+    order = []
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        order.append(n)
+        stack.extend(n.children)
+    yield from reversed(order)
+
+def topological_order(node):
+    """Returns the list of unique nodes reachable from `node` with children preceding their parents.
+
+    In contrast to `postorder`, nodes that are shared by multiple parents are
+    visited and returned only once.
     """
-    for c in node.children:
-        yield from postorder(c)
-    yield node
+    order = []
+    visited = {node}
+    stack = [(node, iter(node.children))]
+    while stack:
+        n, it = stack[-1]
+        for c in it:
+            if c not in visited:
+                visited.add(c)
+                stack.append((c, iter(c.children)))
+                break
+        else:
+            stack.pop()
+            order.append(n)
+    return order
 
 def bfs(node, node_data):
     """Yields all nodes and associated data in breadth-first-search.
@@ -558,9 +801,9 @@ def bfs(node, node_data):
     implementation that the caller returns (generator.send) an array
     of node_data (one for each child) for the current node processed.
     """
-    q = [(node, node_data)]
+    q = deque([(node, node_data)])
     while q:
-        t = q.pop(0)
+        t = q.popleft()
         node_data = yield t
         for idx, c in enumerate(t[0].children):
             q.append((c, node_data[idx]))
@@ -582,7 +825,7 @@ def values(f, fargs):
     v = {}    
     v.update(fargs)
     
-    for n in postorder(f):
+    for n in topological_order(f):
         if (not n in v) and (not isinstance(n, Symbol)):
             cvalues = n.child_values(v)
             v[n] = n.compute_value(cvalues)
@@ -592,42 +835,619 @@ def values(f, fargs):
 def value(f, fargs):
     """Shortcut for `values(f, fargs)[f]`."""
     return values(f, fargs)[f]
-    
-def numeric_gradient(f, fargs, return_all_values=False, return_value=False):
-    """Computes the numerical partial derivatives of `f` with respect to all nodes using backpropagation."""
+
+class Tape:
+    """A flat, reusable evaluation program for an expression tree.
+
+    Evaluating an expression through `values` requires a traversal of the tree
+    and a dictionary lookup per node on every call. A tape performs this work
+    once: all unique nodes are assigned an integer slot and the operations are
+    stored in topological order as a list of instructions `(op, args, out)`,
+    where `op` computes the value of slot `out` from the values of the slots in `args`.
+
+    The first slots are reserved for the symbols in the order given. Slots of
+    constants are filled at compile time. When `f` is a list of expressions,
+    the tape computes all of them sharing common nodes. Use `compile` to create tapes.
+
+    Except for `values`, evaluations release the value of a slot as soon as it
+    is no longer needed, so that the memory held at any time is bounded by the
+    width rather than the size of the expression.
+
+    When `buffered` is true, the arrays of released slots are kept and reused to
+    store the values of subsequent slots of equal shape and type, within a call
+    and across calls with inputs of equal shapes. Nodes then write their values
+    into these buffers instead of allocating new arrays, see `Node.compute_value`.
+    """
+
+    def __init__(self, f, symbols, buffered=False):
+        self.f = f
+        self.buffered = buffered
+        # Number of arrays allocated for slot values and derivatives, approximate
+        # when unbuffered tapes are shared among threads.
+        self.allocations = 0
+        # Shapes of inputs, shape and type of each slot, and released arrays
+        # by shape and type when buffered.
+        self.signature = None
+        self.layout = None
+        self.pool = None
+        self._reach = {}
+        self.symbols = list(symbols)
+        self.nodes = list(self.symbols)
+        roots = list(f) if isinstance(f, (list, tuple)) else [f]
+
+        slot = dict((s, i) for i, s in enumerate(self.symbols))
+        for r in roots:
+            for n in topological_order(r):
+                if n in slot:
+                    continue
+                if isinstance(n, Symbol):
+                    raise ValueError('Symbol {} is not bound to an argument'.format(n))
+                slot[n] = len(self.nodes)
+                self.nodes.append(n)
+
+        # Whether derivatives are computed per sample, see `numeric_gradient`.
+        self.elementwise = all(n.elementwise for n in self.nodes)
+        self.slots = [n.value if isinstance(n, Constant) else None for n in self.nodes]
+        self.code = [
+            (n.compute_value, tuple(slot[c] for c in n.children), slot[n])
+            for n in self.nodes[len(self.symbols):] if not isinstance(n, Constant)
+        ]
+        self.outputs = [slot[r] for r in roots]
+        self.output = self.outputs[0]
+
+        # For each instruction the slots read for the last time by it.
+        last_read = {}
+        for i, (op, args, out) in enumerate(self.code):
+            for a in args:
+                last_read[a] = i
+        self.last_reads = [[] for i in self.code]
+        for a, i in last_read.items():
+            if a not in self.outputs:
+                self.last_reads[i].append(a)
+
+    def inputs(self, *values):
+        """Returns the list of slots holding the given symbol values and constants."""
+        s = list(self.slots)
+        for i, v in enumerate(values):
+            s[i] = np.atleast_1d(v)
+
+        if self.buffered:
+            signature = [(v.shape, v.dtype) for v in s[:len(values)]]
+            if signature != self.signature:
+                # Shapes of slots change with the inputs, buffers are learned anew.
+                self.signature = signature
+                self.layout = [None] * len(s)
+                self.pool = defaultdict(list)
+        return s
+
+    def compute(self, op, cv, out):
+        """Returns the value of slot `out` computed from the child values `cv`, stored in a recycled buffer if possible."""
+        if self.buffered:
+            key = self.layout[out]
+            if key is not None and self.pool[key]:
+                return op(cv, out=self.pool[key].pop())
+            v = op(cv)
+            self.layout[out] = (v.shape, v.dtype)
+        else:
+            v = op(cv)
+        self.allocations += 1
+        return v
+
+    def release(self, s, a):
+        """Releases the value of slot `a`, keeping its array for reuse if buffered."""
+        v = s[a]
+        s[a] = None
+        if self.buffered and v is not None and self.layout[a] is not None and a not in self.outputs:
+            self.pool[self.layout[a]].append(v)
+
+    def values(self, *values):
+        """Returns the list of all slot values computed from the given symbol values."""
+        s = self.inputs(*values)
+        for op, args, out in self.code:
+            s[out] = self.compute(op, [s[a] for a in args], out)
+        return s
+
+    def forward(self, s):
+        """Computes the slots of the expressions in place releasing all other slots after their last use."""
+        for (op, args, out), dead in zip(self.code, self.last_reads):
+            s[out] = self.compute(op, [s[a] for a in args], out)
+            for a in dead:
+                self.release(s, a)
+        return s
+
+    def reaching(self, slots):
+        """Returns the set of slots depending on any of the given slots."""
+        slots = tuple(slots)
+        reach = self._reach.get(slots)
+        if reach is None:
+            reach = set(slots)
+            for op, args, out in self.code:
+                if any(a in reach for a in args):
+                    reach.add(out)
+            self._reach[slots] = reach
+        return reach
+
+    def backward(self, s, d, code=None, release=False, reach=None):
+        """Propagates derivatives `d` of slots towards the symbols given slot values `s`.
+
+        The derivatives are computed by a single reverse sweep over the tape, or
+        over the instructions in `code`, that accumulates the derivative of each
+        slot before propagating it to the slot's arguments. `d` is modified in
+        place, missing derivatives are `None`. When `release` is true, the value
+        and derivative of a slot are released once it has been differentiated.
+
+        Unit local derivatives pass the incoming derivative on without
+        multiplication. Derivatives allocated by the sweep are accumulated in place.
+        Unless the tape is `elementwise`, derivatives are computed by `Node.compute_vjp`
+        and have the shapes of the slot values, see `numeric_gradient`. When a set
+        of slots `reach` is given, derivatives are propagated to these slots only.
+        """
+        owned = set()
+        for op, args, out in reversed(self.code if code is None else code):
+            in_grad = d[out]
+            if in_grad is not None and not self.elementwise:
+                cv = [s[a] for a in args]
+                for a, gi in zip(args, self.nodes[out].compute_vjp(cv, s[out], in_grad)):
+                    if reach is not None and a not in reach:
+                        continue
+                    gi = unbroadcast(gi, s[a].shape)
+                    d[a] = gi if d[a] is None else d[a] + gi
+            elif in_grad is not None:
+                g = self.nodes[out].compute_gradient([s[a] for a in args], s[out])
+                for a, gi in zip(args, g):
+                    if reach is not None and a not in reach:
+                        continue
+                    if isinstance(gi, Number) and gi == 1:
+                        gi = in_grad
+                        fresh = False
+                    else:
+                        gi = gi * in_grad
+                        fresh = isinstance(gi, np.ndarray)
+
+                    da = d[a]
+                    if da is None:
+                        d[a] = gi
+                    elif a in owned and da.shape == np.broadcast(da, gi).shape and da.dtype == np.result_type(da, gi):
+                        np.add(da, gi, out=da)
+                        fresh = False
+                    else:
+                        d[a] = da + gi
+                        fresh = isinstance(d[a], np.ndarray)
+
+                    if fresh:
+                        owned.add(a)
+                        self.allocations += 1
+            if release:
+                self.release(s, out)
+                d[out] = None
+        return d
+
+    def gradient(self, *values, checkpoint=None, wrt=None):
+        """Returns the value of the expression and its partial derivatives with respect to the symbols.
+
+        Derivatives are returned as list in order of symbols, or of the symbols
+        in `wrt` if given. Only slots depending on these symbols are differentiated,
+        so subexpressions of constants are skipped. Slots are released
+        once they have been differentiated. To trade computation for memory,
+        `checkpoint` may be set to a number of instructions: the forward sweep then
+        keeps only the slots read across segments of this length, and each segment
+        is recomputed from them right before it is differentiated.
+        """
+        s = self.inputs(*values)
+        if checkpoint is None:
+            segments = [self.code]
+            for op, args, out in self.code:
+                s[out] = self.compute(op, [s[a] for a in args], out)
+        else:
+            segments = [self.code[i:i+checkpoint] for i in range(0, len(self.code), checkpoint)]
+            keep = self.checkpoints(checkpoint)
+            for seg in segments:
+                for op, args, out in seg:
+                    s[out] = self.compute(op, [s[a] for a in args], out)
+                for op, args, out in seg:
+                    if out not in keep:
+                        self.release(s, out)
+        v = s[self.output]
+
+        wrt = list(range(len(self.symbols))) if wrt is None else [self.symbols.index(w) for w in wrt]
+        reach = self.reaching(wrt)
+
+        d = [None] * len(s)
+        d[self.output] = np.ones(1) if self.elementwise else np.ones(v.shape)
+        for seg in reversed(segments):
+            for op, args, out in seg:
+                if s[out] is None:
+                    s[out] = self.compute(op, [s[a] for a in args], out)
+            self.backward(s, d, code=seg, release=True, reach=reach)
+
+        return v, [np.zeros(1) if d[i] is None else d[i] for i in wrt]
+
+    def tangents(self, values, tangents):
+        """Returns the lists of slot values and of their tangents along the given symbol tangents.
+
+        The tangent of a slot is its directional derivative along the direction
+        given by the tangents of the symbols. Tangents that vanish, of symbols as
+        well as of slots, are `None`. Unless the tape is `elementwise`, tangents
+        have the shapes of the slot values.
+        """
+        s = self.inputs(*values)
+        t = [None] * len(s)
+        for i, ti in enumerate(tangents):
+            if ti is not None:
+                t[i] = np.atleast_1d(ti)
+        for op, args, out in self.code:
+            cv = [s[a] for a in args]
+            s[out] = self.compute(op, cv, out)
+            ct = [t[a] for a in args]
+            if any(ti is not None for ti in ct):
+                t[out] = self.nodes[out].compute_tangent(cv, ct, s[out])
+                if not self.elementwise and t[out] is not None:
+                    t[out] = np.broadcast_to(t[out], s[out].shape)
+        return s, t
+
+    def hvp(self, vector, *values):
+        """Returns the value, gradient and Hessian-vector product of the expression.
+
+        `vector` holds the direction for each symbol, `None` for zero. The product
+        of the Hessian with this direction is computed numerically by forward-over-reverse
+        differentiation: a forward sweep computes the tangents of all slots along
+        the direction, and the reverse sweep of `gradient` additionally propagates
+        the tangents of derivatives, see `Node.compute_vjp_tangent`. This costs a
+        small multiple of a gradient. Gradients and products are returned as lists
+        in order of symbols.
+        """
+        s, t = self.tangents(values, vector)
+        reach = self.reaching(range(len(self.symbols)))
+        v = s[self.output]
+
+        d = [None] * len(s)
+        dt = [None] * len(s)
+        d[self.output] = np.ones(1) if self.elementwise else np.ones(v.shape)
+        for op, args, out in reversed(self.code):
+            if d[out] is None:
+                continue
+            n = self.nodes[out]
+            cv = [s[a] for a in args]
+            ct = [t[a] for a in args]
+            g = n.compute_vjp(cv, s[out], d[out])
+            gt = n.compute_vjp_tangent(cv, ct, s[out], d[out], dt[out])
+            for a, ga, gta in zip(args, g, gt):
+                if a not in reach:
+                    continue
+                if not self.elementwise:
+                    ga = unbroadcast(ga, s[a].shape)
+                    gta = None if gta is None else unbroadcast(gta, s[a].shape)
+                d[a] = ga if d[a] is None else d[a] + ga
+                if gta is not None:
+                    dt[a] = gta if dt[a] is None else dt[a] + gta
+
+        nsyms = len(self.symbols)
+        return (
+            v,
+            [np.zeros(1) if di is None else di for di in d[:nsyms]],
+            [np.zeros(1) if di is None else di for di in dt[:nsyms]],
+        )
+
+    def checkpoints(self, size):
+        """Returns the set of slots read by instructions outside of their segment of `size` instructions."""
+        keep = set(self.outputs)
+        produced = {}
+        for i, (op, args, out) in enumerate(self.code):
+            produced[out] = i // size
+            for a in args:
+                if a in produced and produced[a] != i // size:
+                    keep.add(a)
+        return keep
+
+    def forward_gradient(self, *values):
+        """Returns the value of the expression and its partial derivatives using forward mode.
+
+        Values and tangents of slots are computed in a single forward sweep. The
+        tangent of each slot carries a leading axis with one entry per symbol, so
+        all partial derivatives are obtained at once. This is cheaper than the
+        reverse sweep of `gradient` when there are only a few symbols. Forward
+        mode is limited to expressions of elementwise nodes.
+        """
+        if not self.elementwise:
+            raise ValueError('Forward mode requires expressions of elementwise nodes')
+        nsyms = len(self.symbols)
+        s = self.inputs(*values)
+        t = [None] * len(s)
+        for i in range(len(values)):
+            t[i] = np.zeros((nsyms,) + (1,)*s[i].ndim)
+            t[i][i] = 1
+        for (op, args, out), dead in zip(self.code, self.last_reads):
+            cv = [s[a] for a in args]
+            s[out] = self.compute(op, cv, out)
+            ct = [t[a] for a in args]
+            if any(ti is not None for ti in ct):
+                t[out] = self.nodes[out].compute_tangent(cv, ct, s[out])
+            for a in dead:
+                self.release(s, a)
+                t[a] = None
+
+        to = t[self.output]
+        return s[self.output], [np.zeros(1) if to is None else to[i] for i in range(nsyms)]
+
+    def jacobian(self, *values):
+        """Returns the values of all expressions and their Jacobian with respect to the symbols.
+
+        All rows of the Jacobian are computed by a single reverse sweep, in which
+        the derivative of each slot carries an additional leading axis with one
+        entry per expression. Values are returned as array of shape `(batch, outputs)`
+        and the Jacobian as array of shape `(batch, outputs, inputs)`. Expressions
+        need to be made of elementwise nodes.
+        """
+        if not self.elementwise:
+            raise ValueError('Jacobians require expressions of elementwise nodes')
+        s = self.values(*values)
+        m = len(self.outputs)
+        ndim = max(s[o].ndim for o in self.outputs)
+
+        d = [None] * len(s)
+        for i, o in enumerate(self.outputs):
+            seed = np.zeros((m,) + (1,)*ndim)
+            seed[i] = 1
+            d[o] = seed if d[o] is None else d[o] + seed
+        self.backward(s, d)
+
+        nsyms = len(self.symbols)
+        v = [s[o] for o in self.outputs]
+        g = [np.zeros((m,) + (1,)*ndim) if di is None else di for di in d[:nsyms]]
+
+        shape = ()
+        for a in v + [gi[0] for gi in g]:
+            shape = np.broadcast(np.broadcast_to(0, shape), a).shape
+
+        v = np.stack([np.broadcast_to(vi, shape) for vi in v], axis=-1)
+        g = np.stack([np.broadcast_to(gi, (m,) + shape) for gi in g], axis=-1)
+        return v, np.moveaxis(g, 0, -2)
+
+    def __call__(self, *values):
+        """Returns the value of the expression, or the list of values, for the given symbol values."""
+        s = self.forward(self.inputs(*values))
+        if isinstance(self.f, (list, tuple)):
+            return [s[o] for o in self.outputs]
+        else:
+            return s[self.output]
+
+def compile(f, symbols, buffered=False):
+    """Returns a `Tape` that evaluates `f` with symbol values given positionally in order of `symbols`."""
+    return Tape(f, symbols, buffered=buffered)
+
+def peak_memory(func, *args, **kwargs):
+    """Returns the result of `func(*args, **kwargs)` and the peak number of bytes allocated during the call.
+
+    Allocations are traced by `tracemalloc`, which includes the data of numpy
+    arrays. Useful to compare the memory requirements of evaluation modes
+
+        v, nbytes = cg.peak_memory(tape.gradient, xs, ys, checkpoint=100)
+    """
+    if tracemalloc.is_tracing():
+        raise RuntimeError('Memory allocations are already traced')
+    tracemalloc.start()
+    try:
+        r = func(*args, **kwargs)
+        return r, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+class Jacobian:
+    """Computes the Jacobian of several expressions with respect to a list of symbols.
+
+    All expressions are compiled into a single tape, so that nodes shared
+    among them are computed once and all derivatives are obtained in one
+    reverse sweep.
+
+        J = cg.jacobian([x*y, x+y], [x, y])
+        J([1,2,3], [4,5,6]).shape # (3, 2, 2) one Jacobian per sample
+    """
+
+    def __init__(self, fs, symbols):
+        self.fs = list(fs)
+        self.symbols = list(symbols)
+        self.tape = compile(self.fs, self.symbols)
+
+    def __call__(self, *values, return_value=False):
+        """Returns the Jacobians of shape `(batch, outputs, inputs)` and optionally the values of shape `(batch, outputs)`."""
+        v, j = self.tape.jacobian(*values)
+        if return_value:
+            return v, j
+        else:
+            return j
+
+def jacobian(fs, symbols):
+    """Returns a `Jacobian` of the expressions `fs` with respect to `symbols`."""
+    return Jacobian(fs, symbols)
+
+class Hessian:
+    """Computes the Hessian of an expression with respect to a list of symbols.
+
+    Second derivatives are computed numerically from the compiled expression
+    by forward-over-reverse differentiation, see `Tape.hvp`, which avoids the
+    growth of symbolic derivatives of derivatives. Each column of the Hessian
+    takes one Hessian-vector product, use `hvp` for single products, such as
+    in conjugate gradient Newton steps.
+
+    Expressions of elementwise nodes are differentiated per sample, giving one
+    Hessian per sample. For expressions with tensor nodes, the symbols are
+    treated as one flat vector of parameters, see `numeric_gradient`.
+
+        H = cg.hessian(f, [x, y])
+        g, h = H([1,2,3], [4,5,6], return_gradient=True)
+        h.shape # (3, 2, 2) one Hessian per sample
+    """
+
+    def __init__(self, f, symbols):
+        self.f = f
+        self.symbols = list(symbols)
+        self.tape = compile(f, self.symbols)
+
+    def hvp(self, vector, *values):
+        """Returns the list of products of the Hessian with the direction given per symbol in `vector`."""
+        return self.tape.hvp(vector, *values)[2]
+
+    def __call__(self, *values, return_gradient=False):
+        """Returns the Hessians and optionally the gradients.
+
+        Per sample Hessians have shape `(batch, inputs, inputs)` and gradients
+        `(batch, inputs)`. For expressions with tensor nodes, the Hessian has
+        shape `(n, n)` and the gradient `(n,)`, where `n` is the number of
+        elements of all symbol values.
+        """
+        k = len(self.symbols)
+        if not self.tape.elementwise:
+            shapes = [np.shape(np.atleast_1d(a)) for a in values]
+            columns = []
+            for i, shape in enumerate(shapes):
+                for j in range(int(np.prod(shape))):
+                    e = np.zeros(shape)
+                    e.flat[j] = 1
+                    vector = [e if m == i else None for m in range(k)]
+                    v, g, hv = self.tape.hvp(vector, *values)
+                    columns.append(np.concatenate([np.broadcast_to(h, s).ravel() for h, s in zip(hv, shapes)]))
+            g = np.concatenate([np.broadcast_to(gi, s).ravel() for gi, s in zip(g, shapes)])
+            h = np.stack(columns, axis=-1)
+        else:
+            columns = []
+            for i in range(k):
+                v, g, hv = self.tape.hvp([1 if m == i else None for m in range(k)], *values)
+                columns.append(hv)
+
+            shape = ()
+            for a in [v] + g + [h for hv in columns for h in hv]:
+                shape = np.broadcast(np.broadcast_to(0, shape), a).shape
+            g = np.stack([np.broadcast_to(gi, shape) for gi in g], axis=-1)
+            h = np.stack([np.stack([np.broadcast_to(h, shape) for h in hv], axis=-1) for hv in columns], axis=-1)
+
+        if return_gradient:
+            return g, h
+        else:
+            return h
+
+def hessian(f, symbols):
+    """Returns a `Hessian` of the expression `f` with respect to `symbols`."""
+    return Hessian(f, symbols)
+
+def numeric_gradient(f, fargs, return_all_values=False, return_value=False, wrt=None):
+    """Computes the numerical partial derivatives of `f` with respect to all nodes using backpropagation.
+
+    Nodes are processed in reverse topological order. Hence the derivative of a
+    node is fully accumulated from all of its parents before it is propagated
+    further down, and every node shared by multiple parents is differentiated
+    only once.
+
+    Expressions made of elementwise nodes only are differentiated per sample,
+    i.e. derivatives are broadcast to the shape of `f`. Otherwise, when `f`
+    contains tensor nodes such as `ReduceSum`, the derivative of each node has
+    the shape of its value and `f` is expected to be scalar, or its values are summed.
+
+    When a list of symbols `wrt` is given, only nodes depending on these symbols
+    are differentiated and derivatives of other nodes are dropped as soon as they
+    have been propagated. The derivatives are then returned like the gradients
+    of `Function`: as array with one row per sample and one column per symbol
+    in `wrt`, or as list in order of `wrt` for expressions with tensor nodes.
+    """
     
     vals = values(f, fargs)
+    derivatives = _backpropagate(f, vals, wrt=wrt)
+    if wrt is not None:
+        derivatives = _dense(vals[f], [derivatives.get(s, np.zeros(1)) for s in wrt], _elementwise(f))
+
+    if return_all_values:
+        return derivatives, vals
+    elif return_value:
+        return derivatives, vals[f]
+    else:
+        return derivatives
+
+def _elementwise(f):
+    return all(n.elementwise for n in topological_order(f))
+
+def _dense(v, g, elementwise):
+    """Returns derivatives `g` of value `v` as array with one row per sample and one column per symbol.
+
+    Derivatives of expressions that are not `elementwise` are returned as list.
+    """
+    if not elementwise:
+        return g
+    return np.hstack([np.broadcast_to(gi, v.shape).reshape(-1, 1) for gi in g])
+
+def _reaching(order, targets):
+    """Returns the set of nodes in topological `order` that depend on any of the nodes in `targets`."""
+    reach = set(targets)
+    for n in order:
+        if any(c in reach for c in n.children):
+            reach.add(n)
+    return reach
+
+def _backpropagate(f, vals, wrt=None):
+    """Returns the numerical partial derivatives of `f` with respect to all nodes given the values of all nodes.
+
+    When `wrt` is given, derivatives are computed for nodes depending on these nodes only and returned for `wrt`.
+    """
+    order = topological_order(f)
+    elementwise = all(n.elementwise for n in order)
+    reach = None if wrt is None else _reaching(order, wrt)
+    targets = set() if wrt is None else set(wrt)
+
     derivatives = defaultdict(lambda : 0.)
-    
-    gen = bfs(f, 1)
-    try:
-        n, in_grad = next(gen)
-        while True:
-            derivatives[n] += in_grad
-            cvalues = n.child_values(vals)
-            g = n.compute_gradient(cvalues, vals[n])
-            n, in_grad = gen.send([gi * in_grad for gi in g])
-    except StopIteration:
-        if return_all_values:
-            return derivatives, vals
-        elif return_value:
-            return derivatives, vals[f]
-        else:
-            return derivatives
+    derivatives[f] = np.ones(1) if elementwise else np.ones(np.shape(vals[f]))
+    for n in reversed(order):
+        if not n.children or (reach is not None and n not in reach):
+            continue
+        in_grad = derivatives[n] if reach is None or n in targets else derivatives.pop(n, 0.)
+        cvalues = n.child_values(vals)
+        for c, cv, d in zip(n.children, cvalues, n.compute_vjp(cvalues, vals[n], in_grad)):
+            if reach is not None and c not in reach:
+                continue
+            if not elementwise:
+                d = unbroadcast(d, np.shape(cv))
+            elif np.shape(d) != np.shape(cv):
+                # Unit local gradients don't carry the shape of the child values.
+                d = np.broadcast_to(d, np.broadcast(d, cv).shape)
+            derivatives[c] = derivatives[c] + d
+
+    if reach is not None:
+        return dict((s, derivatives[s]) for s in wrt if s in derivatives)
+    return derivatives
+
+def symbolic_gradient(f, wrt=None):
+    """Computes the symbolic partial derivatives of `f` with respect to all nodes using backpropagation.
+
+    Like `numeric_gradient` nodes are processed in reverse topological order.
+    The derivative expressions flowing into a node from its parents are
+    collected and joined by a single `Sum` node, so that the size of the
+    resulting expressions grows linearly with the number of edges.
+
+    When a list of symbols `wrt` is given, only nodes depending on these symbols
+    are differentiated and the list of derivative expressions in order of `wrt`
+    is returned.
+    """
+    order = topological_order(f)
+    reach = None if wrt is None else _reaching(order, wrt)
+    targets = set() if wrt is None else set(wrt)
 
-def symbolic_gradient(f):
-    """Computes the symbolic partial derivatives of `f` with respect to all nodes using backpropagation."""
     derivatives = defaultdict(lambda: Constant(0))
-    gen = bfs(f, Constant(1))
-    try:
-        n, in_grad = next(gen) # Need to use edge info when expressions are reused!
-        while True:
-            derivatives[n] = derivatives[n] + in_grad
+    in_grads = defaultdict(list)
+    in_grads[f].append(Constant(1))
+
+    for n in reversed(order):
+        if reach is not None and n not in reach:
+            continue
+        g = in_grads.pop(n)
+        in_grad = g[0] if len(g) == 1 else sym_sum(g)
+        if reach is None or n in targets:
+            derivatives[n] = in_grad
+        if n.children:
             local_grad = n.symbolic_gradient()
-            n, in_grad = gen.send([l * in_grad for l in local_grad])
-    except StopIteration:
-        return derivatives
+            for c, l in zip(n.children, local_grad):
+                if reach is None or c in reach:
+                    in_grads[c].append(l * in_grad)
 
+    if reach is not None:
+        return [derivatives[s] for s in wrt]
+    return derivatives
 
 
 class Function:
@@ -647,110 +1467,138 @@ class Function:
 
         F = Function(f, [x, y])
         g, v = F([2,3,3], [3,4,4], compute_gradient=True) # g = gradients, v = function value
-        g.shape # 3x2 array of gradients. One gradient per row.    
+        g.shape # 3x2 array of gradients. One gradient per row.
+
+    Function values are computed by a `Tape` that is compiled on first use, so
+    repeated calls don't need to traverse the expression tree. Set `buffered`
+    to reuse the tape's arrays among calls with equally shaped arguments.
+
+    Gradients are computed in forward mode when `mode='forward'` and by
+    backpropagation when `mode='reverse'`. By default forward mode is used
+    for functions of at most `forward_max_symbols` symbols made of elementwise
+    nodes, see `Tape.forward_gradient`. In reverse mode
+    `checkpoint` trades computation for memory, see `Tape.gradient`.
+
+    Expressions containing nodes that are not elementwise, such as `cg.sym_matmul`,
+    are differentiated in reverse mode and their gradients are returned as list of
+    derivatives with the shapes of the symbol values instead.
+
+    Instead of the tape, `backend='codegen'` evaluates generated Python code,
+    see `codegen`, and `backend='jit'` a loop fusing all nodes compiled by numba,
+    see `jit`. Both are opt-in, because the time to generate and compile code
+    grows with the size of the expression. They don't support `buffered` and
+    `checkpoint`.
     """
 
-    def __init__(self, f, symbols):
-        self.f = f
-        self.syms = [(i, s) for i, s in enumerate(symbols)]
+    forward_max_symbols = 2
+    """Maximum number of symbols for which gradients are computed in forward mode by default."""
 
-    def __call__(self, *values, compute_gradient=False):
+    default_backend = 'tape'
+    """Backend of functions created without backend, one of `'tape'`, `'codegen'` or `'jit'`."""
 
-        fargs = dict([(s, values[si]) for si, s in self.syms])
-        if compute_gradient:
-            g, v = numeric_gradient(self.f, fargs, return_value=True)
-            # Merge gradient directions
-            g = np.hstack([g[s].reshape(-1, 1) for i,s in self.syms])
-            return v, g
-        else:
-            v = value(self.f, fargs)
-            return v
-
-def applies_to(*klasses):
-    """Decorates functions to match specific nodes only in rule based expression simplification."""
-    def wrapper(func):
-        def wrapped_func(node):
-            if isinstance(node, klasses):
-                return func(node)
+    def __init__(self, f, symbols, buffered=False, backend=None):
+        self.f = f
+        self.syms = [(i, s) for i, s in enumerate(symbols)]
+        self.buffered = buffered
+        self._tape = None
+        self._kernel = None
+
+        backend = backend or self.default_backend
+        if backend not in ('tape', 'codegen', 'jit'):
+            raise ValueError('Unknown backend {}'.format(backend))
+        if buffered and backend != 'tape':
+            raise ValueError('Backend {} does not support buffered evaluation'.format(backend))
+        self.backend = backend
+
+    @property
+    def tape(self):
+        """Returns the compiled tape of the expression."""
+        if self._tape is None:
+            self._tape = compile(self.f, [s for i, s in self.syms], buffered=self.buffered)
+        return self._tape
+
+    @property
+    def kernel(self):
+        """Returns the generated function of the codegen or jit backend."""
+        if self._kernel is None:
+            from .generator import codegen
+            from .fused import jit
+            make = jit if self.backend == 'jit' else codegen
+            self._kernel = make(self.f, [s for i, s in self.syms])
+        return self._kernel
+
+    def __call__(self, *values, compute_gradient=False, mode=None, checkpoint=None):
+
+        if mode not in (None, 'forward', 'reverse'):
+            raise ValueError('Unknown mode {}'.format(mode))
+
+        if self.backend != 'tape' and checkpoint is None:
+            r = self.kernel(*values, compute_gradient=compute_gradient, mode=mode)
+        elif compute_gradient:
+            if mode is None:
+                forward = len(self.syms) <= self.forward_max_symbols and self.tape.elementwise
+                mode = 'forward' if forward else 'reverse'
+            if mode == 'forward':
+                v, g = self.tape.forward_gradient(*values)
             else:
-                return node
-        return wrapped_func
-    return wrapper
-
-def is_const(node, value=None):
-    """Returns true when the node is Constant and matched `value`."""
-    if isinstance(node, Constant):
-        if value is not None:
-            return node.value == value
+                v, g = self.tape.gradient(*values, checkpoint=checkpoint)
+            if not self.tape.elementwise:
+                return v, g
+            # Merge gradient directions
+            r = v, np.hstack([np.broadcast_to(gi, v.shape).reshape(-1, 1) for gi in g])
         else:
-            return True            
-    return False
-
-@applies_to(Mul)
-def mul_identity_rule(node):
-    """Simplifies `x*1` to `x`."""
-
-    if is_const(node.children[0], 1):
-        return node.children[1]
-    elif is_const(node.children[1], 1):
-        return node.children[0]
-    else:
-        return node
-
-@applies_to(Add)
-def add_identity_rule(node):
-    """Simplifies `x+0` to `x`."""
-
-    if is_const(node.children[0], 0):
-        return node.children[1]
-    elif is_const(node.children[1], 0):
-        return node.children[0]
-    else:
-        return node
+            r = self.tape(*values)
+            if not self.tape.elementwise:
+                return r
+        return self.broadcast(values, r)
+
+    def broadcast(self, values, r):
+        """Broadcasts the value and the rows of gradients in `r` to the shape of the arguments.
+
+        Simplified expressions, like `x*0` turned into `0`, may evaluate to fewer
+        elements than their arguments.
+        """
+        v = r[0] if isinstance(r, tuple) else r
+        shape = v.shape
+        for a in values:
+            shape = np.broadcast(np.broadcast_to(0, shape), np.atleast_1d(a)).shape
+        if shape == v.shape:
+            return r
+        v = np.broadcast_to(v, shape).copy()
+        if isinstance(r, tuple):
+            g = np.broadcast_to(r[1], (v.size, r[1].shape[1])).copy()
+            return v, g
+        return v
 
-def eval_to_const_rule(node):
-    """Simplifies every expression made of Constants only to a single Constant."""
-    try:
-        k = value(node, {})
-        return Constant(k)
-    except KeyError:
+def with_children(node, children):
+    """Returns `node` if it has the given children, otherwise a copy of `node` having them."""
+    if all(a is b for a, b in zip(children, node.children)):
         return node
+    n = copy.copy(node)
+    n.children = tuple(children)
+    return n
 
+def cse(f):
+    """Returns an expression equivalent to `f` in which structurally identical subexpressions are merged.
 
-"""Default simplification rules. Add more if needed."""
-simplification_rules = [    
-    mul_identity_rule, 
-    add_identity_rule, 
-    eval_to_const_rule
-]
+    This common subexpression elimination maps all structurally identical
+    subexpressions of `f` to a single node, so that each of them is evaluated
+    and differentiated once. Nodes of `f` are not modified, nodes whose
+    children are merged are copied. When `f` is a list or tuple of expressions,
+    the expressions returned share common subexpressions among each other.
+    """
+    roots = f if isinstance(f, (list, tuple)) else [f]
 
-def simplify(node):
-    """Returns a simplified version of the expression tree associated with `node`."""
+    table = {}
     nodemap = {}
-    for n in postorder(node):
-        if isinstance(n, Symbol):
-            continue
-
-        nc = copy.copy(n)
-        for i in range(len(nc.children)):
-            c = nc.children[i]
-            nc.children[i] = nodemap.get(c, c)
-        for r in simplification_rules:
-            nc = r(nc)
-        nodemap[n] = nc
-        
-    return nodemap[node]
-
-def simplify_all(nodes):
-    """Returns simplified expression trees for all nodes in the given collection."""
-    if isinstance(nodes, (defaultdict, dict)):
-        result = copy.copy(nodes)
-        for k, v in nodes.items():
-            result[k] = simplify(v)
-        return result
-    elif isinstance(nodes, (list, tuple)):
-        result = []
-        for n in nodes:
-            result.append(simplify(n))
-        return result
-
+    for r in roots:
+        for n in topological_order(r):
+            if n in nodemap:
+                continue
+            m = with_children(n, [nodemap[c] for c in n.children])
+            nodemap[n] = table.setdefault(structural_key(m), m)
+
+    if isinstance(f, (list, tuple)):
+        return [nodemap[r] for r in roots]
+    else:
+        return nodemap[f]
@@ -0,0 +1,119 @@
+"""CGraph - symbolic computation in Python library.
+
+This library is the result of my efforts to understand symbolic computation of
+functions factored as expression trees. In a few lines of code it shows how to
+forward evaluate functions and how to perform numeric and symbolic derivatives
+computations using backpropagation.
+
+While this library is not complete (and will never be) it offers the interested
+reader some insights on one way in which symbolic computation can be performed.
+
+The code is accompanied by a series of notebooks that explain the fundamental
+concepts. You can find these notebooks online at
+
+    https://github.com/cheind/py-cgraph
+
+Christoph Heindl, 2017
+"""
+
+import numpy as np
+
+import cgraph as cg
+
+__all__ = ['Placeholder', 'placeholders', 'bind_data', 'MiniBatches']
+
+class Placeholder(cg.Symbol):
+    """A symbol standing for a column of a dataset.
+
+    Unlike data stored in constants, the values of placeholders are passed
+    along with the symbol values on each evaluation, so the same expression,
+    or compiled function, evaluates any batch of samples. See `MiniBatches`.
+    """
+
+    __slots__ = ()
+
+def placeholders(f):
+    """Returns the list of placeholders of the expression `f` in topological order."""
+    return [n for n in cg.topological_order(f) if isinstance(n, Placeholder)]
+
+def bind_data(f, columns):
+    """Returns a copy of `f` in which the placeholders in `columns` are replaced by constants of their values."""
+    nodemap = {}
+    for n in cg.topological_order(f):
+        if isinstance(n, Placeholder) and n in columns:
+            nodemap[n] = cg.Constant(np.asarray(columns[n]))
+        else:
+            nodemap[n] = cg.with_children(n, [nodemap[c] for c in n.children])
+    return nodemap[f]
+
+class MiniBatches:
+    """Streams mini-batches of the columns of a dataset bound to placeholders.
+
+    `columns` maps placeholders to arrays holding one sample per element along
+    their first axis, such as `np.memmap`. Each call of `next` returns the values
+    of the next `batch_size` samples, so a gradient step over a batch costs the
+    same regardless of the size of the dataset. When `shuffle` is true, samples
+    are visited in a new random order each epoch, otherwise in consecutive slices
+    that are views of the columns.
+
+    `bind` adds a batch to a dictionary of symbol values, which works with
+    any function taking such a dictionary, like `cg.numeric_gradient`:
+
+        data = cg.MiniBatches({x: xs, y: ys}, batch_size=256)
+        for i in range(1000):
+            d = cg.numeric_gradient(f, data.bind({w: guess}))
+            guess -= 0.01 * d[w]
+
+    The optimizers of `cg.optimize` take it as `data` instead.
+    """
+
+    def __init__(self, columns, batch_size=1024, shuffle=True, seed=None):
+        if not columns:
+            raise ValueError('No columns given')
+        self.placeholders = list(columns)
+        self.columns = [np.asarray(columns[p]) if isinstance(columns[p], (list, tuple)) else columns[p] for p in self.placeholders]
+        self.size = len(self.columns[0])
+        if any(len(c) != self.size for c in self.columns):
+            raise ValueError('Columns differ in length')
+        if batch_size < 1:
+            raise ValueError('Batch size must be positive')
+        self.batch_size = min(batch_size, self.size)
+        self.shuffle = shuffle
+        self.random = np.random.RandomState(seed)
+        self.order = None
+        self.position = self.size
+        self.epoch = -1
+
+    def __len__(self):
+        """Returns the number of batches per epoch."""
+        return -(-self.size // self.batch_size)
+
+    def indices(self):
+        """Returns the index of the samples of the next batch, a slice or a sorted integer array."""
+        if self.position >= self.size:
+            self.position = 0
+            self.epoch += 1
+            if self.shuffle:
+                self.order = self.random.permutation(self.size)
+        start = self.position
+        self.position = min(start + self.batch_size, self.size)
+        if not self.shuffle:
+            return slice(start, self.position)
+        # Sorted indices read memory mapped columns front to back.
+        return np.sort(self.order[start:self.position])
+
+    def next(self):
+        """Returns the list of values of the next batch in order of `placeholders`."""
+        index = self.indices()
+        return [np.asarray(c[index]) for c in self.columns]
+
+    def bind(self, fargs=None):
+        """Returns a copy of the dictionary of symbol values `fargs` with the values of the next batch added."""
+        fargs = dict(fargs or {})
+        fargs.update(zip(self.placeholders, self.next()))
+        return fargs
+
+    def __iter__(self):
+        """Yields dictionaries of the values of the batches of one epoch."""
+        for i in range(len(self)):
+            yield self.bind()
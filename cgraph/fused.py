@@ -0,0 +1,133 @@
+"""CGraph - symbolic computation in Python library.
+
+This library is the result of my efforts to understand symbolic computation of
+functions factored as expression trees. In a few lines of code it shows how to
+forward evaluate functions and how to perform numeric and symbolic derivatives
+computations using backpropagation.
+
+While this library is not complete (and will never be) it offers the interested
+reader some insights on one way in which symbolic computation can be performed.
+
+The code is accompanied by a series of notebooks that explain the fundamental
+concepts. You can find these notebooks online at
+
+    https://github.com/cheind/py-cgraph
+
+Christoph Heindl, 2017
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+import cgraph as cg
+from .generator import Program, codegen, _lookup, _render, _sum
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+__all__ = ['JitFunction', 'jit', 'jit_available', 'jit_max_nodes']
+
+jit_available = numba is not None
+"""Whether numba is installed and expressions can be compiled to machine code."""
+
+class JitFunction:
+    """A function and its gradient fused into a single loop over the batch.
+
+    The loop body evaluates the entire expression and performs the reverse
+    sweep on scalars, so that no temporary arrays are written and no numpy
+    call overhead is paid per node. The source is generated from the same
+    templates as `GeneratedFunction` and compiled by numba if available. Without
+    numba the loop runs as plain Python, which is only useful for testing, see
+    `jit` for a fallback. Calls behave like `Function.__call__`.
+
+    Only constants holding a single value are supported.
+    """
+
+    def __init__(self, f, symbols):
+        self.f = f
+        self.symbols = list(symbols)
+        self.key = cg.structural_hash(f)
+        self.namespace = {'np': np, '_sum': _sum}
+        self.source = self.generate()
+
+        code = compile(self.source, '<cgraph.jit {}>'.format(self.key[:12]), 'exec')
+        exec(code, self.namespace)
+        self.value = self.namespace['value']
+        self.gradient = self.namespace['gradient']
+        if numba is not None:
+            # Follow numpy on division by zero, returning inf or nan instead of raising.
+            njit = numba.njit(error_model='numpy')
+            self.namespace['_sum'] = njit(_sum)
+            self.value = njit(self.value)
+            self.gradient = njit(self.gradient)
+
+    def generate(self):
+        """Returns the Python source code of the loops `value` and `gradient`."""
+        p = Program(self.f, self.symbols, self.namespace)
+        for name, v in list(self.namespace.items()):
+            if isinstance(v, np.ndarray):
+                if v.size != 1:
+                    raise NotImplementedError('Constants of shape {} cannot be fused'.format(v.shape))
+                self.namespace[name] = float(v.reshape(-1)[0])
+
+        constants = set(self.namespace)
+        arrays = ['x' + v[1:] for v in p.params]
+        inputs = [(v, 'x{}[i]'.format(v[1:]), []) for v in p.params]
+        indent = ' ' * 8
+
+        lines = ['def value({}):'.format(', '.join(['n'] + arrays + ['out'])), '    for i in range(n):']
+        lines += _render(inputs + p.forward, [p.output], constants, indent=indent, release=False)
+        lines += ['{}out[i] = {}'.format(indent, p.output), '']
+
+        lines += ['def gradient({}):'.format(', '.join(['n'] + arrays + ['out', 'grad'])), '    for i in range(n):']
+        statements = inputs + p.forward
+        if self.f in p.active:
+            statements += [(p.derivatives[self.f], '1.0', [])] + p.backward
+        lines += _render(statements, [], constants, indent=indent, release=False)
+        lines += ['{}out[i] = {}'.format(indent, p.output)]
+        for i, s in enumerate(self.symbols):
+            lines += ['{}grad[i, {}] = {}'.format(indent, i, p.derivatives.get(s, '0.0'))]
+        lines += ['']
+        return '\n'.join(lines)
+
+    def __call__(self, *values, compute_gradient=False, mode=None):
+        values = np.broadcast_arrays(*[np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in values])
+        shape = values[0].shape
+        values = [np.ascontiguousarray(v).reshape(-1) for v in values]
+        n = len(values[0])
+
+        out = np.empty(n)
+        if compute_gradient:
+            g = np.empty((n, len(self.symbols)))
+            self.gradient(n, *values, out, g)
+            return out.reshape(shape), g
+        else:
+            self.value(n, *values, out)
+            return out.reshape(shape)
+
+jit_max_nodes = 1000
+"""Maximum number of nodes of expressions fused by `jit`, compile times grow with the size of the expression."""
+
+_cache = OrderedDict()
+"""Fused functions by structural hash of expression and symbol names."""
+
+def jit(f, symbols):
+    """Returns a `JitFunction` of `f` if numba is available, otherwise a `GeneratedFunction`.
+
+    Expressions that cannot be fused or have more than `jit_max_nodes` nodes
+    fall back to a `GeneratedFunction` as well, which evaluates them using numpy.
+    """
+    if numba is None or len(cg.topological_order(f)) > jit_max_nodes:
+        return codegen(f, symbols)
+
+    def make():
+        try:
+            return JitFunction(f, symbols)
+        except NotImplementedError:
+            return codegen(f, symbols)
+
+    key = (cg.structural_hash(f), tuple(str(s) for s in symbols))
+    return _lookup(_cache, key, make)
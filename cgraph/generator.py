@@ -0,0 +1,318 @@
+"""CGraph - symbolic computation in Python library.
+
+This library is the result of my efforts to understand symbolic computation of
+functions factored as expression trees. In a few lines of code it shows how to
+forward evaluate functions and how to perform numeric and symbolic derivatives
+computations using backpropagation.
+
+While this library is not complete (and will never be) it offers the interested
+reader some insights on one way in which symbolic computation can be performed.
+
+The code is accompanied by a series of notebooks that explain the fundamental
+concepts. You can find these notebooks online at
+
+    https://github.com/cheind/py-cgraph
+
+Christoph Heindl, 2017
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+import cgraph as cg
+
+__all__ = ['GeneratedFunction', 'Program', 'codegen', 'clear_cache', 'register_template', 'templates']
+
+templates = {}
+"""Maps node types to the templates of their value and gradient expressions."""
+
+def register_template(klass, value, gradients):
+    """Registers how code is generated for nodes of type `klass`.
+
+    `value` is a format string of the node's value expression in terms of the
+    child values `{0}, {1}, ...`. `gradients` is a list of format strings, one
+    per child, of the local derivatives, which may additionally refer to the
+    node's value as `{value}`. Local derivatives `'1'` and `'-1'` are propagated
+    without multiplication. For nodes of variable arity, `value` and `gradients`
+    may be callables that take the list of child variables, and in case of
+    `gradients` the value variable, and return the expressions.
+    """
+    templates[klass] = (value, gradients)
+
+def _sum(vs):
+    s = vs[0] + vs[1]
+    for v in vs[2:]:
+        s = s + v
+    return s
+
+def _sum_value(args):
+    if len(args) == 1:
+        return '{} + 0'.format(args[0])
+    elif len(args) <= 8:
+        return ' + '.join(args)
+    else:
+        # Avoid deeply nested binary expressions that are slow to compile.
+        return '_sum(({},))'.format(', '.join(args))
+
+register_template(cg.Add, '{0} + {1}', ['1', '1'])
+register_template(cg.Sum, _sum_value, lambda args, value: ['1'] * len(args))
+register_template(cg.Sub, '{0} - {1}', ['1', '-1'])
+register_template(cg.Mul, '{0} * {1}', ['{1}', '{0}'])
+register_template(cg.Div, '{0} / {1}', ['1. / {1}', '-{value} / {1}'])
+register_template(cg.Logarithm, 'np.log({0})', ['1. / {0}'])
+register_template(cg.Neg, '-{0}', ['-1'])
+register_template(cg.Pow, '{0} ** {1}', ['{1} * {0} ** ({1} - 1)', '{value} * np.log({0})'])
+register_template(cg.Exp, 'np.exp({0})', ['{value}'])
+register_template(cg.Sqrt, 'np.sqrt({0})', ['0.5 / {value}'])
+register_template(cg.Min, 'np.minimum({0}, {1})', ['({0} <= {1})', '({0} > {1})'])
+register_template(cg.Max, 'np.maximum({0}, {1})', ['({0} >= {1})', '({0} < {1})'])
+register_template(cg.Sin, 'np.sin({0})', ['np.cos({0})'])
+register_template(cg.Cos, 'np.cos({0})', ['-np.sin({0})'])
+
+def _expand(template, args, *extra):
+    if callable(template):
+        return template(args, *extra)
+    elif isinstance(template, str):
+        return template.format(*args, value=extra[0] if extra else None)
+    else:
+        return [_expand(t, args, *extra) for t in template]
+
+def _seed(k, i, v):
+    t = np.zeros((k,) + (1,)*v.ndim)
+    t[i] = 1
+    return t
+
+def _tangent(n, template, args, name, tangents):
+    """Returns the expression of the tangent of node `n` and the variables it reads."""
+    grads = _expand(template, args, name)
+    terms = []
+    reads = []
+    for c, a, g in zip(n.children, args, grads):
+        if c not in tangents:
+            continue
+        t = tangents[c]
+        if g == '1':
+            terms.append(t)
+            reads += [t]
+        elif g == '-1':
+            terms.append('-' + t)
+            reads += [t]
+        else:
+            terms.append('({}) * {}'.format(g, t))
+            reads += [t, name] + args
+    if len(terms) > 8:
+        return '_sum(({},))'.format(', '.join(terms)), reads
+    return ' + '.join(terms), reads
+
+def _render(statements, returned, constants, indent='    ', release=True):
+    """Returns the source lines of `statements` deleting local variables after their last use."""
+    last = {}
+    for i, (target, expr, reads) in enumerate(statements):
+        for r in reads:
+            last[r] = i
+    for r in returned:
+        last.pop(r, None)
+
+    dead = [[] for s in statements]
+    for r, i in last.items():
+        if r not in constants:
+            dead[i].append(r)
+
+    lines = []
+    for (target, expr, reads), d in zip(statements, dead):
+        lines.append('{}{} = {}'.format(indent, target, expr))
+        # A variable read by the statement assigning it stays alive.
+        d = sorted(r for r in d if r != target)
+        if d and release:
+            lines.append('{}del {}'.format(indent, ', '.join(d)))
+    return lines
+
+class Program:
+    """The statements computing the value, derivatives and tangents of an expression.
+
+    Statements are tuples of the variable assigned, the expression and the
+    variables read, so that code generators can order, wrap and release them.
+    The values of symbols are expected in the variables `params`, constants
+    are stored in `namespace`. `forward` computes the values of all nodes,
+    `backward` propagates the derivative `derivatives[f]` of the expression
+    towards the symbols and `tangent` interleaves the values with tangents in
+    forward mode, starting from the tangents `tangents[s]` of the symbols.
+    """
+
+    def __init__(self, f, symbols, namespace):
+        self.f = f
+        self.symbols = list(symbols)
+        self.params = ['v{}'.format(i) for i in range(len(self.symbols))]
+
+        order = cg.topological_order(f)
+        names = dict(zip(self.symbols, self.params))
+        active = set(self.symbols)
+        tangents = dict((s, 't' + p[1:]) for s, p in zip(self.symbols, self.params))
+        forward = []
+        tangent = []
+        for n in order:
+            if n in names:
+                continue
+            name = 'v{}'.format(len(names))
+            names[n] = name
+            if isinstance(n, cg.Constant):
+                namespace[name] = n.value
+                continue
+            elif isinstance(n, cg.Symbol):
+                raise ValueError('Symbol {} is not bound to an argument'.format(n))
+            elif type(n) not in templates:
+                raise NotImplementedError('No code template for nodes of type {}'.format(type(n).__name__))
+            args = [names[c] for c in n.children]
+            forward.append((name, _expand(templates[type(n)][0], args), args))
+            tangent.append(forward[-1])
+            if any(c in active for c in n.children):
+                active.add(n)
+                tangents[n] = 't' + name[1:]
+                tangent.append((tangents[n],) + _tangent(n, templates[type(n)][1], args, name, tangents))
+
+        backward = []
+        derivatives = {}
+        if f in active:
+            derivatives[f] = 'd' + names[f][1:]
+        for n in reversed(order):
+            if n not in derivatives or not n.children:
+                continue
+            d = derivatives[n]
+            args = [names[c] for c in n.children]
+            grads = _expand(templates[type(n)][1], args, names[n])
+            for c, g in zip(n.children, grads):
+                if c not in active:
+                    continue
+                reads = [d] if g in ('1', '-1') else [d, names[n]] + args
+                if g == '1':
+                    term = d
+                elif g == '-1':
+                    term = '-' + d
+                else:
+                    term = '{} * ({})'.format(d, g)
+                if c in derivatives:
+                    backward.append((derivatives[c], '{} + {}'.format(derivatives[c], term), reads + [derivatives[c]]))
+                else:
+                    derivatives[c] = 'd' + names[c][1:]
+                    backward.append((derivatives[c], term, reads))
+
+        self.names = names
+        self.active = active
+        self.forward = forward
+        self.backward = backward
+        self.derivatives = derivatives
+        self.tangent = tangent
+        self.tangents = tangents
+        self.output = names[f]
+
+class GeneratedFunction:
+    """A function and its gradient generated as Python source code from an expression.
+
+    The source contains a straight-line function `value` that evaluates the
+    expression with one numpy expression per node, a function `gradient` that
+    additionally performs the reverse sweep and a function `forward_gradient`
+    that computes tangents along with values in forward mode. Compared to a
+    `Tape` there is no per node dispatch at runtime, which matters most for
+    small batches. Calls behave like `Function.__call__`. Use `codegen` to
+    create instances.
+    """
+
+    def __init__(self, f, symbols):
+        self.f = f
+        self.symbols = list(symbols)
+        self.key = cg.structural_hash(f)
+        self.namespace = {'np': np, '_sum': _sum, '_seed': _seed}
+        self.source = self.generate()
+
+        code = compile(self.source, '<cgraph.codegen {}>'.format(self.key[:12]), 'exec')
+        exec(code, self.namespace)
+        self.value = self.namespace['value']
+        self.gradient = self.namespace['gradient']
+        self.forward_gradient = self.namespace['forward_gradient']
+
+    def generate(self):
+        """Returns the Python source code of the functions `value`, `gradient` and `forward_gradient`."""
+        p = Program(self.f, self.symbols, self.namespace)
+        constants = set(self.namespace)
+        params = ', '.join(p.params)
+        inputs = [(v, 'np.atleast_1d({})'.format(v), [v]) for v in p.params]
+        seeds = [
+            (p.tangents[s], '_seed({}, {}, {})'.format(len(p.params), i, v), [v])
+            for i, (s, v) in enumerate(zip(self.symbols, p.params))
+        ]
+
+        lines = ['def value({}):'.format(params)]
+        lines += _render(inputs + p.forward, [p.output], constants)
+        lines += ['    return {}'.format(p.output), '']
+
+        lines += ['def gradient({}):'.format(params)]
+        if self.f in p.active:
+            seed = [(p.derivatives[self.f], 'np.ones(1)', [])]
+            returned = [p.output] + [p.derivatives[s] for s in self.symbols if s in p.derivatives]
+            lines += _render(inputs + p.forward + seed + p.backward, returned, constants)
+        else:
+            lines += _render(inputs + p.forward, [p.output], constants)
+        result = [p.derivatives.get(s, 'np.zeros(1)') for s in self.symbols]
+        lines += ['    return {}, [{}]'.format(p.output, ', '.join(result)), '']
+
+        lines += ['def forward_gradient({}):'.format(params)]
+        if self.f in p.active:
+            lines += _render(inputs + seeds + p.tangent, [p.output, p.tangents[self.f]], constants)
+            lines += ['    return {}, list({})'.format(p.output, p.tangents[self.f]), '']
+        else:
+            lines += _render(inputs + p.forward, [p.output], constants)
+            lines += ['    return {}, [np.zeros(1)] * {}'.format(p.output, len(p.params)), '']
+        return '\n'.join(lines)
+
+    def __call__(self, *values, compute_gradient=False, mode=None):
+        if compute_gradient:
+            if mode is None:
+                mode = 'forward' if len(self.symbols) <= cg.Function.forward_max_symbols else 'reverse'
+            if mode == 'forward':
+                v, g = self.forward_gradient(*values)
+            elif mode == 'reverse':
+                v, g = self.gradient(*values)
+            else:
+                raise ValueError('Unknown mode {}'.format(mode))
+            g = np.hstack([np.broadcast_to(gi, v.shape).reshape(-1, 1) for gi in g])
+            return v, g
+        else:
+            return self.value(*values)
+
+cache_size = 128
+"""Maximum number of functions kept by `codegen` and `jit`, least recently used ones are dropped first."""
+
+_cache = OrderedDict()
+"""Generated functions by structural hash of expression and symbol names."""
+
+def _lookup(cache, key, make):
+    """Returns `cache[key]`, creating it by `make()` and dropping the least recently used entries if needed."""
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    v = make()
+    cache[key] = v
+    while len(cache) > cache_size:
+        cache.popitem(last=False)
+    return v
+
+def clear_cache():
+    """Removes all generated and fused functions from the cache."""
+    from .fused import _cache as fused_cache
+    _cache.clear()
+    fused_cache.clear()
+
+def codegen(f, symbols):
+    """Returns a `GeneratedFunction` evaluating `f` and its gradient with respect to `symbols`.
+
+    Generated functions are cached by the structural hash of `f` and the names
+    of the symbols, so that structurally identical expressions share the code.
+    At most `cache_size` functions are kept, see also `clear_cache`.
+
+        F = cg.codegen(x * cg.sym_sin(y), [x, y])
+        v, g = F([1, 2], [3, 4], compute_gradient=True)
+        print(F.source)
+    """
+    key = (cg.structural_hash(f), tuple(str(s) for s in symbols))
+    return _lookup(_cache, key, lambda: GeneratedFunction(f, symbols))
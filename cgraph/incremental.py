@@ -0,0 +1,162 @@
+"""CGraph - symbolic computation in Python library.
+
+This library is the result of my efforts to understand symbolic computation of
+functions factored as expression trees. In a few lines of code it shows how to
+forward evaluate functions and how to perform numeric and symbolic derivatives
+computations using backpropagation.
+
+While this library is not complete (and will never be) it offers the interested
+reader some insights on one way in which symbolic computation can be performed.
+
+The code is accompanied by a series of notebooks that explain the fundamental
+concepts. You can find these notebooks online at
+
+    https://github.com/cheind/py-cgraph
+
+Christoph Heindl, 2017
+"""
+
+from numbers import Number
+
+import numpy as np
+
+import cgraph as cg
+
+__all__ = ['IncrementalFunction']
+
+def differs(v, p):
+    """Returns true if the symbol value `v` differs from the previous value `p`."""
+    if isinstance(v, Number) and isinstance(p, Number):
+        return not v == p
+    v = np.atleast_1d(v)
+    p = np.atleast_1d(p)
+    return v.shape != p.shape or not (v == p).all()
+
+class IncrementalFunction:
+    """A function that recomputes only the nodes depending on symbols whose values changed.
+
+    The values of all nodes of the last call are kept. On the next call the
+    symbol values are compared to the previous ones and only the instructions
+    of the tape in the cone of the changed symbols, i.e. the nodes depending
+    on them, are evaluated again. Local gradients of nodes outside the cone
+    are kept as well and reused by the reverse sweep of the next gradient.
+
+    When only a single symbol changes between calls, as in coordinate descent,
+    `partial` computes the derivative with respect to this symbol in forward
+    mode, which visits the cone of the symbol only.
+
+        F = cg.IncrementalFunction(f, [x, y])
+        v = F(1., 2.)
+        v = F(1., 2.5) # evaluates nodes depending on y only
+        v, dy = F.partial(1, 1., 3.)
+
+    `evaluated` holds the number of instructions evaluated by the last call.
+    """
+
+    def __init__(self, f, symbols):
+        self.f = f
+        self.symbols = list(symbols)
+        self.tape = cg.compile(f, self.symbols)
+
+        # Bit mask of symbols each slot depends on, and the instructions
+        # depending on each symbol in tape order.
+        deps = [1 << i for i in range(len(self.symbols))] + [0] * (len(self.tape.nodes) - len(self.symbols))
+        for op, args, out in self.tape.code:
+            for a in args:
+                deps[out] |= deps[a]
+        self.cones = [
+            [k for k, (op, args, out) in enumerate(self.tape.code) if deps[out] & (1 << i)]
+            for i in range(len(self.symbols))
+        ]
+
+        self.inputs = None
+        self.slots = None
+        self.gradients = [None] * len(self.tape.code)
+        self.evaluated = 0
+
+    def update(self, *values):
+        """Updates the values of all nodes for the given symbol values and returns the indices of changed symbols."""
+        if self.slots is None:
+            changed = list(range(len(values)))
+            self.slots = self.tape.values(*values)
+            self.inputs = [None] * len(values)
+            self.evaluated = len(self.tape.code)
+        else:
+            changed = [i for i, (v, p) in enumerate(zip(values, self.inputs)) if differs(v, p)]
+            if len(changed) == 1:
+                code = self.cones[changed[0]]
+            else:
+                code = sorted(set().union(*[self.cones[i] for i in changed]))
+
+            s = self.slots
+            for i in changed:
+                s[i] = np.atleast_1d(values[i])
+            for k in code:
+                op, args, out = self.tape.code[k]
+                s[out] = op([s[a] for a in args])
+                self.gradients[k] = None
+            self.evaluated = len(code)
+
+        # Copies guard against changes of the caller's arrays in place.
+        for i in changed:
+            v = values[i]
+            self.inputs[i] = v if isinstance(v, Number) else np.array(v)
+        return changed
+
+    def gradient(self, *values):
+        """Returns the value of the expression and its partial derivatives with respect to the symbols.
+
+        Local gradients of elementwise nodes whose children did not change since
+        the last gradient are reused.
+        """
+        self.update(*values)
+        s = self.slots
+        d = [None] * len(s)
+        o = self.tape.output
+        d[o] = np.ones(1) if self.tape.elementwise else np.ones(s[o].shape)
+        for k in reversed(range(len(self.tape.code))):
+            op, args, out = self.tape.code[k]
+            in_grad = d[out]
+            if in_grad is None:
+                continue
+            if not self.tape.elementwise:
+                cv = [s[a] for a in args]
+                for a, gi in zip(args, self.tape.nodes[out].compute_vjp(cv, s[out], in_grad)):
+                    gi = cg.unbroadcast(gi, s[a].shape)
+                    d[a] = gi if d[a] is None else d[a] + gi
+                continue
+            g = self.gradients[k]
+            if g is None:
+                g = self.tape.nodes[out].compute_gradient([s[a] for a in args], s[out])
+                self.gradients[k] = g
+            for a, gi in zip(args, g):
+                gi = in_grad if isinstance(gi, Number) and gi == 1 else gi * in_grad
+                d[a] = gi if d[a] is None else d[a] + gi
+
+        nsyms = len(self.symbols)
+        return s[self.tape.output], [np.zeros(1) if di is None else di for di in d[:nsyms]]
+
+    def partial(self, i, *values):
+        """Returns the value of the expression and its derivative with respect to the `i`-th symbol.
+
+        The derivative is computed in forward mode over the nodes depending on
+        the symbol only, which requires an expression of elementwise nodes.
+        """
+        if not self.tape.elementwise:
+            raise ValueError('Forward mode requires expressions of elementwise nodes')
+        self.update(*values)
+        s = self.slots
+        t = {i: np.ones(1)}
+        for k in self.cones[i]:
+            op, args, out = self.tape.code[k]
+            t[out] = self.tape.nodes[out].compute_tangent([s[a] for a in args], [t.get(a) for a in args], s[out])
+        o = self.tape.output
+        return s[o], t.get(o, np.zeros(1))
+
+    def __call__(self, *values, compute_gradient=False):
+        """Returns the value and optionally the gradients with one row per sample, like `Function`."""
+        if compute_gradient:
+            v, g = self.gradient(*values)
+            return v, np.hstack([np.broadcast_to(gi, v.shape).reshape(-1, 1) for gi in g])
+        self.update(*values)
+        return self.slots[self.tape.output]
@@ -0,0 +1,429 @@
+"""CGraph - symbolic computation in Python library.
+
+This library is the result of my efforts to understand symbolic computation of
+functions factored as expression trees. In a few lines of code it shows how to
+forward evaluate functions and how to perform numeric and symbolic derivatives
+computations using backpropagation.
+
+While this library is not complete (and will never be) it offers the interested
+reader some insights on one way in which symbolic computation can be performed.
+
+The code is accompanied by a series of notebooks that explain the fundamental
+concepts. You can find these notebooks online at
+
+    https://github.com/cheind/py-cgraph
+
+Christoph Heindl, 2017
+"""
+
+import numpy as np
+
+import cgraph as cg
+
+__all__ = [
+    'Objective', 'Residuals', 'Result',
+    'gradient_descent', 'lbfgs', 'stochastic_gradient_descent',
+    'gauss_newton', 'levenberg_marquardt',
+]
+
+class Objective:
+    """The sum of values of an expression as function of a flat parameter vector.
+
+    The values of `symbols` are stored one after another in a flat vector `p`
+    with the given `shapes`, so that optimizers work on plain numpy vectors.
+    The expression is compiled once into a `cg.Function`, whose `backend` is
+    passed along. `value_and_gradient` returns the value computed by the forward
+    sweep of the gradient, so no separate evaluation is needed for it.
+
+        F = cg.optimize.Objective(f, [w0, w1], [(1,), (1,)])
+        v, g = F.value_and_gradient(np.array([0.4, 1.1]))
+
+    `data` binds the placeholders of the expression, see `cg.Placeholder`,
+    either to fixed values given as dictionary or to the batches of a
+    `cg.MiniBatches`. Batches are passed to the compiled function along with
+    the parameters, and `resample` moves on to the next batch.
+
+    `evaluations` counts the calls to the compiled function.
+    """
+
+    def __init__(self, f, symbols, shapes, backend=None, data=None):
+        self.f = f
+        self.symbols = list(symbols)
+        self.shapes = [tuple(s) for s in shapes]
+        self.sizes = [int(np.prod(s)) for s in self.shapes]
+        self.offsets = np.cumsum([0] + self.sizes).tolist()
+        self.data = data
+        self.placeholders = []
+        self.batch = []
+        if isinstance(data, cg.MiniBatches):
+            self.placeholders = data.placeholders
+            self.batch = data.next()
+        elif data is not None:
+            self.placeholders = list(data)
+            self.batch = [data[ph] for ph in self.placeholders]
+        self.function = cg.Function(f, self.symbols + self.placeholders, backend=backend)
+        self.evaluations = 0
+
+    @classmethod
+    def create(cls, f, symbols, x0, backend=None, data=None):
+        """Returns the objective and the flat vector of the initial symbol values `x0`."""
+        x0 = [np.atleast_1d(np.asarray(v, dtype=float)) for v in x0]
+        obj = cls(f, symbols, [v.shape for v in x0], backend=backend, data=data)
+        return obj, obj.join(x0)
+
+    @property
+    def size(self):
+        """Returns the number of parameters."""
+        return self.offsets[-1]
+
+    def split(self, p):
+        """Returns the list of symbol values stored in the flat vector `p`."""
+        o = self.offsets
+        return [p[o[i]:o[i+1]].reshape(s) for i, s in enumerate(self.shapes)]
+
+    def join(self, values):
+        """Returns the flat vector of the given symbol values."""
+        return np.concatenate([
+            np.broadcast_to(np.asarray(v, dtype=float), s).ravel() for v, s in zip(values, self.shapes)])
+
+    def arguments(self, p):
+        """Returns the arguments of the compiled function, the symbol values in `p` followed by the data."""
+        return self.split(p) + self.batch
+
+    def resample(self):
+        """Moves on to the next batch of data if `data` is a `cg.MiniBatches`."""
+        if isinstance(self.data, cg.MiniBatches):
+            self.batch = self.data.next()
+
+    def value(self, p):
+        """Returns the value of the objective at `p`."""
+        self.evaluations += 1
+        return float(np.sum(self.function(*self.arguments(p))))
+
+    def value_and_gradient(self, p):
+        """Returns the value and flat gradient of the objective at `p` from a single gradient pass."""
+        self.evaluations += 1
+        if self.placeholders:
+            # Derivatives with respect to the data are not needed.
+            v, g = self.function.tape.gradient(*self.arguments(p), wrt=self.symbols)
+            if self.function.tape.elementwise:
+                g = [np.broadcast_to(gi, v.shape) for gi in g]
+        else:
+            v, g = self.function(*self.arguments(p), compute_gradient=True)
+            if self.function.tape.elementwise:
+                g = [g[:, i].reshape(v.shape) for i in range(len(self.shapes))]
+        return float(np.sum(v)), self.join([cg.unbroadcast(gi, s) for gi, s in zip(g, self.shapes)])
+
+class Residuals(Objective):
+    """Half the sum of squared values of a residual expression as function of a flat parameter vector.
+
+    Besides the objective, `residuals_and_jacobian` returns the residual vector
+    and its Jacobian, one row per residual, as required by `gauss_newton` and
+    `levenberg_marquardt`. For elementwise expressions of scalar parameters the
+    Jacobian is the per-sample gradient of a single pass. Otherwise it is built
+    column by column from one forward sweep of tangents per parameter.
+    """
+
+    def residuals(self, p):
+        """Returns the flat vector of residuals at `p`."""
+        self.evaluations += 1
+        return np.ravel(self.function(*self.arguments(p))).astype(float)
+
+    def value(self, p):
+        r = self.residuals(p)
+        return 0.5 * float(np.dot(r, r))
+
+    def value_and_gradient(self, p):
+        r, J = self.residuals_and_jacobian(p)
+        return 0.5 * float(np.dot(r, r)), np.dot(J.T, r)
+
+    def residuals_and_jacobian(self, p):
+        """Returns the flat vector of residuals and their Jacobian at `p`."""
+        self.evaluations += 1
+        values = self.arguments(p)
+        tape = self.function.tape
+        if tape.elementwise and all(n == 1 for n in self.sizes):
+            v, g = tape.gradient(*values, wrt=self.symbols)
+            return np.ravel(v).astype(float), np.column_stack([np.broadcast_to(gi, v.shape).ravel() for gi in g])
+
+        r = None
+        columns = []
+        for i, shape in enumerate(self.shapes):
+            for j in range(self.sizes[i]):
+                e = np.zeros(self.sizes[i])
+                e[j] = 1.
+                tangents = [None] * len(values)
+                tangents[i] = e.reshape(shape)
+                s, t = tape.tangents(values, tangents)
+                out = s[tape.output]
+                r = np.ravel(out).astype(float)
+                dt = t[tape.output]
+                columns.append(np.zeros(r.shape) if dt is None else np.broadcast_to(dt, out.shape).ravel())
+        return r, np.column_stack(columns)
+
+class Result:
+    """The outcome of a minimization.
+
+    `x` holds the list of symbol values and `p` the flat parameter vector of
+    the solution, `value` and `gradient` the objective and its flat gradient
+    there. `converged` tells whether a tolerance was met within `iterations`,
+    `message` states why the optimizer stopped, and `evaluations` counts the
+    calls to the compiled function.
+    """
+
+    def __init__(self, objective, p, value, gradient):
+        self.objective = objective
+        self.p = p
+        self.value = value
+        self.gradient = gradient
+        self.iterations = 0
+        self.converged = False
+        self.message = 'Maximum number of iterations reached'
+
+    @property
+    def x(self):
+        return self.objective.split(self.p)
+
+    @property
+    def evaluations(self):
+        return self.objective.evaluations
+
+    def __repr__(self):
+        return 'Result(value={}, iterations={}, converged={}, message={!r})'.format(
+            self.value, self.iterations, self.converged, self.message)
+
+def converged(result, previous, gtol, ftol):
+    """Updates `result` and returns true if the gradient norm or the relative decrease of the objective is small."""
+    if np.linalg.norm(result.gradient, np.inf) <= gtol:
+        result.converged = True
+        result.message = 'Gradient norm below tolerance'
+    elif previous is not None and previous - result.value <= ftol * max(1., abs(previous)):
+        result.converged = True
+        result.message = 'Objective decrease below tolerance'
+    return result.converged
+
+def stopped(result, callback):
+    """Updates `result` and returns true if `callback` requests to stop."""
+    if callback is not None and callback(result):
+        result.message = 'Stopped by callback'
+        return True
+    return False
+
+def line_search(obj, p, v, g, d, step, c=1e-4, shrink=0.5, max_trials=40):
+    """Returns the point, value, gradient and step satisfying the Armijo condition along `d`.
+
+    Trial points are evaluated along with their gradient, so the gradient of
+    the accepted point, usually the first trial, comes without another pass.
+    Returns `None` if `d` is not a descent direction or no step is accepted.
+    """
+    slope = np.dot(g, d)
+    if not slope < 0:
+        return None
+    for _ in range(max_trials):
+        pn = p + step * d
+        vn, gn = obj.value_and_gradient(pn)
+        if vn <= v + c * step * slope:
+            return pn, vn, gn, step
+        step *= shrink
+    return None
+
+def descend(obj, p, direction, update, max_iter, gtol, ftol, callback):
+    """Runs line searches along the directions returned by `direction(result, step)`.
+
+    `direction` returns the search direction and the initial trial step given
+    the suggested `step`, which is the last accepted step doubled if it was
+    accepted at once.
+
+    `update(s, y)` is called with the step and gradient change of each accepted step.
+    """
+    v, g = obj.value_and_gradient(p)
+    result = Result(obj, p, v, g)
+    if converged(result, None, gtol, ftol) or stopped(result, callback):
+        return result
+
+    step = 1.
+    for k in range(max_iter):
+        d, trial = direction(result, step)
+        found = line_search(obj, result.p, result.value, result.gradient, d, trial)
+        if found is None:
+            result.message = 'Line search failed'
+            break
+        pn, vn, gn, step = found
+        # Rejected trials cost a gradient pass each, so the step only grows
+        # after a full step was accepted.
+        if step == trial:
+            step *= 2.
+        update(pn - result.p, gn - result.gradient)
+        previous = result.value
+        result.p, result.value, result.gradient = pn, vn, gn
+        result.iterations = k + 1
+        if converged(result, previous, gtol, ftol) or stopped(result, callback):
+            break
+    return result
+
+def gradient_descent(f, symbols, x0, max_iter=200, gtol=1e-6, ftol=1e-12, callback=None, backend=None, data=None):
+    """Minimizes the sum of values of `f` by steepest descent with backtracking line search.
+
+    `x0` lists the initial values of `symbols`, numbers or arrays. Each line
+    search starts at the previous step, doubled if it was not shortened. The
+    optimizer stops early once the largest partial derivative is below `gtol`,
+    the relative decrease of the objective is below `ftol`, or `callback(result)`
+    returns true. Returns a `Result`.
+
+    `data` binds the placeholders of `f` as described in `Objective`. Given
+    `cg.MiniBatches`, the objective is that of its first batch, see
+    `stochastic_gradient_descent` to visit all batches instead.
+
+        r = cg.optimize.gradient_descent(f, [w0, w1], [0.4, 1.1])
+        w0v, w1v = r.x
+    """
+    obj, p = Objective.create(f, symbols, x0, backend=backend, data=data)
+
+    def direction(result, step):
+        return -result.gradient, step
+
+    return descend(obj, p, direction, lambda s, y: None, max_iter, gtol, ftol, callback)
+
+def lbfgs(f, symbols, x0, memory=10, max_iter=200, gtol=1e-6, ftol=1e-12, callback=None, backend=None, data=None):
+    """Minimizes the sum of values of `f` by the limited memory BFGS method.
+
+    Search directions are computed by the two-loop recursion over the last
+    `memory` pairs of steps and gradient changes, and followed by a backtracking
+    line search starting at the full step. Arguments and result are as in
+    `gradient_descent`.
+    """
+    obj, p = Objective.create(f, symbols, x0, backend=backend, data=data)
+    pairs = []
+
+    def update(s, y):
+        sy = np.dot(s, y)
+        # Pairs violating the curvature condition would break positive definiteness.
+        if sy > 1e-12 * np.dot(y, y):
+            pairs.append((s, y, 1. / sy))
+            if len(pairs) > memory:
+                pairs.pop(0)
+
+    def direction(result, step):
+        q = result.gradient.copy()
+        alphas = []
+        for s, y, rho in reversed(pairs):
+            a = rho * np.dot(s, q)
+            q -= a * y
+            alphas.append(a)
+        if pairs:
+            s, y, rho = pairs[-1]
+            q *= np.dot(s, y) / np.dot(y, y)
+            step = 1.
+        else:
+            # Without curvature information the first step has unit length.
+            step = 1. / max(np.linalg.norm(q), 1e-12)
+        for (s, y, rho), a in zip(pairs, reversed(alphas)):
+            b = rho * np.dot(y, q)
+            q += (a - b) * s
+        return -q, step
+
+    return descend(obj, p, direction, update, max_iter, gtol, ftol, callback)
+
+def stochastic_gradient_descent(f, symbols, x0, data, learning_rate=0.01, momentum=0.9, max_iter=1000, callback=None, backend=None):
+    """Minimizes the mean of `f` over a dataset by stochastic gradient descent with momentum.
+
+    `data` is a `cg.MiniBatches` streaming the values of the placeholders of
+    `f` through the compiled function. Each iteration takes a step along the
+    gradient of the next batch only, so its cost is independent of the size
+    of the dataset. For the steps to follow the gradient of the mean over all
+    samples, `f` should average over the batch, e.g. using `cg.sym_mean`.
+
+    Stops after `max_iter` steps or once `callback(result)` returns true. The
+    `value` and `gradient` of the `Result` are those of the last batch.
+
+        data = cg.MiniBatches({x: xs, y: ys}, batch_size=256)
+        r = cg.optimize.stochastic_gradient_descent(f, [w0, w1], [0.4, 1.1], data)
+    """
+    obj, p = Objective.create(f, symbols, x0, backend=backend, data=data)
+    v, g = obj.value_and_gradient(p)
+    result = Result(obj, p, v, g)
+    velocity = np.zeros(p.shape)
+    for k in range(max_iter):
+        velocity = momentum * velocity - learning_rate * result.gradient
+        result.p = result.p + velocity
+        obj.resample()
+        result.value, result.gradient = obj.value_and_gradient(result.p)
+        result.iterations = k + 1
+        if stopped(result, callback):
+            break
+    return result
+
+def gauss_newton(r, symbols, x0, max_iter=50, gtol=1e-8, ftol=1e-12, callback=None, backend=None, data=None):
+    """Minimizes half the sum of squared residuals `r` by the Gauss-Newton method.
+
+    Each step solves the linear least squares problem of the residuals linearized
+    by their Jacobian, see `Residuals`, and is shortened by a backtracking line
+    search if it does not decrease the objective. Arguments and result are as in
+    `gradient_descent`.
+    """
+    obj, p = Residuals.create(r, symbols, x0, backend=backend, data=data)
+    rv, J = obj.residuals_and_jacobian(p)
+    result = Result(obj, p, 0.5 * np.dot(rv, rv), np.dot(J.T, rv))
+    if converged(result, None, gtol, ftol) or stopped(result, callback):
+        return result
+
+    for k in range(max_iter):
+        d = np.linalg.lstsq(J, -rv, rcond=None)[0]
+        slope = np.dot(result.gradient, d)
+        step = 1.
+        while True:
+            pn = result.p + step * d
+            rn, Jn = obj.residuals_and_jacobian(pn)
+            vn = 0.5 * np.dot(rn, rn)
+            if vn <= result.value + 1e-4 * step * slope or step < 1e-10:
+                break
+            step *= 0.5
+        if not vn <= result.value:
+            result.message = 'Line search failed'
+            break
+        previous = result.value
+        rv, J = rn, Jn
+        result.p, result.value, result.gradient = pn, vn, np.dot(J.T, rv)
+        result.iterations = k + 1
+        if converged(result, previous, gtol, ftol) or stopped(result, callback):
+            break
+    return result
+
+def levenberg_marquardt(r, symbols, x0, damping=1e-3, max_iter=100, gtol=1e-8, ftol=1e-12, callback=None, backend=None, data=None):
+    """Minimizes half the sum of squared residuals `r` by the Levenberg-Marquardt method.
+
+    Each step solves the Gauss-Newton equations damped by `damping` times the
+    diagonal of their matrix. The damping is decreased after steps that
+    decrease the objective and increased otherwise, in which case the step is
+    retried without recomputing the Jacobian. Arguments and result are as in
+    `gradient_descent`.
+    """
+    obj, p = Residuals.create(r, symbols, x0, backend=backend, data=data)
+    rv, J = obj.residuals_and_jacobian(p)
+    result = Result(obj, p, 0.5 * np.dot(rv, rv), np.dot(J.T, rv))
+    if converged(result, None, gtol, ftol) or stopped(result, callback):
+        return result
+
+    lam = damping
+    for k in range(max_iter):
+        A = np.dot(J.T, J)
+        D = np.maximum(np.diag(A), 1e-12)
+        while lam < 1e16:
+            d = np.linalg.solve(A + lam * np.diag(D), -result.gradient)
+            pn = result.p + d
+            rn, Jn = obj.residuals_and_jacobian(pn)
+            vn = 0.5 * np.dot(rn, rn)
+            if vn < result.value:
+                lam = max(lam / 10., 1e-12)
+                break
+            lam *= 10.
+        else:
+            result.message = 'Damping exceeded its limit'
+            break
+        previous = result.value
+        rv, J = rn, Jn
+        result.p, result.value, result.gradient = pn, vn, np.dot(J.T, rv)
+        result.iterations = k + 1
+        if converged(result, previous, gtol, ftol) or stopped(result, callback):
+            break
+    return result
@@ -0,0 +1,120 @@
+"""CGraph - symbolic computation in Python library.
+
+This library is the result of my efforts to understand symbolic computation of
+functions factored as expression trees. In a few lines of code it shows how to
+forward evaluate functions and how to perform numeric and symbolic derivatives
+computations using backpropagation.
+
+While this library is not complete (and will never be) it offers the interested
+reader some insights on one way in which symbolic computation can be performed.
+
+The code is accompanied by a series of notebooks that explain the fundamental
+concepts. You can find these notebooks online at
+
+    https://github.com/cheind/py-cgraph
+
+Christoph Heindl, 2017
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing as mp
+import os
+
+import numpy as np
+
+def partition(n, parts):
+    """Returns `parts` contiguous ranges `(lo, hi)` of nearly equal size covering `range(n)`."""
+    bounds = np.linspace(0, n, parts + 1).astype(int)
+    return [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+def prepare(func):
+    """Compiles the tape or generated code of `cg.Function` `func` if not done yet."""
+    if getattr(func, 'backend', 'tape') != 'tape':
+        func.kernel
+    elif hasattr(func, 'tape'):
+        func.tape
+
+def run(func, values, outputs, lo, hi, kwargs):
+    """Evaluates `func` on the range `[lo, hi)` of the batch writing the results into `outputs`."""
+    args = [v[lo:hi] if isinstance(v, np.ndarray) else v for v in values]
+    r = func(*args, **kwargs)
+    if len(outputs) == 1:
+        r = [r]
+    for o, ri in zip(outputs, r):
+        o[lo:hi] = ri
+
+_worker = {}
+"""State of a process pool worker inherited from the parent process."""
+
+def _init_worker(func, values, outputs, kwargs):
+    as_array = lambda v: np.frombuffer(v[0], dtype=np.float64).reshape(v[1])
+    _worker['func'] = func
+    _worker['values'] = [as_array(v) if isinstance(v, tuple) else v for v in values]
+    _worker['outputs'] = [as_array(o) for o in outputs]
+    _worker['kwargs'] = kwargs
+
+def _run_worker(lohi):
+    run(_worker['func'], _worker['values'], _worker['outputs'], lohi[0], lohi[1], _worker['kwargs'])
+
+def shared_array(shape):
+    """Returns a float64 array in shared memory and the raw buffer to be passed to processes."""
+    raw = mp.RawArray('d', int(np.prod(shape)))
+    return np.frombuffer(raw, dtype=np.float64).reshape(shape), (raw, shape)
+
+def evaluate(func, *values, workers=None, chunksize=None, executor='thread', compute_gradient=False, **kwargs):
+    """Evaluates the `cg.Function` `func` in parallel by partitioning the batch dimension.
+
+    The batch given by the arrays in `values` is split into contiguous slices of
+    `chunksize` samples, by default one per worker. Each slice is evaluated by
+    a worker that writes its result straight into the corresponding rows of
+    preallocated output arrays, so results are not concatenated afterwards.
+    Returns the same as `func(*values, compute_gradient=compute_gradient)`.
+
+    With `executor='thread'` slices are evaluated by a thread pool. This works
+    well for large batches, since numpy releases the GIL in its kernels. Functions
+    are shared among threads and must not be buffered. With `executor='process'`
+    slices are evaluated by a pool of processes. Inputs and outputs are placed
+    in shared memory as float64 arrays, the returned arrays are backed by it.
+    """
+    if getattr(func, 'buffered', False) and executor == 'thread':
+        raise ValueError('Buffered functions cannot be shared among threads')
+
+    workers = workers or os.cpu_count() or 1
+    values = [np.atleast_1d(v) for v in values]
+    values = [v if len(v) > 1 else v[0] for v in values]
+    n = max([len(v) for v in values if isinstance(v, np.ndarray)] + [1])
+    chunksize = chunksize or -(-n // workers)
+    ranges = partition(n, -(-n // chunksize))
+
+    shapes = [(n,)]
+    if compute_gradient:
+        shapes.append((n, len(func.syms)))
+    kwargs = dict(kwargs, compute_gradient=compute_gradient)
+
+    if executor == 'thread':
+        # Compile up front, so that threads don't compile the same function concurrently.
+        prepare(func)
+        outputs = [np.empty(s) for s in shapes]
+        with ThreadPoolExecutor(workers) as pool:
+            tasks = [pool.submit(run, func, values, outputs, lo, hi, kwargs) for lo, hi in ranges]
+            for t in tasks:
+                t.result()
+    elif executor == 'process':
+        outputs, raw_outputs = zip(*[shared_array(s) for s in shapes])
+        raw_values = []
+        for v in values:
+            if np.isscalar(v):
+                raw_values.append(v)
+            else:
+                a, raw = shared_array(np.shape(v))
+                a[:] = v
+                raw_values.append(raw)
+        with mp.Pool(workers, _init_worker, (func, raw_values, raw_outputs, kwargs)) as pool:
+            pool.map(_run_worker, ranges)
+    else:
+        raise ValueError('Unknown executor {}'.format(executor))
+
+    if compute_gradient:
+        return tuple(outputs)
+    else:
+        return outputs[0]
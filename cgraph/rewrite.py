@@ -0,0 +1,444 @@
+"""CGraph - symbolic computation in Python library.
+
+This library is the result of my efforts to understand symbolic computation of
+functions factored as expression trees. In a few lines of code it shows how to
+forward evaluate functions and how to perform numeric and symbolic derivatives
+computations using backpropagation.
+
+While this library is not complete (and will never be) it offers the interested
+reader some insights on one way in which symbolic computation can be performed.
+
+The code is accompanied by a series of notebooks that explain the fundamental
+concepts. You can find these notebooks online at
+
+    https://github.com/cheind/py-cgraph
+
+Christoph Heindl, 2017
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+import cgraph as cg
+
+__all__ = [
+    'Wildcard', 'Rule', 'RuleSet', 'applies_to', 'is_const', 'match', 'substitute',
+    'register_rule', 'rule', 'simplification_rules', 'simplify', 'simplify_all',
+    'eval_to_const_rule', 'sum_rule', 'mul_identity_rule', 'add_identity_rule',
+]
+
+class Wildcard(cg.Symbol):
+    """A placeholder in rule patterns that matches any subexpression.
+
+    Patterns are ordinary expression trees built from wildcards, constants and
+    operations. For example `a * 1` matches every multiplication of an expression
+    by one. A wildcard occurring multiple times in a pattern must match the same
+    subexpression each time. When `klass` is given only nodes of that type are
+    matched, e.g `Wildcard('k', cg.Constant)` matches constants only.
+    """
+
+    __slots__ = ('klass',)
+
+    def __init__(self, name, klass=cg.Node):
+        super(Wildcard, self).__init__(name)
+        self.klass = klass
+
+def is_const(node, value=None):
+    """Returns true when the node is Constant and matched `value`."""
+    if isinstance(node, cg.Constant):
+        if value is not None:
+            return bool((node.value == value).all())
+        else:
+            return True
+    return False
+
+def match(pattern, node):
+    """Returns the wildcard bindings when `node` matches `pattern`, otherwise `None`."""
+    bindings = {}
+    stack = [(pattern, node)]
+    while stack:
+        p, n = stack.pop()
+        if isinstance(p, Wildcard):
+            if not isinstance(n, p.klass):
+                return None
+            b = bindings.setdefault(p.name, n)
+            if b is not n and b != n:
+                return None
+        elif isinstance(p, cg.Constant):
+            if not is_const(n, p.value):
+                return None
+        elif isinstance(p, cg.Symbol):
+            if p != n:
+                return None
+        else:
+            if type(n) is not type(p) or len(n.children) != len(p.children):
+                return None
+            stack.extend(zip(p.children, n.children))
+    return bindings
+
+def substitute(template, bindings):
+    """Returns a copy of `template` in which wildcards are replaced by their bindings."""
+    nodemap = {}
+    for n in cg.topological_order(template):
+        if isinstance(n, Wildcard):
+            nodemap[n] = bindings[n.name]
+        else:
+            nodemap[n] = cg.with_children(n, [nodemap[c] for c in n.children])
+    return nodemap[template]
+
+def variants(pattern):
+    """Returns all patterns that result from swapping children of commutative nodes in `pattern`."""
+    nodemap = {}
+    for n in cg.topological_order(pattern):
+        options = [[]]
+        for c in n.children:
+            options = [o + [v] for o in options for v in nodemap[c]]
+        if n.commutative and len(n.children) == 2:
+            options += [o[::-1] for o in options]
+
+        unique = {}
+        for o in options:
+            v = cg.with_children(n, o)
+            unique.setdefault(str(v), v)
+        nodemap[n] = list(unique.values())
+    return nodemap[pattern]
+
+class Rule:
+    """A rewrite rule.
+
+    The rule applies to nodes that are instances of `klass`. If `pattern` is
+    given, the node also needs to match it. The `replacement` is either an
+    expression template with wildcards of the pattern, or a callable
+    `replacement(node, **bindings)` that returns the replacement expression or
+    `None` when the rule should not fire.
+    """
+
+    def __init__(self, klass, replacement, pattern=None):
+        self.klass = klass
+        self.pattern = pattern
+        self.replacement = cg.wrap_number(replacement)
+        self.child_klasses = None
+        if pattern is not None:
+            self.child_klasses = [
+                c.klass if isinstance(c, Wildcard) else type(c) for c in pattern.children
+            ]
+
+    def applies_to(self, klass, child_klasses):
+        """Returns true if the rule may fire for nodes of type `klass` having children of types `child_klasses`."""
+        if not issubclass(klass, self.klass):
+            return False
+        if self.child_klasses is None:
+            return True
+        return len(child_klasses) == len(self.child_klasses) and all(
+            issubclass(c, k) for c, k in zip(child_klasses, self.child_klasses))
+
+    def apply(self, node):
+        """Returns the rewritten node or `None` if the rule does not apply."""
+        bindings = {}
+        if self.pattern is not None:
+            bindings = match(self.pattern, node)
+            if bindings is None:
+                return None
+        if isinstance(self.replacement, cg.Node):
+            return substitute(self.replacement, bindings)
+        else:
+            return self.replacement(node, **bindings)
+
+class RuleSet:
+    """A collection of rewrite rules indexed by the type of node they apply to.
+
+    Rules are tried in the order they were added. Since each node is only
+    tested against the rules whose pattern matches the types of the node and
+    its children, large rule sets don't slow down simplification of unrelated
+    nodes.
+
+    Plain rule functions, that take a node and return either a replacement or
+    the node itself, can be given as `rules` or added by `append`. Such rules,
+    usually decorated by `applies_to`, are tried on every node.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = []
+        self.index = {}
+        for r in rules:
+            self.append(r)
+
+    def append(self, func):
+        """Adds the rule function `func(node)`, which returns `node` when it does not apply."""
+        self.rules.append(Rule(cg.Node, func))
+        self.index = {}
+
+    def add(self, pattern, replacement, commutative=True):
+        """Adds a rule rewriting expressions matching `pattern` to `replacement`.
+
+        `pattern` is either an expression tree or a node type. In the latter case
+        `replacement` must be a callable taking the node as only argument. If
+        `commutative` is true, the rule also matches all patterns that result from
+        swapping children of commutative nodes such as `Add` and `Mul`.
+        """
+        if isinstance(pattern, type):
+            self.rules.append(Rule(pattern, replacement))
+        else:
+            if not pattern.children:
+                raise ValueError('Pattern needs to be an operation')
+            patterns = variants(pattern) if commutative else [pattern]
+            self.rules.extend(Rule(type(p), replacement, pattern=p) for p in patterns)
+        self.index = {}
+
+    def rules_for(self, klass, child_klasses=None):
+        """Returns the list of rules applicable to nodes of type `klass` having children of types `child_klasses`.
+        
+        When `child_klasses` is not given, all rules applicable to nodes of type `klass` are returned.
+        """
+        key = (klass, child_klasses)
+        r = self.index.get(key)
+        if r is None:
+            if child_klasses is None:
+                r = [x for x in self.rules if issubclass(klass, x.klass)]
+            else:
+                r = [x for x in self.rules if x.applies_to(klass, child_klasses)]
+            self.index[key] = r
+        return r
+
+    def apply(self, node):
+        """Returns the result of the first rule that rewrites `node` or `None` if no rule fires."""
+        child_klasses = tuple(type(c) for c in node.children)
+        for r in self.rules_for(type(node), child_klasses):
+            n = r.apply(node)
+            if n is not None and n is not node:
+                return n
+        return None
+
+def applies_to(*klasses):
+    """Decorates functions to match specific nodes only in rule based expression simplification."""
+    def wrapper(func):
+        def wrapped_func(node):
+            if isinstance(node, klasses):
+                return func(node)
+            else:
+                return node
+        return wrapped_func
+    return wrapper
+
+@applies_to(cg.Mul)
+def mul_identity_rule(node):
+    """Simplifies `x*1` to `x`."""
+
+    if is_const(node.children[0], 1):
+        return node.children[1]
+    elif is_const(node.children[1], 1):
+        return node.children[0]
+    else:
+        return node
+
+@applies_to(cg.Add)
+def add_identity_rule(node):
+    """Simplifies `x+0` to `x`."""
+
+    if is_const(node.children[0], 0):
+        return node.children[1]
+    elif is_const(node.children[1], 0):
+        return node.children[0]
+    else:
+        return node
+
+simplification_rules = RuleSet()
+"""Default simplification rules. Use `register_rule` to add more.
+
+Default rules don't change the value of expressions for real arguments at which
+they are defined and don't make them defined on ranges of arguments where they
+are not, such as `sqrt(x)**2` for negative `x`. As usual, isolated points like
+`x/x` at zero are disregarded. Simplified expressions may evaluate to arrays
+that need to be broadcast to the shape of the arguments, `x*0` for example
+evaluates to a single zero.
+"""
+
+def register_rule(pattern, replacement, commutative=True, rules=None):
+    """Adds a rule to `rules`, which defaults to `simplification_rules`. See `RuleSet.add`."""
+    rules = simplification_rules if rules is None else rules
+    rules.add(pattern, replacement, commutative=commutative)
+
+def rule(pattern, commutative=True, rules=None):
+    """Decorator that registers the decorated function as replacement for `pattern`.
+
+        @rule(cg.sym_sqrt(a) * cg.sym_sqrt(a))
+        def sqrt_squared(node, a):
+            return a
+    """
+    def wrapper(func):
+        register_rule(pattern, func, commutative=commutative, rules=rules)
+        return func
+    return wrapper
+
+@rule(cg.Node)
+def eval_to_const_rule(node):
+    """Simplifies every operation on Constants only to a single Constant.
+
+    Since children are simplified before their parents, an expression made of
+    Constants only is folded bottom-up without evaluating any subtree twice.
+    """
+    if node.children and all(isinstance(c, cg.Constant) for c in node.children):
+        return cg.Constant(node.compute_value([c.value for c in node.children]))
+    return None
+
+@rule(cg.Sum)
+def sum_rule(node):
+    """Removes zeros from `x + 0 + ...` and folds all Constant summands into one."""
+
+    consts = [c for c in node.children if isinstance(c, cg.Constant)]
+    if len(consts) == 0 or (len(consts) == 1 and not is_const(consts[0], 0)):
+        return None
+
+    k = sum(c.value for c in consts)
+    children = [c for c in node.children if not isinstance(c, cg.Constant)]
+    if len(children) == 0:
+        return cg.Constant(k)
+    if not np.all(k == 0):
+        children.append(cg.Constant(k))
+    if len(children) == 1:
+        return children[0]
+    return cg.sym_sum(children)
+
+def _is_integer(k):
+    return bool(np.all(np.mod(k.value, 1) == 0))
+
+def _register_default_rules():
+    a = Wildcard('a')
+    b = Wildcard('b')
+    k = Wildcard('k', cg.Constant)
+    l = Wildcard('l', cg.Constant)
+
+    # Identities
+    register_rule(a + 0, a)
+    register_rule(a - 0, a)
+    register_rule(0 - a, -a)
+    register_rule(a - a, 0)
+    register_rule(a * 1, a)
+    register_rule(a * 0, 0)
+    register_rule(a * -1, -a)
+    register_rule(a / 1, a)
+    register_rule(0 / a, 0)
+    register_rule(a / a, 1)
+    register_rule(a ** 0, 1)
+    register_rule(a ** 1, a)
+    register_rule(cg.sym_pow(1, a), 1)
+    register_rule(-(-a), a)
+
+    # Constants are moved outwards and combined
+    register_rule((a + k) + l, a + (k + l))
+    register_rule((a * k) * l, a * (k * l))
+    register_rule((a - k) + l, a + (l - k))
+    register_rule((a + k) - l, a + (k - l))
+    register_rule((a - k) - l, a - (k + l))
+
+    # Signs
+    register_rule(a + (-b), a - b)
+    register_rule(a - (-b), a + b)
+    register_rule((-a) * b, -(a * b))
+    register_rule((-a) / b, -(a / b))
+    register_rule(a / (-b), -(a / b))
+
+    # Powers
+    register_rule(a * a, a ** 2)
+    register_rule(a * (a ** k), a ** (k + 1))
+    register_rule(a / (a ** k), a ** (1 - k))
+
+    @rule((a ** k) * (a ** l))
+    def power_product(node, a, k, l):
+        # Non-integer exponents would turn `sqrt(x)*sqrt(x)` into `x`.
+        if _is_integer(k) and _is_integer(l):
+            return a ** (k + l)
+
+    @rule((a ** k) ** l)
+    def power_power(node, a, k, l):
+        # Non-integer exponents would turn `(x**2)**0.5` into `x`.
+        if _is_integer(k) and _is_integer(l):
+            return a ** (k * l)
+
+    # Exponentials and logarithms
+    register_rule(cg.sym_log(cg.sym_exp(a)), a)
+    register_rule(cg.sym_exp(a) * cg.sym_exp(b), cg.sym_exp(a + b))
+    register_rule(cg.sym_exp(a) / cg.sym_exp(b), cg.sym_exp(a - b))
+
+    @rule(cg.sym_log(a ** k))
+    def log_power(node, a, k):
+        # Even exponents would turn `log(x**2)` into `2*log(x)`.
+        if _is_integer(k) and np.all(np.mod(k.value, 2) == 1):
+            return k * cg.sym_log(a)
+
+    # Trigonometry
+    register_rule(cg.sym_sin(a) ** 2 + cg.sym_cos(a) ** 2, 1)
+    register_rule(cg.sym_sin(-a), -cg.sym_sin(a))
+    register_rule(cg.sym_cos(-a), cg.sym_cos(a))
+
+_register_default_rules()
+
+def simplify(node, rules=None):
+    """Returns a simplified version of the expression tree associated with `node`.
+
+    Every unique node is visited once in topological order. A node is rewritten,
+    after its children have been simplified, until no rule of `rules` fires.
+    New nodes introduced by a rule are simplified in the same way. Rewriting
+    stops at nodes that rules would turn back into themselves. Structurally
+    identical results are merged as in `cse`, so shared subexpressions remain
+    shared. Nodes are only copied if their children change and the input
+    expression is never modified. `rules` defaults to `simplification_rules`
+    and may also be a list of rule functions, see `RuleSet`.
+    """
+    rules = simplification_rules if rules is None else rules
+    if isinstance(rules, (list, tuple)):
+        rules = RuleSet(rules)
+    table = {}
+    done = set()
+    active = set()
+
+    def rewrite(n):
+        """Applies rules to `n`, whose children are simplified, until a fixpoint is reached."""
+        n = table.setdefault(cg.structural_key(n), n)
+        if n in done or n in active:
+            return n
+        active.add(n)
+        r = rules.apply(n)
+        if r is not None:
+            r = simplify_new(r)
+        active.remove(n)
+        if r is None or r is n:
+            done.add(n)
+            return n
+        return r
+
+    def simplify_new(r):
+        """Simplifies nodes of `r` that have not been simplified yet."""
+        if r in done:
+            return r
+        nodemap = {}
+        stack = [(r, iter(r.children))]
+        while stack:
+            n, it = stack[-1]
+            for c in it:
+                if c not in done and c not in nodemap:
+                    stack.append((c, iter(c.children)))
+                    break
+            else:
+                stack.pop()
+                nodemap[n] = rewrite(cg.with_children(n, [nodemap.get(c, c) for c in n.children]))
+        return nodemap[r]
+
+    nodemap = {}
+    for n in cg.topological_order(node):
+        nodemap[n] = rewrite(cg.with_children(n, [nodemap[c] for c in n.children]))
+    return nodemap[node]
+
+def simplify_all(nodes, rules=None):
+    """Returns simplified expression trees for all nodes in the given collection."""
+    if isinstance(nodes, (defaultdict, dict)):
+        result = nodes.copy()
+        for k, v in nodes.items():
+            result[k] = simplify(v, rules=rules)
+        return result
+    elif isinstance(nodes, (list, tuple)):
+        result = []
+        for n in nodes:
+            result.append(simplify(n, rules=rules))
+        return result
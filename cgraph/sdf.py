@@ -17,6 +17,7 @@ Christoph Heindl, 2017
 """
 
 import cgraph as cg
+import cgraph.parallel as parallel
 import numpy as np
 
 from contextlib import contextmanager
@@ -198,13 +199,20 @@ class Intersection(SDF):
 
         super(Intersection, self).__init__(sdf)
 
-def grid_eval(sdf, bounds=[(-2,2), (-2,2)], samples=[100j, 100j]):
-    """Returns the signed distance values and gradients evaluated at corners of a regular grid."""
+def grid_eval(sdf, bounds=[(-2,2), (-2,2)], samples=[100j, 100j], workers=1):
+    """Returns the signed distance values and gradients evaluated at corners of a regular grid.
+    
+    When `workers` is larger than one, the grid is split among parallel
+    threads, see `cgraph.parallel.evaluate`.
+    """
     x, y = np.mgrid[
         bounds[0][0]:bounds[0][1]:samples[0], 
         bounds[1][0]:bounds[1][1]:samples[1]
     ]
-    d, grads = sdf(x.reshape(-1), y.reshape(-1), compute_gradient=True)
+    if workers > 1:
+        d, grads = parallel.evaluate(sdf, x.reshape(-1), y.reshape(-1), workers=workers, compute_gradient=True)
+    else:
+        d, grads = sdf(x.reshape(-1), y.reshape(-1), compute_gradient=True)
     return x, y, d.reshape(x.shape), grads.reshape(x.shape + (2,))
 
 class GridSDF:
@@ -0,0 +1,215 @@
+"""CGraph - symbolic computation in Python library.
+
+This library is the result of my efforts to understand symbolic computation of
+functions factored as expression trees. In a few lines of code it shows how to
+forward evaluate functions and how to perform numeric and symbolic derivatives
+computations using backpropagation.
+
+While this library is not complete (and will never be) it offers the interested
+reader some insights on one way in which symbolic computation can be performed.
+
+The code is accompanied by a series of notebooks that explain the fundamental
+concepts. You can find these notebooks online at
+
+    https://github.com/cheind/py-cgraph
+
+Christoph Heindl, 2017
+"""
+
+import importlib
+import io
+import json
+import struct
+
+import numpy as np
+
+import cgraph as cg
+from .arrays import attribute_state
+
+__all__ = ['save', 'load', 'dumps', 'loads']
+
+MAGIC = b'CGRAPH\x00\x00'
+VERSION = 1
+ALIGNMENT = 64
+
+ARRAYS = ['ops', 'offsets', 'indices', 'data', 'const_offsets', 'const_shapes', 'const_types', 'outputs']
+"""Names of the arrays of an `ArrayGraph` stored in the order given."""
+
+def type_name(klass):
+    return '{}:{}'.format(klass.__module__, klass.__qualname__)
+
+def find_type(name):
+    """Returns the node class of the given name, see `type_name`."""
+    module, qualname = name.split(':')
+    klass = importlib.import_module(module)
+    for part in qualname.split('.'):
+        klass = getattr(klass, part)
+    if not (isinstance(klass, type) and issubclass(klass, cg.Node)):
+        raise ValueError('{} is not a node type'.format(name))
+    return klass
+
+def encode(v):
+    """Returns a JSON compatible representation of an attribute value of a node."""
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    elif isinstance(v, (np.integer, np.floating)):
+        return v.item()
+    elif isinstance(v, list):
+        return [encode(e) for e in v]
+    elif isinstance(v, tuple):
+        return {'tuple': [encode(e) for e in v]}
+    elif isinstance(v, slice):
+        return {'slice': [encode(v.start), encode(v.stop), encode(v.step)]}
+    elif v is Ellipsis:
+        return {'ellipsis': True}
+    elif isinstance(v, np.ndarray):
+        return {'array': encode(v.tolist()), 'dtype': v.dtype.str}
+    elif isinstance(v, type) and issubclass(v, cg.Node):
+        return {'type': type_name(v)}
+    raise ValueError('Cannot serialize node attribute {!r}'.format(v))
+
+def decode(v):
+    """Returns the attribute value of the given representation, see `encode`."""
+    if isinstance(v, list):
+        return [decode(e) for e in v]
+    elif not isinstance(v, dict):
+        return v
+    elif 'tuple' in v:
+        return tuple(decode(e) for e in v['tuple'])
+    elif 'slice' in v:
+        return slice(*[decode(e) for e in v['slice']])
+    elif 'ellipsis' in v:
+        return Ellipsis
+    elif 'array' in v:
+        return np.array(decode(v['array']), dtype=v['dtype'])
+    return find_type(v['type'])
+
+def encode_operator(op):
+    state = dict((name, encode(v)) for name, v in attribute_state(op))
+    return {'type': type_name(type(op)), 'nary': len(op.children), 'state': state}
+
+def decode_operator(e):
+    klass = find_type(e['type'])
+    op = klass.__new__(klass)
+    op.children = (None,) * e['nary']
+    for name, v in e['state'].items():
+        setattr(op, name, decode(v))
+    return op
+
+def write(obj, stream):
+    """Writes an expression, list of expressions, `ArrayGraph` or `Tape` to a binary stream."""
+    header = {'version': VERSION}
+    if isinstance(obj, cg.Tape):
+        header['kind'] = 'tape'
+        header['symbols'] = [s.name for s in obj.symbols]
+        header['buffered'] = obj.buffered
+        g = cg.to_arrays(obj.f)
+    elif isinstance(obj, cg.ArrayGraph):
+        header['kind'] = 'arrays'
+        g = obj
+    else:
+        header['kind'] = 'nodes'
+        g = cg.to_arrays(obj)
+
+    header['multiple'] = g.multiple
+    header['operators'] = [encode_operator(op) for op in g.operators]
+
+    # Arrays are stored aligned after the header, whose size depends on the offsets.
+    arrays = [(name, np.ascontiguousarray(getattr(g, name))) for name in ARRAYS]
+    header['arrays'] = dict((name, {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': 0}) for name, a in arrays)
+    size = len(json.dumps(header).encode()) + 32 * len(arrays)
+    offset = len(MAGIC) + 12 + size
+    for name, a in arrays:
+        offset += -offset % ALIGNMENT
+        header['arrays'][name]['offset'] = offset
+        offset += a.nbytes
+    text = json.dumps(header).encode()
+    text += b' ' * (size - len(text))
+
+    stream.write(MAGIC)
+    stream.write(struct.pack('<IQ', VERSION, len(text)))
+    stream.write(text)
+    pos = len(MAGIC) + 12 + len(text)
+    for name, a in arrays:
+        offset = header['arrays'][name]['offset']
+        stream.write(b'\x00' * (offset - pos))
+        stream.write(a.tobytes())
+        pos = offset + a.nbytes
+
+def read_header(prefix):
+    """Returns the start and size of the header given the first bytes of a serialized graph."""
+    if prefix[:len(MAGIC)] != MAGIC:
+        raise ValueError('Not a serialized expression graph')
+    version, size = struct.unpack('<IQ', prefix[len(MAGIC):len(MAGIC)+12])
+    if version > VERSION:
+        raise ValueError('Unsupported format version {}'.format(version))
+    start = len(MAGIC) + 12
+    return start, size
+
+def build(header, array):
+    """Returns the object described by `header` whose arrays are returned by `array(spec)`."""
+    g = cg.ArrayGraph(
+        operators=[decode_operator(e) for e in header['operators']],
+        multiple=header['multiple'],
+        **dict((name, array(spec)) for name, spec in header['arrays'].items()))
+    if header['kind'] == 'arrays':
+        return g
+    f = g.to_nodes()
+    if header['kind'] == 'tape':
+        return cg.compile(f, [cg.Symbol(s) for s in header['symbols']], buffered=header['buffered'])
+    return f
+
+def dumps(obj):
+    """Returns the bytes of an expression, list of expressions, `ArrayGraph` or `Tape`, see `save`."""
+    b = io.BytesIO()
+    write(obj, b)
+    return b.getvalue()
+
+def loads(b):
+    """Returns the object serialized in the given bytes, see `load`.
+
+    Arrays, and hence constant values, are views into `b`.
+    """
+    start, size = read_header(b)
+    header = json.loads(b[start:start+size].decode())
+    def array(spec):
+        count = int(np.prod(spec['shape']))
+        return np.frombuffer(b, dtype=spec['dtype'], count=count, offset=spec['offset']).reshape(spec['shape'])
+    return build(header, array)
+
+def save(obj, path):
+    """Saves an expression, list of expressions, `ArrayGraph` or `Tape` to a file.
+
+    Graphs are stored in a compact, versioned binary format: a header describing
+    the operations followed by the arrays of `ArrayGraph`, so nodes shared by
+    multiple parents are stored once, symbols by name and constants as raw
+    arrays. Tapes are stored as their expressions along with their symbols.
+
+        cg.save(f, 'scene.cgraph')
+        f = cg.load('scene.cgraph', mmap=True)
+    """
+    with open(path, 'wb') as fh:
+        write(obj, fh)
+
+def load(path, mmap=False):
+    """Loads an expression, list of expressions, `ArrayGraph` or `Tape` saved by `save`.
+
+    When `mmap` is true, arrays are memory mapped read-only instead of read
+    into memory. Constant values of the loaded expressions are then views
+    into the file, so that large constant tables are paged in on use.
+    """
+    with open(path, 'rb') as fh:
+        prefix = fh.read(len(MAGIC) + 12)
+        start, size = read_header(prefix)
+        header = json.loads(fh.read(size).decode())
+        if not mmap:
+            def array(spec):
+                fh.seek(spec['offset'])
+                return np.fromfile(fh, dtype=spec['dtype'], count=int(np.prod(spec['shape']))).reshape(spec['shape'])
+            return build(header, array)
+
+    def array(spec):
+        if int(np.prod(spec['shape'])) == 0:
+            return np.zeros(spec['shape'], dtype=spec['dtype'])
+        return np.memmap(path, dtype=spec['dtype'], mode='r', offset=spec['offset'], shape=tuple(spec['shape']))
+    return build(header, array)
@@ -0,0 +1,125 @@
+"""CGraph - symbolic computation in Python library.
+
+This library is the result of my efforts to understand symbolic computation of
+functions factored as expression trees. In a few lines of code it shows how to
+forward evaluate functions and how to perform numeric and symbolic derivatives
+computations using backpropagation.
+
+While this library is not complete (and will never be) it offers the interested
+reader some insights on one way in which symbolic computation can be performed.
+
+The code is accompanied by a series of notebooks that explain the fundamental
+concepts. You can find these notebooks online at
+
+    https://github.com/cheind/py-cgraph
+
+Christoph Heindl, 2017
+"""
+
+from numbers import Number
+
+import numpy as np
+
+def chunks(values, chunksize=65536):
+    """Yields tuples of corresponding chunks of symbol values.
+
+    Each value may be a number that is passed along with every chunk, an array
+    such as `np.memmap` that is sliced into chunks of `chunksize` elements along
+    its first axis, or an iterable of chunks. Lists and tuples are converted to
+    arrays. When iterables are given, chunks of arrays are sliced to the length
+    of the chunks yielded by the iterables, which must consume the arrays entirely.
+    """
+    values = [np.asarray(v) if isinstance(v, (list, tuple)) else v for v in values]
+    arrays = [v for v in values if isinstance(v, np.ndarray)]
+    iters = dict((i, iter(v)) for i, v in enumerate(values) if not isinstance(v, (Number, np.ndarray)))
+
+    n = None
+    if arrays:
+        n = len(arrays[0])
+        if any(len(a) != n for a in arrays):
+            raise ValueError('Arrays of symbol values differ in length')
+    elif not iters:
+        raise ValueError('At least one array or iterable of symbol values is required')
+
+    offset = 0
+    while True:
+        chunk = list(values)
+        size = None
+        ended = []
+        for i, it in iters.items():
+            c = next(it, None)
+            if c is None:
+                ended.append(i)
+                continue
+            chunk[i] = np.atleast_1d(c)
+            size = len(chunk[i])
+
+        if ended:
+            if len(ended) != len(iters) or (n is not None and offset < n):
+                raise ValueError('Iterables of symbol values end before all values are consumed')
+            return
+
+        if size is None:
+            if offset >= n:
+                return
+            size = min(chunksize, n - offset)
+        elif n is not None and offset + size > n:
+            raise ValueError('Iterables of symbol values exceed the length of arrays')
+
+        for i, v in enumerate(values):
+            if isinstance(v, np.ndarray):
+                chunk[i] = np.asarray(v[offset:offset+size])
+        yield tuple(chunk)
+        offset += size
+
+def iterate(func, *values, chunksize=65536, **kwargs):
+    """Yields the results of `func` evaluated on consecutive chunks of the symbol values.
+
+    `func` is typically a `cg.Function`, such as a signed distance function, and
+    `kwargs` are passed on to each call, e.g `compute_gradient=True`. See `chunks`
+    for the supported kinds of values.
+    """
+    for c in chunks(values, chunksize=chunksize):
+        yield func(*c, **kwargs)
+
+def evaluate(func, *values, chunksize=65536, out=None, gradient_out=None, **kwargs):
+    """Evaluates `func` chunk by chunk writing the results to `out`.
+
+    This allows functions to be evaluated on inputs that do not fit into memory,
+    for example a point cloud stored as `np.memmap`. Only the values of a single
+    chunk are held in memory at any time. `out` is typically a memory mapped array
+    of the same length as the inputs, if not given, a new array is returned.
+
+    When `gradient_out` is given, gradients are computed as well and written to
+    it, one row per sample. In this case both `out` and `gradient_out` are returned.
+
+        x = np.memmap('x.bin', dtype=np.float32, mode='r')
+        y = np.memmap('y.bin', dtype=np.float32, mode='r')
+        d = np.memmap('d.bin', dtype=np.float32, mode='w+', shape=x.shape)
+        stream.evaluate(scene, x, y, out=d, chunksize=2**20)
+    """
+    compute_gradient = gradient_out is not None
+    parts = [] if out is None else None
+
+    offset = 0
+    for r in iterate(func, *values, chunksize=chunksize, compute_gradient=compute_gradient, **kwargs):
+        v, g = r if compute_gradient else (r, None)
+        n = len(v)
+        if parts is None:
+            out[offset:offset+n] = v
+        else:
+            parts.append(np.array(v))
+        if compute_gradient:
+            gradient_out[offset:offset+n] = g
+        offset += n
+
+    if parts is not None:
+        out = np.concatenate(parts) if parts else np.empty(0)
+    for a in [out, gradient_out]:
+        if isinstance(a, np.memmap):
+            a.flush()
+
+    if compute_gradient:
+        return out, gradient_out
+    else:
+        return out
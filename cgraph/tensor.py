@@ -0,0 +1,203 @@
+"""CGraph - symbolic computation in Python library.
+
+This library is the result of my efforts to understand symbolic computation of
+functions factored as expression trees. In a few lines of code it shows how to
+forward evaluate functions and how to perform numeric and symbolic derivatives
+computations using backpropagation.
+
+While this library is not complete (and will never be) it offers the interested
+reader some insights on one way in which symbolic computation can be performed.
+
+The code is accompanied by a series of notebooks that explain the fundamental
+concepts. You can find these notebooks online at
+
+    https://github.com/cheind/py-cgraph
+
+Christoph Heindl, 2017
+"""
+
+import numpy as np
+
+import cgraph as cg
+
+__all__ = [
+    'MatMul', 'ReduceSum', 'ReduceMean', 'Index',
+    'sym_matmul', 'sym_reduce_sum', 'sym_mean', 'sym_index',
+]
+
+def wrap_array(x):
+    """Wraps numbers and numpy arrays as Constant objects."""
+    if isinstance(x, np.ndarray):
+        x = cg.intern(cg.Constant(x))
+    return cg.wrap_number(x)
+
+def normalize_axis(axis, ndim):
+    """Returns the tuple of non-negative axes given by `axis`, all axes if `axis` is `None`."""
+    if axis is None:
+        return tuple(range(ndim))
+    axis = axis if isinstance(axis, tuple) else (axis,)
+    return tuple(a % ndim for a in axis)
+
+class MatMul(cg.Node):
+    """Matrix product `x @ y` of vectors and matrices.
+
+    As in `np.matmul`, a vector is treated as row vector on the left and as
+    column vector on the right side of the product. Operands of more than two
+    dimensions are not supported.
+    """
+
+    __slots__ = ()
+
+    elementwise = False
+
+    def __init__(self, children=None):
+        super(MatMul, self).__init__(nary=2, children=children)
+
+    def __str__(self):
+        return '({}@{})'.format(str(self[0]), str(self[1]))
+
+    def compute_value(self, cv, out=None):
+        a, b = cv
+        if a.ndim > 2 or b.ndim > 2:
+            raise ValueError('MatMul supports vectors and matrices only')
+        if a.ndim == 1 and b.ndim == 1:
+            return np.atleast_1d(np.dot(a, b))
+        return np.matmul(a, b, out=out)
+
+    def compute_vjp(self, cv, value, in_grad):
+        a, b = cv
+        a2 = a if a.ndim > 1 else a[np.newaxis]
+        b2 = b if b.ndim > 1 else b[:, np.newaxis]
+        g = np.broadcast_to(in_grad, value.shape).reshape(a2.shape[0], b2.shape[1])
+        return [np.dot(g, b2.T).reshape(a.shape), np.dot(a2.T, g).reshape(b.shape)]
+
+    def compute_tangent(self, cv, ct, value):
+        a, b = cv
+        ta, tb = ct
+        return cg.tangent_sum([
+            None if ta is None else self.compute_value([np.broadcast_to(ta, a.shape), b]),
+            None if tb is None else self.compute_value([a, np.broadcast_to(tb, b.shape)]),
+        ])
+
+    def compute_vjp_tangent(self, cv, ct, value, in_grad, in_grad_t):
+        # The derivatives are bilinear in the operands and the incoming derivative.
+        a, b = cv
+        ta, tb = ct
+        d = [None, None]
+        if in_grad_t is not None:
+            d = self.compute_vjp(cv, value, in_grad_t)
+        if tb is not None:
+            d[0] = cg.tangent_sum([d[0], self.compute_vjp([a, np.broadcast_to(tb, b.shape)], value, in_grad)[0]])
+        if ta is not None:
+            d[1] = cg.tangent_sum([d[1], self.compute_vjp([np.broadcast_to(ta, a.shape), b], value, in_grad)[1]])
+        return d
+
+class ReduceSum(cg.Node):
+    """Sum of the elements of a node along `axis`, all elements if `axis` is `None`."""
+
+    __slots__ = ('axis',)
+
+    elementwise = False
+
+    def __init__(self, axis=None, children=None):
+        super(ReduceSum, self).__init__(nary=1, children=children)
+        self.axis = tuple(axis) if isinstance(axis, list) else axis
+
+    def __str__(self):
+        if self.axis is None:
+            return 'sum({})'.format(str(self[0]))
+        return 'sum({}, axis={})'.format(str(self[0]), self.axis)
+
+    def attributes(self):
+        return (self.axis,)
+
+    def compute_value(self, cv, out=None):
+        return np.atleast_1d(np.sum(cv[0], axis=self.axis))
+
+    def compute_vjp(self, cv, value, in_grad):
+        x = cv[0]
+        axes = normalize_axis(self.axis, x.ndim)
+        kept = tuple(1 if i in axes else n for i, n in enumerate(x.shape))
+        g = np.broadcast_to(in_grad, value.shape).reshape(kept)
+        return [np.broadcast_to(g, x.shape)]
+
+    def compute_tangent(self, cv, ct, value):
+        return self.compute_value([np.broadcast_to(ct[0], cv[0].shape)])
+
+    def compute_vjp_tangent(self, cv, ct, value, in_grad, in_grad_t):
+        # The derivative is linear in the incoming derivative and independent of the child value.
+        return [None] if in_grad_t is None else self.compute_vjp(cv, value, in_grad_t)
+
+class ReduceMean(ReduceSum):
+    """Mean of the elements of a node along `axis`, all elements if `axis` is `None`."""
+
+    __slots__ = ()
+
+    def __str__(self):
+        if self.axis is None:
+            return 'mean({})'.format(str(self[0]))
+        return 'mean({}, axis={})'.format(str(self[0]), self.axis)
+
+    def count(self, x):
+        return int(np.prod([x.shape[i] for i in normalize_axis(self.axis, x.ndim)]))
+
+    def compute_value(self, cv, out=None):
+        return np.atleast_1d(np.mean(cv[0], axis=self.axis))
+
+    def compute_vjp(self, cv, value, in_grad):
+        g = super(ReduceMean, self).compute_vjp(cv, value, in_grad)[0]
+        return [g / self.count(cv[0])]
+
+class Index(cg.Node):
+    """Elements of a node selected by a numpy index `key`, such as `x[1:, 0]`."""
+
+    __slots__ = ('key',)
+
+    elementwise = False
+
+    def __init__(self, key, children=None):
+        super(Index, self).__init__(nary=1, children=children)
+        self.key = key
+
+    def __str__(self):
+        return '{}[{}]'.format(str(self[0]), self.key)
+
+    def attributes(self):
+        return (repr(self.key),)
+
+    def compute_value(self, cv, out=None):
+        return np.atleast_1d(cv[0][self.key])
+
+    def compute_vjp(self, cv, value, in_grad):
+        x = cv[0]
+        shape = np.shape(x[self.key])
+        g = np.broadcast_to(in_grad, value.shape).reshape(shape)
+        d = np.zeros(x.shape, dtype=np.result_type(x, g))
+        # Accumulates elements selected repeatedly by integer array indices.
+        np.add.at(d, self.key, g)
+        return [d]
+
+    def compute_tangent(self, cv, ct, value):
+        return self.compute_value([np.broadcast_to(ct[0], cv[0].shape)])
+
+    def compute_vjp_tangent(self, cv, ct, value, in_grad, in_grad_t):
+        return [None] if in_grad_t is None else self.compute_vjp(cv, value, in_grad_t)
+
+def sym_matmul(x, y):
+    """Returns a new node representing the matrix product `x @ y`."""
+    return cg.intern(MatMul(children=(wrap_array(x), wrap_array(y))))
+
+def sym_reduce_sum(x, axis=None):
+    """Returns a new node representing the sum of elements of `x` along `axis`."""
+    return cg.intern(ReduceSum(axis=axis, children=(wrap_array(x),)))
+
+def sym_mean(x, axis=None):
+    """Returns a new node representing the mean of elements of `x` along `axis`."""
+    return cg.intern(ReduceMean(axis=axis, children=(wrap_array(x),)))
+
+def sym_index(x, key):
+    """Returns a new node representing the elements `x[key]`.
+
+    Note that `node[i]` returns the `i`-th child of a node and not an element of its value.
+    """
+    return cg.intern(Index(key, children=(wrap_array(x),)))
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def test_array_graph():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    with cg.interning():
+        s = cg.sym_sin(x * y)
+        f = s * s + cg.sym_sum([x, 2, cg.Constant(np.array([[1., 2.], [3., 4.]]))]) / y
+
+    g = cg.to_arrays(f)
+    assert len(g) == len(cg.topological_order(f))
+    assert g.offsets[-1] == len(g.indices)
+    assert set(g.symbols) == {x, y}
+    assert g.nbytes > 0
+
+    fargs = {x: [[0.5], [1.5]], y: 2.}
+    assert np.allclose(g.value(fargs), cg.value(f, fargs))
+
+    d, v = g.numeric_gradient(fargs, return_value=True)
+    e = cg.numeric_gradient(f, fargs)
+    assert np.allclose(v, cg.value(f, fargs))
+    assert np.allclose(d[x], e[x])
+    assert np.allclose(d[y], e[y])
+
+    h = g.to_nodes()
+    assert cg.structural_hash(h) == cg.structural_hash(f)
+    # Shared nodes stay shared
+    assert h[0][0] is h[0][1]
+    assert np.allclose(cg.value(h, fargs), cg.value(f, fargs))
+
+def test_array_graph_multiple_outputs():
+    x = cg.Symbol('x')
+    a = x * 2
+    fs = [a + 1, cg.sym_exp(a)]
+    g = cg.to_arrays(fs)
+    assert len(g.outputs) == 2
+    v = g.value({x: 0.5})
+    assert np.allclose(v[0], 2.) and np.allclose(v[1], np.e)
+    h = g.to_nodes()
+    assert isinstance(h, list) and h[0][0] is h[1][0]
+
+def test_array_graph_tensor():
+    w = cg.Symbol('w')
+    A = np.arange(6.).reshape(3, 2)
+    f = cg.sym_reduce_sum(cg.sym_matmul(A, w)**2, axis=0) + cg.sym_index(w, 1)
+    g = cg.to_arrays(f)
+    assert not g.elementwise
+    assert np.allclose(g.numeric_gradient({w: [1., -2.]})[w], cg.numeric_gradient(f, {w: [1., -2.]})[w])
+    h = g.to_nodes()
+    assert cg.structural_hash(h) == cg.structural_hash(f)
+
+def test_array_graph_sdf():
+    s = sdf.Circle(center=[0, 0], radius=1) | sdf.Box(minc=[-0.5, -0.5], maxc=[0.5, 1])
+    x, y = s.syms[0][1], s.syms[1][1]
+    g = cg.to_arrays(s.sdf)
+
+    xs, ys = np.meshgrid(np.linspace(-2, 2, 7), np.linspace(-2, 2, 7))
+    fargs = {x: xs.ravel(), y: ys.ravel()}
+    d, v = g.numeric_gradient(fargs, return_value=True)
+    e = cg.numeric_gradient(s.sdf, fargs)
+    assert np.allclose(v, s(xs.ravel(), ys.ravel()))
+    assert np.allclose(d[x], e[x], equal_nan=True)
+    assert np.allclose(d[y], e[y], equal_nan=True)
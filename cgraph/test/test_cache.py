@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import cgraph as cg
+
+def test_evaluation_cache():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    f = x * cg.sym_exp(y) + cg.sym_sin(x)
+    cache = cg.EvaluationCache()
+
+    d, v = cache.numeric_gradient(f, {x:[1., 2.], y:3.}, return_value=True)
+    assert np.allclose(v, cg.value(f, {x:[1., 2.], y:3.}))
+    assert np.allclose(d[x], cg.numeric_gradient(f, {x:[1., 2.], y:3.})[x])
+    assert cache.stats()['misses'] == 1
+
+    # Values of a gradient are reused, equal arguments hit
+    assert np.allclose(cache.value(f, {x:np.array([1., 2.]), y:3.}), v)
+    assert cache.numeric_gradient(f, {y:3., x:[1., 2.]}) is d
+    assert cache.hits == 2
+
+    # Structurally identical expressions share entries
+    g = x * cg.sym_exp(y) + cg.sym_sin(x)
+    assert np.allclose(cache.value(g, {x:[1., 2.], y:3.}), v)
+    assert cache.hits == 3
+
+    cache.value(f, {x:[1., 2.5], y:3.})
+    cache.value(f, {x:[1., 2.], y:3.1})
+    assert cache.misses == 3
+    assert cache.stats()['entries'] == 3
+
+    # Values are reused by a gradient computed later
+    cache.numeric_gradient(f, {x:[1., 2.5], y:3.})
+    assert cache.stats()['entries'] == 3
+
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'nbytes': 0}
+
+def test_evaluation_cache_bound():
+    x = cg.Symbol('x')
+    f = cg.sym_sqrt(x * x + 1)
+
+    xs = np.arange(100.)
+    cache = cg.EvaluationCache(maxbytes=cg.values(f, {x:xs}).__len__() * xs.nbytes * 2)
+    for i in range(5):
+        cache.value(f, {x:xs + i})
+        assert cache.nbytes <= cache.maxbytes
+    assert cache.stats()['entries'] == 2
+    assert cache.evictions == 3
+
+    cache.value(f, {x:xs + 4})
+    assert cache.hits == 1
+    cache.value(f, {x:xs})
+    assert cache.misses == 6
+
+    small = cg.EvaluationCache(maxbytes=100)
+    assert np.allclose(small.value(f, {x:xs}), np.sqrt(xs * xs + 1))
+    assert small.stats()['entries'] == 0
@@ -17,6 +17,7 @@ Christoph Heindl, 2017
 """
 
 import math
+import pytest
 import numpy as np
 
 from cgraph.test.utils import checkf
@@ -195,3 +196,460 @@ def test_function():
     assert all(np.isclose(g[0], [1, 2]))
     assert all(np.isclose(g[1], [2, 3]))
 
+
+def test_compile():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    xy = x * y
+    f = (xy + 1) * xy - cg.sym_exp(x)
+    t = cg.compile(f, [x, y])
+
+    assert len(t.code) == 5
+    for xv, yv in [(2, 3), ([1, 2, 3], [4, 5, 6]), (0.5, [1, 2])]:
+        assert np.allclose(t(xv, yv), cg.value(f, {x:xv, y:yv}))
+
+    t = cg.compile(x + 2, [x, y])
+    assert np.isclose(t(3, 0), 5)
+
+    t = cg.compile(x, [x])
+    assert np.isclose(t(3), 3)
+
+    with pytest.raises(ValueError):
+        cg.compile(f, [x])
+
+def test_wide_sum_gradient():
+    w0 = cg.Symbol('w0')
+    w1 = cg.Symbol('w1')
+
+    xs = np.linspace(0, 1, 2000)
+    f = cg.sym_sum([(w0 * x + w1 - 1)**2 for x in xs])
+    fargs = {w0:0.5, w1:0.2}
+
+    r = xs * 0.5 + 0.2 - 1
+    ng = cg.numeric_gradient(f, fargs)
+    assert np.isclose(ng[w0], np.sum(2 * r * xs))
+    assert np.isclose(ng[w1], np.sum(2 * r))
+
+    sg = cg.symbolic_gradient(f)
+    assert np.isclose(cg.value(sg[w0], fargs), ng[w0])
+    assert np.isclose(cg.value(sg[w1], fargs), ng[w1])
+
+    # Derivative expressions grow linearly with the number of edges
+    nf = len(cg.topological_order(f))
+    assert len(cg.topological_order(sg[w0])) < 10 * nf
+
+def test_bfs():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    f = cg.sym_sum([x, y, x * y])
+    gen = cg.bfs(f, 0)
+    order = []
+    try:
+        n, d = next(gen)
+        while True:
+            order.append((n, d))
+            n, d = gen.send([d + 1] * len(n.children))
+    except StopIteration:
+        pass
+    assert [d for n, d in order] == [0, 1, 1, 1, 2, 2]
+    assert order[0][0] is f
+    assert order[-2][0] == x and order[-1][0] == y
+
+def test_deep_expr():
+    x = cg.Symbol('x')
+
+    f = x
+    for i in range(100000):
+        f = f + x
+
+    assert sum(1 for n in cg.postorder(f)) == 200001
+    assert len(cg.topological_order(f)) == 100001
+    assert np.allclose(cg.value(f, {x:[1, 2]}), [100001, 200002])
+    assert np.isclose(cg.numeric_gradient(f, {x:2})[x], 100001)
+
+    F = cg.Function(f, [x])
+    v, g = F([1, 2], compute_gradient=True)
+    assert np.allclose(g, 100001)
+
+def test_postorder():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    xy = x * y
+    f = (xy + 1) * xy
+    assert [str(n) for n in cg.postorder(f)] == ['x', 'y', '(x*y)', '1', '((x*y) + 1)', 'x', 'y', '(x*y)', '(((x*y) + 1)*(x*y))']
+    assert [str(n) for n in cg.topological_order(f)] == ['x', 'y', '(x*y)', '1', '((x*y) + 1)', '(((x*y) + 1)*(x*y))']
+
+def test_interning():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    f = (x * y + 2) * (x * y + 2)
+    assert f[0] is not f[1]
+
+    with cg.interning():
+        g = (x * y + 2) * (x * y + 2)
+        h = cg.sym_sum([x * y, 3]) - cg.sym_sum([x * y, 3])
+        with cg.interning():
+            assert (x * y) is g[0][0]
+    assert g[0] is g[1]
+    assert h[0] is h[1]
+    assert (x * y) is not g[0][0]
+
+    assert len(cg.topological_order(f)) == 9
+    assert len(cg.topological_order(g)) == 6
+    checkf(g, {x:2, y:3}, value=64, ngrad={x:48, y:32})
+
+def test_cse():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    a = cg.sym_exp(x * 2) + cg.Symbol('y')
+    b = cg.sym_exp(x * 2) + y
+    f = a * b
+    
+    s = cg.cse(f)
+    assert s[0] is s[1]
+    assert len(cg.topological_order(s)) == 7
+    assert f[0] is a and f[0][0][0][1] is not f[1][0][0][1]
+    checkf(s, {x:0.5, y:2}, value=cg.value(f, {x:0.5, y:2}), ngrad=cg.numeric_gradient(f, {x:0.5, y:2}))
+
+    s = cg.cse([a, b, x * 2])
+    assert s[0] is s[1]
+    assert s[2] is s[0][0][0]
+
+def test_simplify_rules():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    assert cg.is_const(cg.simplify(x * 0), 0)
+    assert cg.simplify(x - x).__class__ is cg.Constant
+    assert cg.simplify(x / 1) == x
+    assert cg.simplify(-(-x)) == x
+    assert cg.is_const(cg.simplify(x**0), 1)
+    assert cg.simplify(x**1) == x
+    assert isinstance(cg.simplify(0 - x), cg.Neg)
+    assert cg.is_const(cg.simplify((x * y) - (x * y)), 0)
+    assert cg.is_const(cg.simplify(cg.sym_exp(cg.Constant(0)) * 3 + 1), 4)
+    assert str(cg.simplify(((x + 1) + 2) * 2 * 3)) == '((x + 3)*6)'
+
+    s = cg.simplify(cg.sym_sum([x, 0, 2, y, 3]))
+    assert isinstance(s, cg.Sum) and len(s.children) == 3
+    assert cg.is_const(s[2], 5)
+    assert cg.simplify(cg.sym_sum([x, 0])) == x
+
+    f = (x * 1 + 0) * (x * 1 + 0)
+    s = cg.simplify(f)
+    assert str(s) == 'x**2'
+    assert str(f) == '(((x*1) + 0)*((x*1) + 0))'
+
+def test_simplify_gradient():
+    w0 = cg.Symbol('w0')
+    w1 = cg.Symbol('w1')
+    
+    xy = np.random.uniform(size=(2, 50))
+    f = cg.sym_sum([(w0 * xy[0, i] + w1 - xy[1, i])**2 for i in range(50)]) / 50
+    fargs = {w0:0.5, w1:1.2}
+
+    d = cg.symbolic_gradient(f)
+    dd = cg.symbolic_gradient(d[w0])
+    for e in [d[w0], d[w1], dd[w0], dd[w1]]:
+        s = cg.simplify(e)
+        assert 2 * len(cg.topological_order(s)) < len(cg.topological_order(e))
+        assert np.isclose(cg.value(s, fargs), cg.value(e, fargs))
+
+    s = cg.simplify(dd[w0])
+    assert cg.is_const(s) and np.isclose(s.value, 2 * np.mean(xy[0]**2))
+    s = cg.simplify(dd[w1])
+    assert cg.is_const(s) and np.isclose(s.value, 2 * np.mean(xy[0]))
+
+def test_simplify_deep_expr():
+    x = cg.Symbol('x')
+
+    f = x
+    for i in range(20000):
+        f = (f + 1) * 1
+    s = cg.simplify(f)
+    assert isinstance(s, cg.Add)
+    assert s[0] == x and cg.is_const(s[1], 20000)
+
+def test_jacobian():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    xy = x * y
+    J = cg.jacobian([xy, xy + cg.sym_sin(x), y * 3], [x, y])
+    
+    xs = np.array([1., 2., 3.])
+    ys = np.array([4., 5., 6.])
+    v, j = J(xs, ys, return_value=True)
+    assert v.shape == (3, 3)
+    assert j.shape == (3, 3, 2)
+    assert np.allclose(v[:, 0], xs * ys)
+    assert np.allclose(v[:, 2], ys * 3)
+    assert np.allclose(j[:, 0, 0], ys)
+    assert np.allclose(j[:, 0, 1], xs)
+    assert np.allclose(j[:, 1, 0], ys + np.cos(xs))
+    assert np.allclose(j[:, 1, 1], xs)
+    assert np.allclose(j[:, 2, 0], 0)
+    assert np.allclose(j[:, 2, 1], 3)
+
+    j = J(2, 5)
+    assert j.shape == (1, 3, 2)
+    assert np.allclose(j[0], [[5, 2], [5 + np.cos(2), 2], [0, 3]])
+
+def test_hessian():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    f = x**3 * y + cg.sym_exp(x * y)
+    H = cg.hessian(f, [x, y])
+
+    xs = np.array([0.5, 1.0])
+    ys = np.array([-1.0, 0.3])
+    g, h = H(xs, ys, return_gradient=True)
+    assert g.shape == (2, 2)
+    assert h.shape == (2, 2, 2)
+    
+    e = np.exp(xs * ys)
+    assert np.allclose(g[:, 0], 3 * xs**2 * ys + ys * e)
+    assert np.allclose(g[:, 1], xs**3 + xs * e)
+    assert np.allclose(h[:, 0, 0], 6 * xs * ys + ys**2 * e)
+    assert np.allclose(h[:, 0, 1], 3 * xs**2 + e + xs * ys * e)
+    assert np.allclose(h[:, 1, 0], h[:, 0, 1])
+    assert np.allclose(h[:, 1, 1], xs**2 * e)
+
+    hv = H.hvp([1., 2.], xs, ys)
+    assert np.allclose(hv[0], h[:, 0, 0] + 2 * h[:, 0, 1])
+    assert np.allclose(hv[1], h[:, 1, 0] + 2 * h[:, 1, 1])
+
+def test_hessian_finite_differences():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    xs = np.array([0.5, 1.0, 1.7])
+    ys = np.array([-1.0, 0.3, 2.])
+    eps = 1e-6
+
+    fs = [
+        cg.sym_sqrt(x * x + y * y) / cg.sym_log(x + 3) - cg.sym_cos(y) * cg.sym_sin(x),
+        cg.sym_max(x * y, x - y)**2 + cg.sym_min(x, 0.8) * y,
+        cg.sym_sum([x, y, x * y])**2 - x / y,
+    ]
+    for f in fs:
+        h = cg.hessian(f, [x, y])(xs, ys)
+        T = cg.compile(f, [x, y])
+        for j, e in enumerate(np.eye(2) * eps):
+            gp = T.gradient(xs + e[0], ys + e[1])[1]
+            gm = T.gradient(xs - e[0], ys - e[1])[1]
+            for i in range(2):
+                assert np.allclose(h[:, i, j], (gp[i] - gm[i]) / (2 * eps), atol=1e-4)
+
+    # Tensor expressions are differentiated with respect to all parameters
+    w = cg.Symbol('w')
+    c = cg.Symbol('c')
+    A = np.arange(15.).reshape(5, 3) / 10 - 0.5
+    b = cg.Constant(np.linspace(-1, 1, 5))
+    Aw = cg.sym_matmul(A, w)
+    f = cg.sym_reduce_sum(cg.sym_exp(Aw * c) - b * Aw) + cg.sym_index(w, 1)**3 + cg.sym_mean(w * w * c)
+    f = f + cg.sym_matmul(w, cg.sym_matmul(np.ones((3, 3)), w)) * c
+
+    T = cg.compile(f, [w, c])
+    def gradient(p):
+        return np.concatenate([np.ravel(gi) for gi in T.gradient(p[:3], p[3:])[1]])
+
+    p = np.array([0.1, -0.2, 0.3, 0.7])
+    g, h = cg.hessian(f, [w, c])(p[:3], p[3], return_gradient=True)
+    assert g.shape == (4,) and h.shape == (4, 4)
+    assert np.allclose(g, gradient(p))
+    for j, e in enumerate(np.eye(4) * eps):
+        assert np.allclose(h[:, j], (gradient(p + e) - gradient(p - e)) / (2 * eps), atol=1e-4)
+
+def test_forward_gradient():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    z = cg.Symbol('z')
+
+    f = cg.sym_sqrt(x**2 + y**2) - cg.sym_max(x, y) * cg.sym_sin(x - y) + cg.sym_sum([x, 2*y, -y]) / cg.sym_exp(y)
+    tape = cg.compile(f, [x, y, z])
+
+    xs = np.array([0.5, 1.0, -2.0])
+    ys = np.array([-1.0, 0.3, 4.0])
+    v, g = tape.forward_gradient(xs, ys, 1.)
+    vr, gr = tape.gradient(xs, ys, 1.)
+    assert np.allclose(v, vr)
+    assert np.allclose(g[0], gr[0])
+    assert np.allclose(g[1], gr[1])
+    assert np.allclose(g[2], 0)
+
+    v, g = cg.compile(x - 3, [x]).forward_gradient(xs)
+    assert np.allclose(g[0], 1)
+    v, g = cg.compile(cg.Constant(2) * 3, [x]).forward_gradient(xs)
+    assert np.allclose(g[0], 0)
+
+    F = cg.Function(f, [x, y])
+    vf, gf = F(xs, ys, compute_gradient=True, mode='forward')
+    vr, gr = F(xs, ys, compute_gradient=True, mode='reverse')
+    assert gf.shape == (3, 2)
+    assert np.allclose(vf, vr)
+    assert np.allclose(gf, gr)
+    with pytest.raises(ValueError):
+        F(xs, ys, compute_gradient=True, mode='sideways')
+
+def test_lean_gradient():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    f = x
+    for i in range(200):
+        f = cg.sym_sin(f) * y + x
+    tape = cg.compile(f, [x, y])
+
+    xs = np.linspace(-1, 1, 10000)
+    ys = np.linspace(0.2, 0.5, 10000)
+    s = tape.values(xs, ys)
+    d = tape.backward(s, [None]*(len(s)-1) + [1])
+    assert len(s) - 1 == tape.output
+
+    (v, g), full = cg.peak_memory(tape.gradient, xs, ys)
+    assert np.allclose(v, s[tape.output])
+    assert np.allclose(g[0], d[0]) and np.allclose(g[1], d[1])
+
+    (vc, gc), lean = cg.peak_memory(tape.gradient, xs, ys, checkpoint=20)
+    assert np.allclose(vc, v)
+    assert np.allclose(gc[0], g[0]) and np.allclose(gc[1], g[1])
+    assert lean < full / 4
+
+    (vf, gf), forward = cg.peak_memory(tape.forward_gradient, xs, ys)
+    assert np.allclose(gf[0], g[0]) and np.allclose(gf[1], g[1])
+    assert forward < full / 4
+
+    assert np.allclose(tape(xs, ys), v)
+    assert len(tape.checkpoints(20)) <= len(tape.code) // 20 + 1
+
+def test_buffered_tape():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    f = cg.sym_sum([cg.sym_min(x * y, x / y), cg.sym_exp(-x), y**2]) - cg.sym_max(x, 0.5)
+    tape = cg.compile(f, [x, y])
+    btape = cg.compile(f, [x, y], buffered=True)
+
+    xs = np.linspace(0.5, 2, 100)
+    ys = np.linspace(-1, 1.5, 100)
+    first = btape(xs, ys)
+    allocations = btape.allocations
+    second = btape(xs + 1, ys)
+    assert btape.allocations - allocations < allocations
+    assert np.allclose(first, tape(xs, ys))
+    assert np.allclose(second, tape(xs + 1, ys))
+
+    for i in range(2):
+        v, g = btape.gradient(xs, ys)
+        vr, gr = tape.gradient(xs, ys)
+        assert np.allclose(v, vr)
+        assert np.allclose(g[0], gr[0]) and np.allclose(g[1], gr[1])
+        v, g = btape.forward_gradient(xs, ys)
+        assert np.allclose(g[0], gr[0]) and np.allclose(g[1], gr[1])
+
+    assert np.allclose(btape(2., 3.), tape(2., 3.))
+    assert np.allclose(btape(xs, ys), first)
+
+def test_function_simplified_shape():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    xs = np.arange(4.)
+    for f in [cg.simplify(x * 0 + y - y), cg.simplify(x / x)]:
+        for backend in ['tape', 'codegen']:
+            F = cg.Function(f, [x, y], backend=backend)
+            assert F(xs, 2.).shape == (4,)
+            v, g = F(xs, 2., compute_gradient=True)
+            assert v.shape == (4,)
+            assert g.shape == (4, 2)
+            assert np.allclose(g, 0)
+    assert np.allclose(cg.Function(cg.simplify(x - x + 1), [x])([1., 2.]), [1, 1])
+
+def test_numeric_gradient_shape():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    d = cg.numeric_gradient(x + 1, {x:[1, 2, 3]})
+    assert np.allclose(d[x], [1, 1, 1])
+    assert d[x].shape == (3,)
+
+    d = cg.numeric_gradient(-x - y + cg.sym_sum([x, y, x]), {x:[1, 2, 3], y:2})
+    assert np.allclose(d[x], [1, 1, 1])
+    assert d[y].shape == (3,) and np.allclose(d[y], 0)
+
+def test_compact_nodes():
+    import copy
+    import weakref
+
+    x = cg.Symbol('x')
+    f = cg.sym_sin(x) * 2 + cg.sym_sum([x, 1, x])
+
+    for n in cg.topological_order(f):
+        assert not hasattr(n, '__dict__')
+        assert isinstance(n.children, tuple)
+        assert weakref.ref(n)() is n
+
+    assert f[0][0][0] is x
+    assert len(f[1].children) == 3
+    with pytest.raises(TypeError):
+        f.children[0] = x
+    with pytest.raises(AttributeError):
+        f.label = 'f'
+
+    assert cg.Add().children == (None, None)
+    assert cg.Mul(children=(x, x)).children == (x, x)
+    with pytest.raises(ValueError):
+        cg.Add(children=(x,))
+
+    g = cg.with_children(f, [f[1], f[0]])
+    assert g is not f and g.children == (f[1], f[0])
+    c = copy.copy(f[0][1])
+    assert isinstance(c, cg.Constant) and c.value is f[0][1].value
+    assert np.allclose(cg.value(g, {x: 0.5}), cg.value(f, {x: 0.5}))
+
+def test_gradient_wrt():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    z = cg.Symbol('z')
+    k = cg.sym_exp(cg.Constant(0.5)) * cg.sym_sin(cg.Constant(2.))
+    f = cg.sym_sin(x * y) * k + z**2 + k * y
+
+    fargs = {x: [0.5, 1.5, 2.], y: 2., z: -1.}
+    d = cg.numeric_gradient(f, fargs)
+    g, v = cg.numeric_gradient(f, fargs, wrt=[y, x], return_value=True)
+    assert g.shape == (3, 2)
+    assert np.allclose(v, cg.value(f, fargs))
+    assert np.allclose(g[:, 0], d[y])
+    assert np.allclose(g[:, 1], d[x])
+
+    vals = cg.values(f, fargs)
+    assert set(cg.cgraph._backpropagate(f, vals, wrt=[x])) == {x}
+
+    s = cg.symbolic_gradient(f, wrt=[z, x])
+    assert len(s) == 2
+    assert np.allclose(cg.value(s[0], fargs), -2.)
+    assert np.allclose(cg.value(s[1], fargs), d[x])
+
+    # Symbols that f doesn't depend on have zero derivatives
+    w = cg.Symbol('w')
+    assert np.allclose(cg.numeric_gradient(f, fargs, wrt=[w]), 0)
+    assert cg.is_const(cg.symbolic_gradient(f, wrt=[w])[0], 0)
+
+    T = cg.compile(f, [x, y, z])
+    assert not T.reaching([0, 1, 2]) & {T.nodes.index(k)}
+    v, g = T.gradient([0.5, 1.5, 2.], 2., -1., wrt=[y])
+    assert len(g) == 1 and np.allclose(g[0], d[y])
+    v, g = T.gradient([0.5, 1.5, 2.], 2., -1., checkpoint=2)
+    assert np.allclose(g[0], d[x]) and np.allclose(g[2], d[z])
+
+    A = np.arange(6.).reshape(2, 3)
+    t = cg.sym_reduce_sum(cg.sym_matmul(A, x) * y)
+    g = cg.numeric_gradient(t, {x: [1., 2., 3.], y: 2.}, wrt=[x, y])
+    assert isinstance(g, list) and g[0].shape == (3,)
+    assert np.allclose(g[0], A.sum(axis=0) * 2)
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+import cgraph as cg
+
+def test_placeholders():
+    x = cg.Placeholder('x')
+    w = cg.Symbol('w')
+    f = cg.sym_mean((w * x - 1)**2)
+    assert cg.placeholders(f) == [x]
+    assert isinstance(x, cg.Symbol)
+
+    xs = np.array([1., 2., 3.])
+    g = cg.bind_data(f, {x: xs})
+    assert cg.placeholders(g) == []
+    assert np.allclose(cg.value(g, {w: 2.}), cg.value(f, {w: 2., x: xs}))
+    assert np.allclose(cg.value(f, {w: 2., x: xs}), np.mean((2 * xs - 1)**2))
+
+def test_minibatches():
+    x = cg.Placeholder('x')
+    y = cg.Placeholder('y')
+    xs = np.arange(10.)
+    data = cg.MiniBatches({x: xs, y: list(xs * 2)}, batch_size=4, shuffle=False)
+    assert len(data) == 3
+    batches = list(data)
+    assert [b[x].tolist() for b in batches] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert all(np.allclose(b[y], b[x] * 2) for b in batches)
+    assert np.shares_memory(batches[0][x], xs)
+    assert data.epoch == 0
+
+    # Batches continue with the next epoch.
+    assert data.next()[0].tolist() == [0, 1, 2, 3]
+    assert data.epoch == 1
+
+    data = cg.MiniBatches({x: xs, y: xs * 2}, batch_size=3, seed=0)
+    epochs = [np.concatenate([b[x] for b in data]) for i in range(2)]
+    for e in epochs:
+        assert sorted(e.tolist()) == xs.tolist()
+    assert epochs[0].tolist() != epochs[1].tolist()
+
+    fargs = data.bind({cg.Symbol('w'): 1.})
+    assert len(fargs) == 3
+    assert np.allclose(fargs[y], fargs[x] * 2)
+
+    with pytest.raises(ValueError):
+        cg.MiniBatches({x: xs, y: xs[:5]})
+    with pytest.raises(ValueError):
+        cg.MiniBatches({})
+
+def test_minibatch_memmap(tmpdir):
+    x = cg.Placeholder('x')
+    path = str(tmpdir.join('x.bin'))
+    m = np.memmap(path, dtype=np.float32, mode='w+', shape=(100,))
+    m[:] = np.arange(100)
+    m.flush()
+    m = np.memmap(path, dtype=np.float32, mode='r')
+    data = cg.MiniBatches({x: m}, batch_size=16, seed=1)
+    b = data.next()[0]
+    assert b.shape == (16,)
+    assert np.all(np.diff(b) > 0)
+
+def line_data(n=1000):
+    rnd = np.random.RandomState(0)
+    xs = rnd.uniform(0, 10, n)
+    ys = 0.8 * xs + 2 + rnd.normal(scale=0.1, size=n)
+    return xs, ys
+
+def test_optimize_with_data():
+    w0 = cg.Symbol('w0')
+    w1 = cg.Symbol('w1')
+    x = cg.Placeholder('x')
+    y = cg.Placeholder('y')
+    xs, ys = line_data()
+    expected = np.polyfit(xs, ys, 1)
+    r = w0 * x + w1 - y
+    f = cg.sym_mean(r**2)
+
+    res = cg.optimize.lbfgs(f, [w0, w1], [0.4, 1.1], data={x: xs, y: ys})
+    assert res.converged
+    assert np.allclose(res.p, expected, atol=1e-4)
+
+    res = cg.optimize.gauss_newton(r, [w0, w1], [0.4, 1.1], data={x: xs, y: ys})
+    assert np.allclose(res.p, expected)
+
+    # The per-sample objective is summed over the samples.
+    res = cg.optimize.lbfgs(r**2, [w0, w1], [0.4, 1.1], data={x: xs, y: ys})
+    assert np.allclose(res.p, expected, atol=1e-4)
+
+    data = cg.MiniBatches({x: xs, y: ys}, batch_size=50, seed=0)
+    res = cg.optimize.stochastic_gradient_descent(f, [w0, w1], [0.4, 1.1], data, learning_rate=0.002, max_iter=1000)
+    assert res.iterations == 1000
+    assert np.allclose(res.p, expected, atol=0.05)
+    assert res.evaluations == 1001
+    assert data.epoch == 50
+
+    # Batches work with numeric gradients of the uncompiled expression as well.
+    data = cg.MiniBatches({x: xs, y: ys}, batch_size=50, seed=0)
+    guess = {w0: 0.4, w1: 1.1}
+    for i in range(3000):
+        d = cg.numeric_gradient(f, data.bind(guess))
+        guess[w0] -= 0.005 * d[w0]
+        guess[w1] -= 0.02 * d[w1]
+    assert np.allclose(np.concatenate([guess[w0], guess[w1]]), expected, atol=0.05)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def test_jit_function():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    f = cg.sym_sqrt(x**2 + y**2) - cg.sym_max(x, y) * cg.sym_sin(x - y) + cg.sym_sum([x, 2*y, -y, x, y, x, y, x, y, 1]) / cg.sym_exp(y)
+    F = cg.JitFunction(f, [x, y])
+
+    xs = np.array([0.5, 1.0, -2.0])
+    ys = np.array([-1.0, 0.3, 4.0])
+    v, g = F(xs, ys, compute_gradient=True)
+    d = cg.numeric_gradient(f, {x:xs, y:ys})
+    assert np.allclose(v, cg.value(f, {x:xs, y:ys}))
+    assert np.allclose(g[:, 0], d[x])
+    assert np.allclose(g[:, 1], d[y])
+    assert np.allclose(F(xs, 2.), cg.value(f, {x:xs, y:2.}))
+
+    v, g = cg.JitFunction(x * 3, [x, y])(xs, ys, compute_gradient=True)
+    assert np.allclose(g, [[3, 0]] * 3)
+
+    with pytest.raises(NotImplementedError):
+        cg.JitFunction(x * cg.Constant([1, 2, 3]), [x])
+
+def test_jit_singular():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f = cg.sym_sqrt(x*x + y*y) + x / y
+        v, g = cg.JitFunction(f, [x, y])([0., 1.], [0., 2.], compute_gradient=True)
+        d = cg.numeric_gradient(f, {x:[0., 1.], y:[0., 2.]})
+        assert np.allclose(v, cg.value(f, {x:[0., 1.], y:[0., 2.]}), equal_nan=True)
+        assert np.allclose(g[:, 0], d[x], equal_nan=True)
+        assert np.allclose(g[:, 1], d[y], equal_nan=True)
+        assert np.isnan(v[0])
+
+def test_jit_fallback():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    F = cg.jit(x * cg.Constant([1, 2, 3]), [x])
+    assert np.allclose(F(2.), [2, 4, 6])
+    if not cg.jit_available:
+        assert isinstance(cg.jit(x * y, [x, y]), cg.GeneratedFunction)
+    assert isinstance(cg.jit(cg.sym_sum([x * i for i in range(cg.jit_max_nodes)]), [x]), cg.GeneratedFunction)
+
+def test_function_backends():
+    with sdf.transform(angle=0.3, offset=[0.5, -0.2]):
+        s = sdf.Box(minc=[-0.5, -0.5], maxc=[0.5, 0.5]) | sdf.Circle(center=[1, 1], radius=0.5)
+
+    xs = np.linspace(-2, 2, 10)
+    ys = np.linspace(-1, 2, 10)
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    v, g = cg.Function(s.sdf, [x, y], backend='tape')(xs, ys, compute_gradient=True)
+    for backend in ['codegen', 'jit']:
+        F = cg.Function(s.sdf, [x, y], backend=backend)
+        vb, gb = F(xs, ys, compute_gradient=True)
+        assert np.allclose(vb, v)
+        assert np.allclose(gb, g)
+        assert np.allclose(F(xs, ys), v)
+
+    assert cg.Function(s.sdf, [x, y]).backend == 'tape'
+    with pytest.raises(ValueError):
+        cg.Function(s.sdf, [x, y], backend='gpu')
+    with pytest.raises(ValueError):
+        cg.Function(s.sdf, [x, y], backend='codegen', buffered=True)
+    with pytest.raises(ValueError):
+        cg.Function(s.sdf, [x, y], backend='jit')(xs, ys, compute_gradient=True, mode='sideways')
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def test_codegen():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    z = cg.Symbol('z')
+
+    xy = x * y
+    f = cg.sym_sqrt(xy**2 + 1) / cg.sym_exp(-y) - cg.sym_log(x) * cg.sym_cos(xy) + cg.sym_sum([cg.sym_sin(x), 2*y, xy, x, y, x, y, x, y, 3])
+    f = cg.sym_max(cg.sym_min(f, x * 10), -y)
+    F = cg.codegen(f, [x, y, z])
+    tape = cg.compile(f, [x, y, z])
+
+    xs = np.linspace(0.5, 3, 20)
+    ys = np.linspace(-1, 1, 20)
+    assert np.allclose(F(xs, ys, 0), tape(xs, ys, 0))
+
+    v, g = F.gradient(xs, ys, 0)
+    vt, gt = tape.gradient(xs, ys, 0)
+    assert np.allclose(v, vt)
+    assert np.allclose(g[0], gt[0]) and np.allclose(g[1], gt[1])
+    assert np.allclose(g[2], 0)
+
+    v, g = F(2., 0.5, 0, compute_gradient=True)
+    assert g.shape == (1, 3)
+    assert 'np.sin' in F.source
+
+    v, g = cg.codegen(x, [x, y])(xs, 1, compute_gradient=True)
+    assert np.allclose(v, xs)
+    assert np.allclose(g, [[1, 0]])
+
+    with pytest.raises(ValueError):
+        cg.codegen(x * y, [x])
+
+def test_codegen_cache():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    f = cg.sym_sin(x) * y + 2
+    assert cg.structural_hash(f) == cg.structural_hash(cg.sym_sin(x) * y + 2)
+    assert cg.structural_hash(f) != cg.structural_hash(cg.sym_sin(x) * y + 3)
+    assert cg.structural_hash(f) != cg.structural_hash(y * cg.sym_sin(x) + 2)
+
+    F = cg.codegen(f, [x, y])
+    assert cg.codegen(cg.sym_sin(x) * y + 2, [x, y]) is F
+    assert cg.codegen(f, [y, x]) is not F
+
+    import cgraph.generator as generator
+    size = generator.cache_size
+    generator.cache_size = 4
+    try:
+        for i in range(10):
+            cg.codegen(x * i, [x])
+        assert len(generator._cache) == 4
+        assert cg.codegen(x * 9, [x]) is cg.codegen(x * 9, [x])
+        cg.clear_cache()
+        assert len(generator._cache) == 0
+    finally:
+        generator.cache_size = size
+
+def test_codegen_sdf():
+    with sdf.transform(angle=0.3, offset=[0.5, -0.2]):
+        s = sdf.Box(minc=[-0.5, -0.5], maxc=[0.5, 0.5]) | sdf.Circle(center=[1, 1], radius=0.5)
+    with sdf.smoothness(10):
+        s = s | sdf.Circle(center=[-1, 0], radius=0.3)
+
+    F = cg.codegen(s.sdf, [cg.Symbol('x'), cg.Symbol('y')])
+    xs = np.linspace(-2, 2, 50)
+    ys = np.linspace(-1, 2, 50)
+    v, g = F(xs, ys, compute_gradient=True)
+    vs, gs = s(xs, ys, compute_gradient=True)
+    assert np.allclose(v, vs)
+    assert np.allclose(g, gs)
+
+def test_codegen_forward():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    f = cg.sym_sum([x * y, cg.sym_sin(x), -y, x - y, 2, x, y, x, y, x]) / cg.sym_sqrt(y)
+    F = cg.codegen(f, [x, y])
+    xs = np.linspace(0.5, 3, 20)
+    ys = np.linspace(0.1, 1, 20)
+
+    vf, gf = F(xs, ys, compute_gradient=True, mode='forward')
+    vr, gr = F(xs, ys, compute_gradient=True, mode='reverse')
+    assert np.allclose(vf, vr)
+    assert np.allclose(gf, gr)
+
+    v, g = cg.codegen(cg.Constant(3) * 2, [x]).forward_gradient(xs)
+    assert np.allclose(v, 6)
+    assert np.allclose(g[0], 0)
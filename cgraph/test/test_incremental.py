@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def test_incremental_function():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    z = cg.Symbol('z')
+
+    f = cg.sym_sin(x) * y + cg.sym_exp(z / 4) + x ** 2 - cg.sym_sqrt(z * z + 1)
+    F = cg.Function(f, [x, y, z])
+    I = cg.IncrementalFunction(f, [x, y, z])
+    n = len(I.tape.code)
+
+    xs = np.array([0.5, 1.0, 2.0])
+    assert np.allclose(I(xs, 2., 3.), F(xs, 2., 3.))
+    assert I.evaluated == n
+
+    assert np.allclose(I(xs, 2., 3.), F(xs, 2., 3.))
+    assert I.evaluated == 0
+
+    assert np.allclose(I(xs, 2.5, 3.), F(xs, 2.5, 3.))
+    assert 0 < I.evaluated < n / 2
+
+    v, g = I(xs, 2.5, 1., compute_gradient=True)
+    vf, gf = F(xs, 2.5, 1., compute_gradient=True)
+    assert np.allclose(v, vf)
+    assert np.allclose(g, gf)
+
+    # Changes in place are detected
+    xs[0] = -1
+    v, g = I(xs, 2.5, 1., compute_gradient=True)
+    vf, gf = F(xs, 2.5, 1., compute_gradient=True)
+    assert np.allclose(v, vf)
+    assert np.allclose(g, gf)
+
+    for i in range(3):
+        args = [xs, 1.5, 0.5]
+        args[i] = args[i] + 0.1
+        v, d = I.partial(i, *args)
+        vf, gf = F(*args, compute_gradient=True)
+        assert np.allclose(v, vf)
+        assert np.allclose(np.broadcast_to(d, v.shape), gf[:, i])
+
+def test_incremental_sdf():
+    s = sdf.Circle(center=[0, 0], radius=1) | sdf.Box(minc=[-0.5, -0.5], maxc=[0.5, 1])
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    F = cg.IncrementalFunction(s.sdf, [x, y])
+
+    xs = np.linspace(-2, 2, 10)
+    for ys in np.linspace(-2, 2, 5):
+        v, g = F(xs, ys, compute_gradient=True)
+        vs, gs = s(xs, ys, compute_gradient=True)
+        assert np.allclose(v, vs)
+        assert np.allclose(g, gs)
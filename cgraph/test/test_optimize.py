@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+import cgraph as cg
+
+def line_problem():
+    w0 = cg.Symbol('w0')
+    w1 = cg.Symbol('w1')
+    rnd = np.random.RandomState(0)
+    x = np.linspace(0, 10, 50)
+    y = 0.8 * x + 2 + rnd.normal(scale=0.1, size=50)
+    r = w0 * cg.Constant(x) + w1 - cg.Constant(y)
+    A = np.column_stack((x, np.ones(50)))
+    return [w0, w1], r, cg.sym_reduce_sum(r**2) / 50, np.linalg.lstsq(A, y, rcond=None)[0]
+
+def test_objective():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    f = cg.sym_reduce_sum(x * x) + y * 3
+    F, p = cg.optimize.Objective.create(f, [x, y], [np.array([1., 2.]), 2.])
+    assert F.shapes == [(2,), (1,)]
+    assert p.tolist() == [1., 2., 2.]
+    assert [v.tolist() for v in F.split(p)] == [[1., 2.], [2.]]
+
+    v, g = F.value_and_gradient(p)
+    assert v == pytest.approx(11.)
+    assert g.tolist() == [2., 4., 3.]
+    assert F.value(p) == pytest.approx(11.)
+    assert F.evaluations == 2
+
+    # Values of elementwise expressions over several samples are summed.
+    F, p = cg.optimize.Objective.create(x * y, [x, y], [np.array([1., 2., 3.]), 2.])
+    v, g = F.value_and_gradient(p)
+    assert v == pytest.approx(12.)
+    assert g.tolist() == [2., 2., 2., 6.]
+
+def test_residual_jacobian():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    c = cg.Constant(np.array([1., 2., 3.]))
+    R, p = cg.optimize.Residuals.create(x * c + y * y, [x, y], [2., 3.])
+    r, J = R.residuals_and_jacobian(p)
+    assert r.tolist() == [11., 13., 15.]
+    assert np.allclose(J, [[1., 6.], [2., 6.], [3., 6.]])
+
+    A = np.arange(6.).reshape(3, 2)
+    R, p = cg.optimize.Residuals.create(cg.sym_matmul(A, x) - c, [x], [np.array([1., -1.])])
+    r, J = R.residuals_and_jacobian(p)
+    assert np.allclose(r, A.dot([1., -1.]) - [1., 2., 3.])
+    assert np.allclose(J, A)
+    v, g = R.value_and_gradient(p)
+    assert v == pytest.approx(0.5 * r.dot(r))
+    assert np.allclose(g, A.T.dot(r))
+
+@pytest.mark.parametrize('method', ['gradient_descent', 'lbfgs'])
+def test_minimize_line(method):
+    w, r, f, expected = line_problem()
+    res = getattr(cg.optimize, method)(f, w, [0.4, 1.1], max_iter=1000, gtol=1e-8)
+    assert res.converged
+    assert np.allclose(res.p, expected, atol=1e-4)
+    assert [v.shape for v in res.x] == [(1,), (1,)]
+    assert res.value == pytest.approx(cg.value(f, {w[0]: res.p[0], w[1]: res.p[1]})[0])
+
+@pytest.mark.parametrize('method', ['gauss_newton', 'levenberg_marquardt'])
+def test_least_squares_line(method):
+    w, r, f, expected = line_problem()
+    res = getattr(cg.optimize, method)(r, w, [0.4, 1.1])
+    assert res.converged
+    assert np.allclose(res.p, expected)
+
+def test_rosenbrock():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    f = (1 - x)**2 + 100 * (y - x**2)**2
+    res = cg.optimize.lbfgs(f, [x, y], [-1.2, 1.])
+    assert res.converged
+    assert np.allclose(res.p, [1., 1.], atol=1e-4)
+
+    p = cg.Symbol('p')
+    r = (1 - cg.sym_index(p, 0)) * cg.Constant(np.array([1., 0.])) + \
+        10 * (cg.sym_index(p, 1) - cg.sym_index(p, 0)**2) * cg.Constant(np.array([0., 1.]))
+    for method in [cg.optimize.gauss_newton, cg.optimize.levenberg_marquardt]:
+        res = method(r, [p], [np.array([-1.2, 1.])])
+        assert res.converged
+        assert np.allclose(res.x[0], [1., 1.])
+
+def test_early_stopping():
+    w, r, f, expected = line_problem()
+    seen = []
+    def callback(res):
+        seen.append(res.value)
+        return len(seen) == 3
+    res = cg.optimize.gradient_descent(f, w, [0.4, 1.1], callback=callback)
+    assert not res.converged
+    assert res.message == 'Stopped by callback'
+    assert res.iterations == 2
+    assert seen == sorted(seen, reverse=True)
+
+    res = cg.optimize.gradient_descent(f, w, [0.4, 1.1], max_iter=5)
+    assert res.iterations == 5 and not res.converged
+
+    res = cg.optimize.gradient_descent(f, w, [0.4, 1.1], ftol=1e-3)
+    assert res.converged
+    assert res.message == 'Objective decrease below tolerance'
+
+    res = cg.optimize.gauss_newton(r, w, expected)
+    assert res.converged
+    assert res.iterations <= 1
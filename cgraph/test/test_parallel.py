@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import cgraph as cg
+import cgraph.sdf as sdf
+import cgraph.parallel as parallel
+
+def scene():
+    with sdf.transform(angle=0.3, offset=[0.5, -0.2]):
+        return sdf.Box(minc=[-0.5, -0.5], maxc=[0.5, 0.5]) | sdf.Circle(center=[1, 1], radius=0.5)
+
+def test_partition():
+    assert parallel.partition(10, 3) == [(0, 3), (3, 6), (6, 10)]
+    assert parallel.partition(2, 4) == [(0, 1), (1, 2)]
+
+def test_evaluate_threads():
+    s = scene()
+    xs = np.linspace(-2, 2, 1001)
+    ys = np.linspace(-1, 2, 1001)
+
+    v, g = s(xs, ys, compute_gradient=True)
+    assert np.allclose(parallel.evaluate(s, xs, ys, workers=4), v)
+    vp, gp = parallel.evaluate(s, xs, ys, workers=3, chunksize=100, compute_gradient=True)
+    assert np.allclose(vp, v)
+    assert np.allclose(gp, g)
+    assert np.allclose(parallel.evaluate(s, xs, 0.5, workers=2), s(xs, 0.5))
+
+    with pytest.raises(ValueError):
+        parallel.evaluate(cg.Function(s.sdf, [cg.Symbol('x'), cg.Symbol('y')], buffered=True), xs, ys)
+
+    F = cg.Function(s.sdf, [cg.Symbol('x'), cg.Symbol('y')])
+    parallel.prepare(F)
+    assert F._tape is not None
+    F = cg.Function(s.sdf, [cg.Symbol('x'), cg.Symbol('y')], backend='codegen')
+    assert np.allclose(parallel.evaluate(F, xs, ys, workers=2), v)
+    assert F._kernel is not None and F._tape is None
+
+def test_evaluate_processes():
+    s = scene()
+    xs = np.linspace(-2, 2, 1001)
+    ys = np.linspace(-1, 2, 1001)
+
+    v, g = s(xs, ys, compute_gradient=True)
+    vp, gp = parallel.evaluate(s, xs, ys, workers=2, executor='process', compute_gradient=True)
+    assert np.allclose(vp, v)
+    assert np.allclose(gp, g)
+
+def test_grid_eval():
+    s = scene()
+    x, y, d, g = sdf.grid_eval(s, samples=[50j, 40j])
+    xp, yp, dp, gp = sdf.grid_eval(s, samples=[50j, 40j], workers=4)
+    assert dp.shape == (50, 40)
+    assert gp.shape == (50, 40, 2)
+    assert np.allclose(dp, d)
+    assert np.allclose(gp, g)
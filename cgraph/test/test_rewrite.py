@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+import cgraph as cg
+
+def test_match():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    a = cg.Wildcard('a')
+    k = cg.Wildcard('k', cg.Constant)
+
+    xy = x * y
+    assert cg.match(a * 2, xy * 2) == {'a': xy}
+    assert cg.match(a * 2, xy * 3) is None
+    assert cg.match(a * k, xy * 3)['k'].value == 3
+    assert cg.match(a * k, xy * x) is None
+    assert cg.match(a - a, xy - xy) == {'a': xy}
+    assert cg.match(a - a, xy - x * y) is None
+    assert cg.match(a - a, x - cg.Symbol('x')) == {'a': x}
+    assert cg.match(cg.sym_exp(a) + x, cg.sym_exp(y) + x) == {'a': y}
+    assert cg.match(cg.sym_exp(a) + x, cg.sym_exp(y) + y) is None
+
+def test_register_rule():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    a = cg.Wildcard('a')
+    b = cg.Wildcard('b')
+
+    rules = cg.RuleSet()
+    cg.register_rule(cg.sym_max(a, a), a, rules=rules)
+    cg.register_rule(a - b, a + (-b), commutative=False, rules=rules)
+
+    @cg.rule(cg.sym_min(a, b), rules=rules)
+    def min_const(node, a, b):
+        if cg.is_const(a) and cg.is_const(b):
+            return cg.Constant(np.minimum(a.value, b.value))
+    
+    assert str(cg.simplify(cg.sym_max(x * y, x * y) - y, rules=rules)) == '((x*y) + -y)'
+    assert cg.is_const(cg.simplify(cg.sym_min(3, 2), rules=rules), 2)
+    assert isinstance(cg.simplify(cg.sym_min(x, 2), rules=rules), cg.Min)
+
+    # Rules are indexed by node type
+    assert len(rules.rules_for(cg.Max)) == 1
+    assert len(rules.rules_for(cg.Add)) == 0
+
+def test_commutative_patterns():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    assert cg.simplify(1 * x) == x
+    assert cg.simplify(x * 1) == x
+    assert cg.is_const(cg.simplify(cg.sym_cos(y + x)**2 + cg.sym_sin(x + y)**2), 1)
+    assert cg.is_const(cg.simplify(cg.sym_sin(x * y)**2 + cg.sym_cos(y * x)**2), 1)
+
+def test_simplify_identities():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    assert cg.simplify(cg.sym_log(cg.sym_exp(x * y))) is not None
+    assert str(cg.simplify(cg.sym_log(cg.sym_exp(x * y)))) == '(x*y)'
+    assert str(cg.simplify(cg.sym_exp(x) * cg.sym_exp(y))) == 'exp((x + y))'
+    assert str(cg.simplify(x * x * x)) == 'x**3'
+    assert str(cg.simplify(x * 2 * 3 + 1 + 4)) == '((x*6) + 5)'
+    assert str(cg.simplify(x - (-y))) == '(x + y)'
+    assert cg.is_const(cg.simplify((x + y) / (y + x)), 1)
+
+def test_simplify_no_copy():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    f = cg.sym_exp(x * y) + cg.sym_sin(x)
+    assert cg.simplify(f) is f
+
+    g = f * (y + 0)
+    s = cg.simplify(g)
+    assert s[0] is f
+    assert s[1] is y
+    assert str(g) == '((exp((x*y)) + sin(x))*(y + 0))'
+
+def test_cyclic_rules():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    a = cg.Wildcard('a')
+    b = cg.Wildcard('b')
+
+    rules = cg.RuleSet()
+    cg.register_rule(a + b, b + a, commutative=False, rules=rules)
+    s = cg.simplify(x + y, rules=rules)
+    assert np.isclose(cg.value(s, {x:1, y:2}), 3)
+
+def test_simplify_negative_arguments():
+    x = cg.Symbol('x')
+    xs = np.array([-3., -2., 0.5, 2.])
+
+    exprs = [
+        (x**2)**0.5, cg.sym_log(x**2), cg.sym_exp(cg.sym_log(x)), cg.sym_sqrt(x)**2,
+        cg.sym_sqrt(x) * cg.sym_sqrt(x), (x**0.5) * (x**0.5), (x**2)**3, cg.sym_log(x**3),
+        x * (x**2), x / (x**3),
+    ]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for f in exprs:
+            v = cg.value(f, {x:xs})
+            s = cg.value(cg.simplify(f), {x:xs})
+            assert np.allclose(s, v, equal_nan=True), str(f)
+
+    assert str(cg.simplify((x**2)**3)) == 'x**6'
+    assert str(cg.simplify(cg.sym_log(x**3))) == '(3*log(x))'
+
+def test_rule_functions():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    @cg.applies_to(cg.Sub)
+    def sub_rule(node):
+        return node.children[0] + (-node.children[1])
+
+    f = (y * x + 0) * 1 - x
+    assert str(cg.simplify(f, rules=[cg.mul_identity_rule, cg.add_identity_rule, sub_rule])) == '((y*x) + -x)'
+
+    rules = cg.RuleSet([cg.add_identity_rule])
+    rules.append(cg.mul_identity_rule)
+    assert str(cg.simplify(f, rules=rules)) == '((y*x) - x)'
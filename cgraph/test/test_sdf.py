@@ -1,4 +1,7 @@
 
+from contextlib import ExitStack
+import numpy as np
+
 from cgraph.test.utils import checkf
 
 import cgraph as cg
@@ -19,3 +22,78 @@ def test_halfspace():
 
     c = sdf.Halfspace(normal=[0,1], d=1)
     checkf(c.sdf, {x:0, y:0}, value=-1., ngrad={x:0, y:1})
+
+def test_call():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    with sdf.transform(angle=0.3, offset=[0.5, -0.2]):
+        s = sdf.Box(minc=[-0.5, -0.5], maxc=[0.5, 0.5]) | sdf.Circle(center=[1, 1], radius=0.5)
+
+    xs = np.linspace(-2, 2, 10)
+    ys = np.linspace(-1, 2, 10)
+    assert np.allclose(s(xs, ys), cg.value(s.sdf, {x:xs, y:ys}))
+
+def nested_scene(depth):
+    """Returns a union of boxes whose transforms are nested `depth` levels deep."""
+    with ExitStack() as stack:
+        s = sdf.Box(minc=[-0.2, -0.2], maxc=[0.2, 0.2])
+        for i in range(depth):
+            stack.enter_context(sdf.transform(angle=0.2, offset=[0.1, 0.05]))
+            s = s | sdf.Box(minc=[-0.2, -0.2], maxc=[0.2, 0.2])
+    return s
+
+def test_gradient_visits_shared_nodes_once(monkeypatch):
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    calls = []
+    for k in [cg.Add, cg.Sub, cg.Mul, cg.Neg, cg.Min, cg.Max]:
+        def counted(self, cv, value, orig=k.compute_gradient):
+            calls.append(self)
+            return orig(self, cv, value)
+        monkeypatch.setattr(k, 'compute_gradient', counted)
+
+    counts = []
+    for depth in [4, 8, 16]:
+        s = nested_scene(depth)
+        del calls[:]
+        cg.numeric_gradient(s.sdf, {x:[0.1, 0.5], y:[0.3, -0.2]})
+        assert len(calls) == len(set(calls))
+        assert len(calls) == len([n for n in cg.topological_order(s.sdf) if n.children])
+        counts.append(len(calls))
+    
+    # Linear in depth: doubling the depth roughly doubles the work
+    assert counts[2] - counts[1] == 2 * (counts[1] - counts[0])
+
+    del calls[:]
+    s(0.1, 0.3, compute_gradient=True)
+    assert len(calls) == len(set(calls))
+
+def test_gradient_nested_transforms():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    s = nested_scene(3)
+    xs = np.array([0.1, 0.5, -0.3])
+    ys = np.array([0.3, -0.2, 0.15])
+    v, g = s(xs, ys, compute_gradient=True)
+    
+    eps = 1e-6
+    gx = (s(xs + eps, ys) - s(xs - eps, ys)) / (2*eps)
+    gy = (s(xs, ys + eps) - s(xs, ys - eps)) / (2*eps)
+    assert np.allclose(g[:, 0], gx, atol=1e-5)
+    assert np.allclose(g[:, 1], gy, atol=1e-5)
+
+    d = cg.numeric_gradient(s.sdf, {x:xs, y:ys})
+    assert np.allclose(d[x], g[:, 0])
+    assert np.allclose(d[y], g[:, 1])
+
+def test_many_primitives():
+    s = sdf.Circle(center=[0, 0], radius=0.1)
+    for i in range(1, 2000):
+        s |= sdf.Circle(center=[i, 0], radius=0.1)
+
+    v, g = s([1000.2, 5.], [0., -0.05], compute_gradient=True)
+    assert np.allclose(v, [0.1, -0.05])
+    assert np.allclose(g, [[1, 0], [0, -1]])
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+import cgraph as cg
+import cgraph.sdf as sdf
+
+def test_serialize_expression(tmpdir):
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    table = np.linspace(0, 1, 1000)
+    with cg.interning():
+        s = cg.sym_sin(x * y)
+        f = s * s + cg.Constant(table) / y + 2
+
+    fargs = {x: 0.5, y: 2.}
+    for g in [cg.loads(cg.dumps(f)), cg.load(_save(f, tmpdir)), cg.load(_save(f, tmpdir), mmap=True)]:
+        assert cg.structural_hash(g) == cg.structural_hash(f)
+        assert g[0][0][0] is g[0][0][1]
+        assert np.allclose(cg.value(g, fargs), cg.value(f, fargs))
+
+    g = cg.load(_save(f, tmpdir), mmap=True)
+    c = g[0][1][0]
+    assert isinstance(c, cg.Constant)
+    assert not c.value.flags.owndata and not c.value.flags.writeable
+    assert np.allclose(c.value, table)
+
+def _save(obj, tmpdir):
+    path = str(tmpdir.join('graph.cgraph'))
+    cg.save(obj, path)
+    return path
+
+def test_serialize_deep_expression():
+    x = cg.Symbol('x')
+    f = x
+    for i in range(20000):
+        f = f * 1.0001 + 1
+
+    g = cg.loads(cg.dumps(f))
+    assert np.allclose(cg.compile(g, [x])(0.5), cg.compile(f, [x])(0.5))
+
+def test_serialize_tensor_and_lists():
+    w = cg.Symbol('w')
+    fs = [cg.sym_reduce_sum(cg.sym_index(w, (slice(1, None), Ellipsis)), axis=(0,)), cg.sym_mean(w * 2) + 1]
+    gs = cg.loads(cg.dumps(fs))
+    assert isinstance(gs, list) and len(gs) == 2
+    for f, g in zip(fs, gs):
+        assert cg.structural_hash(g) == cg.structural_hash(f)
+    ws = np.arange(6.).reshape(3, 2)
+    assert np.allclose(cg.value(gs[0], {w: ws}), ws[1:].sum(axis=0))
+
+def test_serialize_tape_and_arrays(tmpdir):
+    s = sdf.Circle(center=[0, 0], radius=1) | sdf.Box(minc=[-0.5, -0.5], maxc=[0.5, 1])
+    xs = np.linspace(-2, 2, 10)
+    ys = np.linspace(2, -2, 10)
+
+    t = cg.load(_save(s.tape, tmpdir))
+    assert isinstance(t, cg.Tape)
+    assert [a.name for a in t.symbols] == ['x', 'y']
+    assert np.allclose(t(xs, ys), s.tape(xs, ys))
+
+    a = cg.load(_save(cg.to_arrays(s.sdf), tmpdir), mmap=True)
+    assert isinstance(a, cg.ArrayGraph)
+    assert np.allclose(a.value({s.syms[0][1]: xs, s.syms[1][1]: ys}), s(xs, ys))
+
+def test_serialize_invalid():
+    with pytest.raises(ValueError):
+        cg.loads(b'not a graph at all, really')
+
+    b = bytearray(cg.dumps(cg.Symbol('x') + 1))
+    b[8] = 99
+    with pytest.raises(ValueError):
+        cg.loads(bytes(b))
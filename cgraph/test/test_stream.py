@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import cgraph as cg
+import cgraph.sdf as sdf
+import cgraph.stream as stream
+
+def test_chunks():
+    x = np.arange(10)
+    y = np.arange(10, 20)
+
+    c = list(stream.chunks([x, 2, y], chunksize=4))
+    assert len(c) == 3
+    assert np.all(c[0][0] == [0, 1, 2, 3])
+    assert c[1][1] == 2
+    assert np.all(c[2][2] == [18, 19])
+
+    c = list(stream.chunks([x[:5], iter([[1, 2, 3], [4, 5]])], chunksize=4))
+    assert len(c) == 2
+    assert np.all(c[1][0] == [3, 4])
+    assert np.all(c[1][1] == [4, 5])
+
+    with pytest.raises(ValueError):
+        list(stream.chunks([x, y[:5]]))
+    with pytest.raises(ValueError):
+        list(stream.chunks([x[:2], iter([[1, 2, 3]])]))
+    with pytest.raises(ValueError):
+        list(stream.chunks([x, iter([[1, 2, 3]])]))
+    with pytest.raises(ValueError):
+        list(stream.chunks([iter([[1, 2], [3]]), iter([[1, 2]])]))
+
+    c = list(stream.chunks([x, [1., 2., 3., 4., 5., 6., 7., 8., 9., 10.]], chunksize=4))
+    assert len(c) == 3
+    assert np.all(c[2][1] == [9, 10])
+
+def test_evaluate_memmap(tmpdir):
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    s = sdf.Circle(center=[0.5, 0], radius=1.) | sdf.Box(minc=[-1, -1], maxc=[0, 0.5])
+    n = 1000
+    xs = np.memmap(str(tmpdir.join('x.bin')), dtype=np.float64, mode='w+', shape=(n,))
+    ys = np.memmap(str(tmpdir.join('y.bin')), dtype=np.float64, mode='w+', shape=(n,))
+    xs[:] = np.linspace(-2, 2, n)
+    ys[:] = np.linspace(2, -1, n)
+    xs.flush()
+    ys.flush()
+
+    d = np.memmap(str(tmpdir.join('d.bin')), dtype=np.float32, mode='w+', shape=(n,))
+    g = np.memmap(str(tmpdir.join('g.bin')), dtype=np.float32, mode='w+', shape=(n, 2))
+    stream.evaluate(s, xs, ys, out=d, gradient_out=g, chunksize=128)
+
+    v, gv = s(np.array(xs), np.array(ys), compute_gradient=True)
+    d = np.memmap(str(tmpdir.join('d.bin')), dtype=np.float32, mode='r', shape=(n,))
+    assert np.allclose(d, v, atol=1e-6)
+    assert np.allclose(g, gv, atol=1e-6)
+
+    assert np.allclose(stream.evaluate(s, xs, 0.5, chunksize=100), s(np.array(xs), 0.5))
+
+def test_evaluate_iterables():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+
+    f = cg.Function(x * cg.sym_exp(y), [x, y], buffered=True)
+    xs = np.random.uniform(size=100)
+    ys = np.random.uniform(size=100)
+    v = stream.evaluate(f, (xs[i:i+30] for i in range(0, 100, 30)), ys)
+    assert np.allclose(v, xs * np.exp(ys))
+    assert np.allclose(stream.evaluate(f, xs[:5], list(ys[:5])), xs[:5] * np.exp(ys[:5]))
+
+    out = np.zeros(10)
+    with pytest.raises(ValueError):
+        stream.evaluate(f, np.arange(10.), iter([[1, 1, 1]]), out=out)
+
+    parts = list(stream.iterate(f, xs, ys, chunksize=40, compute_gradient=True))
+    assert len(parts) == 3
+    assert np.allclose(np.concatenate([g for v, g in parts])[:, 1], xs * np.exp(ys))
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+import cgraph as cg
+
+def finite_difference(f, fargs, s, eps=1e-6):
+    """Returns the derivative of the sum of values of `f` with respect to `s` by central differences."""
+    x = np.atleast_1d(np.asarray(fargs[s], dtype=float))
+    d = np.zeros(x.shape)
+    for i in np.ndindex(*x.shape):
+        e = np.zeros(x.shape)
+        e[i] = eps
+        hi = dict(fargs)
+        lo = dict(fargs)
+        hi[s] = x + e
+        lo[s] = x - e
+        d[i] = (np.sum(cg.value(f, hi)) - np.sum(cg.value(f, lo))) / (2 * eps)
+    return d
+
+def test_tensor_values():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    A = np.arange(6.).reshape(2, 3)
+    xs = np.array([1., 2., 3.])
+    ys = np.array([[1., -1.], [2., 0.5], [0., 1.]])
+
+    assert np.allclose(cg.value(cg.sym_matmul(A, x), {x: xs}), A.dot(xs))
+    assert np.allclose(cg.value(cg.sym_matmul(x, x), {x: xs}), [14.])
+    assert np.allclose(cg.value(cg.sym_matmul(x, y), {x: xs, y: ys}), xs.dot(ys))
+    assert np.allclose(cg.value(cg.sym_matmul(A, y), {y: ys}), A.dot(ys))
+
+    assert np.allclose(cg.value(cg.sym_reduce_sum(x), {x: xs}), [6.])
+    assert np.allclose(cg.value(cg.sym_reduce_sum(y, axis=0), {y: ys}), ys.sum(axis=0))
+    assert np.allclose(cg.value(cg.sym_mean(y, axis=-1), {y: ys}), ys.mean(axis=-1))
+    assert np.allclose(cg.value(cg.sym_index(y, (slice(1, None), 0)), {y: ys}), ys[1:, 0])
+    assert np.allclose(cg.value(cg.sym_index(x, 1), {x: xs}), [2.])
+
+    with pytest.raises(ValueError):
+        cg.value(cg.sym_matmul(x, x), {x: np.zeros((2, 2, 2))})
+
+    # Values are not broadcast to the shape of the arguments.
+    assert cg.Function(cg.sym_reduce_sum(x) + y, [x, y])(xs, ys[0]).shape == (2,)
+    assert cg.Function(cg.sym_reduce_sum(x), [x])(xs).shape == (1,)
+
+def test_tensor_gradients():
+    x = cg.Symbol('x')
+    y = cg.Symbol('y')
+    A = np.arange(6.).reshape(2, 3) - 2
+    xs = np.array([1., 2., 3.])
+    ys = np.array([[1., -1.], [2., 0.5], [0., 1.]])
+
+    fs = [
+        cg.sym_reduce_sum(cg.sym_matmul(A, x)**2),
+        cg.sym_matmul(x, y) * cg.sym_reduce_sum(y, axis=0),
+        cg.sym_mean(cg.sym_exp(y), axis=1) * x,
+        cg.sym_index(x, [0, 0, 2]) * 3 + cg.sym_index(y, (slice(None), 1)),
+        cg.sym_matmul(cg.sym_matmul(A, y), cg.sym_sin(cg.sym_index(x, slice(0, 2)))),
+        cg.sym_reduce_sum(cg.sym_matmul(y, cg.sym_index(x, slice(0, 2)))) + x,
+    ]
+    fargs = {x: xs, y: ys}
+    for f in fs:
+        d = cg.numeric_gradient(f, fargs)
+        for s in set(cg.topological_order(f)) & {x, y}:
+            assert d[s].shape == fargs[s].shape
+            assert np.allclose(d[s], finite_difference(f, fargs, s), atol=1e-5)
+
+        T = cg.compile(f, [x, y])
+        v, g = T.gradient(xs, ys)
+        assert np.allclose(v, cg.value(f, fargs))
+        assert np.allclose(g[0], d[x])
+        assert np.allclose(g[1], d[y])
+
+        v, g = cg.compile(f, [x, y], buffered=True).gradient(xs, ys)
+        assert np.allclose(g[1], d[y])
+
+        v, g = cg.Function(f, [x, y])(xs, ys, compute_gradient=True)
+        assert np.allclose(g[0], d[x])
+        assert np.allclose(g[1], d[y])
+
+        v, g = cg.IncrementalFunction(f, [x, y]).gradient(xs, ys)
+        assert np.allclose(g[0], d[x])
+        assert np.allclose(g[1], d[y])
+
+def test_tensor_reverse_mode_only():
+    x = cg.Symbol('x')
+    f = cg.sym_reduce_sum(x**2)
+    T = cg.compile(f, [x])
+    assert not T.elementwise
+    with pytest.raises(ValueError):
+        T.forward_gradient(np.ones(3))
+    with pytest.raises(ValueError):
+        T.jacobian(np.ones(3))
+    with pytest.raises(ValueError):
+        cg.Function(f, [x])(np.ones(3), compute_gradient=True, mode='forward')
+
+def test_unbroadcast():
+    assert cg.unbroadcast(np.ones((4, 3)), (3,)).tolist() == [4, 4, 4]
+    assert cg.unbroadcast(np.ones((4, 3)), (4, 1)).tolist() == [[3], [3], [3], [3]]
+    assert cg.unbroadcast(np.ones((4, 3)), (1,)).tolist() == [12]
+    assert cg.unbroadcast(2., (2, 2)).tolist() == [[2, 2], [2, 2]]
+    assert cg.unbroadcast(np.ones(3), (3,)).shape == (3,)
+
+def test_tensor_structure():
+    x = cg.Symbol('x')
+    assert cg.structural_key(cg.sym_reduce_sum(x, axis=0)) != cg.structural_key(cg.sym_reduce_sum(x, axis=1))
+    assert cg.structural_key(cg.sym_reduce_sum(x)) != cg.structural_key(cg.sym_mean(x))
+    assert cg.structural_hash(cg.sym_index(x, 0)) != cg.structural_hash(cg.sym_index(x, 1))
+    assert cg.structural_hash(cg.sym_index(x, 0)) == cg.structural_hash(cg.sym_index(x, 0))
+
+    with cg.interning():
+        assert cg.sym_reduce_sum(x * 2, axis=0) is cg.sym_reduce_sum(x * 2, axis=0)
+        assert cg.sym_reduce_sum(x, axis=0) is not cg.sym_reduce_sum(x, axis=1)
+
+def test_least_squares_objective():
+    w0 = cg.Symbol('w0')
+    w1 = cg.Symbol('w1')
+    xy = np.vstack((np.linspace(0, 10, 50), np.linspace(0, 10, 50) * 0.8 + 2))
+
+    r = w0 * cg.Constant(xy[0]) + w1 - cg.Constant(xy[1])
+    f = cg.sym_reduce_sum(r**2) / xy.shape[1]
+
+    v, g = cg.Function(f, [w0, w1])(0.5, 1., compute_gradient=True)
+    res = 0.5 * xy[0] + 1. - xy[1]
+    assert np.allclose(v, np.mean(res**2))
+    assert np.allclose(g[0], np.mean(2 * res * xy[0]))
+    assert np.allclose(g[1], np.mean(2 * res))